@@ -0,0 +1,151 @@
+"""
+Memory held by a long session's tracks: plain dicts vs. TrackRecord.
+
+A session that requests N tracks used to keep every one of them as a
+~30-key dict in client.song_history (unbounded) on top of whatever was
+still queued. Tracks are now TrackRecord instances (slotted fields,
+interned repeated strings) and the history is a ring buffer of the newest
+SONG_HISTORY_LIMIT entries.
+
+This script builds a synthetic session shaped like real fetch_track output
+(the same metadata keys, a few hundred uploaders, a few dozen playlists).
+Every track is decoded from its own JSON text, so repeated strings arrive as
+separate objects the way they do from separate yt-dlp extractions. It
+measures with tracemalloc:
+
+    tracks         the same N tracks as dicts vs. records
+    session        queue + history as the bot held them before (dicts,
+                   unbounded history) and now (records, bounded history)
+
+    python benchmarks/track_memory.py --tracks 10000 --queued 500 --history-limit 1000
+"""
+import argparse
+import collections
+import gc
+import json
+import os
+import random
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import track_record  # noqa: E402
+
+FORMATS = [
+    {"format_id": "251", "format": "251 - audio only (medium)", "acodec": "opus", "abr": 130.5, "asr": 48000, "ext": "webm"},
+    {"format_id": "140", "format": "140 - audio only (medium)", "acodec": "mp4a.40.2", "abr": 129.4, "asr": 44100, "ext": "m4a"},
+]
+
+
+def video_id(rng: random.Random) -> str:
+    alphabet = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_"
+    return "".join(rng.choice(alphabet) for _ in range(11))
+
+
+def synthetic_track_json(rng: random.Random, uploaders: list, playlists: list) -> str:
+    vid = video_id(rng)
+    uploader = rng.choice(uploaders)
+    fmt = rng.choice(FORMATS)
+    track = {
+        "id": vid,
+        "title": f"{uploader} - Song {rng.randrange(10 ** 6)} (Official Audio)",
+        "webpage_url": f"https://www.youtube.com/watch?v={vid}",
+        "cache_key": f"yt-{vid}",
+        "cache_mode": "shortterm",
+        "cache_path": f"cache/yt-{vid}.{fmt['ext']}",
+        "file": f"/srv/discordmusic/cache/yt-{vid}.{fmt['ext']}",
+        "ext": fmt["ext"],
+        "duration": rng.randrange(90, 600),
+        "format_id": fmt["format_id"],
+        "format": fmt["format"],
+        "format_note": "medium",
+        "acodec": fmt["acodec"],
+        "abr": fmt["abr"],
+        "tbr": fmt["abr"],
+        "asr": fmt["asr"],
+        "audio_channels": 2,
+        "uploader": uploader,
+        "channel": uploader,
+        "fulltitle": f"{uploader} - Song (Official Audio)",
+        "age_limit": 0,
+        "is_live": False,
+        "filesize": rng.randrange(2 * 10 ** 6, 9 * 10 ** 6),
+        "playback_speed": 1.0,
+        "requested_by_user_id": rng.randrange(10 ** 17, 10 ** 18),
+        "requested_by_discord_name": f"user{rng.randrange(40)}",
+    }
+    if rng.random() < 0.6:
+        playlist_id, playlist_name = rng.choice(playlists)
+        track.update({
+            "playlist_id": playlist_id,
+            "playlist_name": playlist_name,
+            "playlist_block_id": playlist_id.upper(),
+            "playlist_index": rng.randrange(1, 100),
+            "playlist_total": 100,
+        })
+    return json.dumps(track)
+
+
+def measure(build) -> tuple:
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    held = build()
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return held, after - before
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tracks", type=int, default=10000)
+    parser.add_argument("--queued", type=int, default=500)
+    parser.add_argument("--history-limit", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    uploaders = [f"Artist {index}" for index in range(300)]
+    playlists = [(f"pl{index:06d}", f"Playlist number {index}") for index in range(40)]
+    texts = [synthetic_track_json(rng, uploaders, playlists) for _ in range(args.tracks)]
+
+    def dict_tracks():
+        return [json.loads(text) for text in texts]
+
+    def record_tracks():
+        return [track_record.from_dict(json.loads(text)) for text in texts]
+
+    def dict_session():
+        tracks = dict_tracks()
+        return {"queue": tracks[-args.queued:], "history": list(tracks)}
+
+    def record_session():
+        history = collections.deque(maxlen=args.history_limit)
+        queue = []
+        for text in texts:
+            track = track_record.from_dict(json.loads(text))
+            history.append(track)
+            queue.append(track)
+            if len(queue) > args.queued:
+                queue.pop(0)
+        return {"queue": queue, "history": history}
+
+    _, dict_bytes = measure(dict_tracks)
+    _, record_bytes = measure(record_tracks)
+    _, dict_session_bytes = measure(dict_session)
+    _, record_session_bytes = measure(record_session)
+
+    n = args.tracks
+    print(f"{n} tracks, {args.queued} queued, history limit {args.history_limit}")
+    print(f"tracks   dicts   {dict_bytes / 2 ** 20:7.2f} MiB  ({dict_bytes / n:6.0f} B/track)")
+    print(f"tracks   records {record_bytes / 2 ** 20:7.2f} MiB  ({record_bytes / n:6.0f} B/track)  "
+          f"{100 * (1 - record_bytes / dict_bytes):.0f}% less")
+    print(f"session  before  {dict_session_bytes / 2 ** 20:7.2f} MiB  (dicts, unbounded history)")
+    print(f"session  after   {record_session_bytes / 2 ** 20:7.2f} MiB  (records, bounded history)  "
+          f"{100 * (1 - record_session_bytes / dict_session_bytes):.0f}% less")
+
+
+if __name__ == "__main__":
+    main()
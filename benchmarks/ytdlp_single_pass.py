@@ -0,0 +1,142 @@
+"""
+Per-miss latency of a cache download: two extractions vs. reused info.
+
+fetch_track and cache_playlist_track resolve a track with
+extract_info(download=False) so they can check duration, size and
+permissions before fetching any bytes. They used to hand the URL to
+download_youtube_to_cache, which extracted it a second time. They now
+pass the first info dict to media_cache.download_resolved(), which
+downloads the chosen format directly.
+
+This script times both flows against a fake extractor with a fixed delay
+(standing in for the YouTube page fetch and JS challenge solving) and a
+local HTTP server that serves the audio bytes, so it needs no network:
+
+    python benchmarks/ytdlp_single_pass.py --runs 20 --extract-delay 0.4
+"""
+import argparse
+import http.server
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import yt_dlp  # noqa: E402
+from yt_dlp.extractor.common import InfoExtractor  # noqa: E402
+
+import media_cache  # noqa: E402
+
+PAYLOAD = os.urandom(512 * 1024)
+
+
+class PayloadHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "audio/webm")
+        self.send_header("Content-Length", str(len(PAYLOAD)))
+        self.end_headers()
+        self.wfile.write(PAYLOAD)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeYoutubeIE(InfoExtractor):
+    IE_NAME = "fakeyoutube"
+    _VALID_URL = r"fake://(?P<id>[\w-]+)"
+    extract_delay = 0.0
+    media_url = ""
+    extractions = 0
+
+    def _real_extract(self, url):
+        video_id = self._match_id(url)
+        FakeYoutubeIE.extractions += 1
+        time.sleep(self.extract_delay)
+        return {
+            "id": video_id,
+            "title": f"fake track {video_id}",
+            "duration": 180,
+            "webpage_url": url,
+            "formats": [{
+                "format_id": "251",
+                "url": f"{self.media_url}/{video_id}.webm",
+                "ext": "webm",
+                "acodec": "opus",
+                "vcodec": "none",
+                "abr": 128,
+                "asr": 48000,
+                "filesize": len(PAYLOAD),
+            }],
+        }
+
+
+def make_downloader(outdir: str, name: str):
+    downloader = yt_dlp.YoutubeDL({
+        "format": "bestaudio[protocol^=http]/bestaudio/best[protocol^=http]/best",
+        "outtmpl": os.path.join(outdir, f"{name}-%(id)s.%(ext)s"),
+        "quiet": True,
+        "no_warnings": True,
+        "noprogress": True,
+    }, auto_init=False)
+    downloader.add_info_extractor(FakeYoutubeIE())
+    return downloader
+
+
+def run_flow(outdir: str, url: str, *, reuse_info: bool) -> float:
+    started = time.perf_counter()
+    info = make_downloader(outdir, "probe").extract_info(url, download=False)
+    # fetch_track's duration/size/permission checks run here, before any download.
+    assert info.get("duration") and info.get("filesize")
+    downloader = make_downloader(outdir, "reuse" if reuse_info else "double")
+    if reuse_info:
+        data = media_cache.download_resolved(downloader, url, info)
+    else:
+        data = downloader.extract_info(url, download=True)
+    elapsed = time.perf_counter() - started
+    path = downloader.prepare_filename(data)
+    assert os.path.getsize(path) == len(PAYLOAD), path
+    os.remove(path)
+    return elapsed
+
+
+def summarize(label: str, samples: list, extractions: int) -> str:
+    return (
+        f"{label:<22} mean {statistics.mean(samples) * 1000:8.1f} ms  "
+        f"median {statistics.median(samples) * 1000:8.1f} ms  "
+        f"extractions/miss {extractions / len(samples):.1f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--extract-delay", type=float, default=0.25, help="seconds per fake extraction")
+    args = parser.parse_args()
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), PayloadHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    FakeYoutubeIE.media_url = f"http://127.0.0.1:{server.server_address[1]}"
+    FakeYoutubeIE.extract_delay = args.extract_delay
+
+    results = {}
+    with tempfile.TemporaryDirectory() as outdir:
+        for label, reuse_info in (("before (extract twice)", False), ("after (reuse info)", True)):
+            FakeYoutubeIE.extractions = 0
+            samples = [
+                run_flow(outdir, f"fake://track{index}", reuse_info=reuse_info)
+                for index in range(args.runs)
+            ]
+            results[label] = samples
+            print(summarize(label, samples, FakeYoutubeIE.extractions))
+    server.shutdown()
+
+    before, after = (statistics.mean(samples) for samples in results.values())
+    print(f"per-miss saving: {(before - after) * 1000:.1f} ms ({(1 - after / before) * 100:.0f}%)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,422 @@
+"""
+Append-only JSON Lines event logs.
+
+The runtime audit used to be a single JSON list that was read, extended and
+rewritten on every event, so each append cost O(log size) and ran on the event
+loop. JsonlLog keeps the log as one JSON object per line instead:
+
+    runtime-audit.jsonl        current segment, appended to
+    runtime-audit.jsonl.1      previous segment
+    ...
+    runtime-audit.jsonl.N      oldest kept segment
+
+Appends go through a buffered file handle that is flushed to the OS after
+every event and fsync'd at most every fsync_interval seconds (and on close),
+so a crash loses at most that window of events and never corrupts earlier
+ones. The current segment rotates when it passes max_bytes or gets older
+than max_age seconds.
+
+read_tail() returns the last N events by seeking backwards from the end of
+the file, so readers never load the whole log; read_tail_segments() keeps
+going into the rotated segments when the current one is short.
+event_count() and total_event_count() count the current segment (and the
+kept rotated ones) once and then keep the numbers up to date as events are
+appended and segments rotate.
+
+EventSink takes appends off the caller's path entirely: events go into an
+in-memory backlog and one background task writes them, grouping everything
+that arrived together into a single write and fsync per log.
+"""
+import asyncio
+import collections
+import json
+import logging
+import os
+import threading
+import time
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+TAIL_BLOCK_SIZE = 64 * 1024
+
+
+def _rotated_path(path: str, index: int) -> str:
+    return f"{path}.{index}"
+
+
+def _rotated_paths(path: str) -> list:
+    """Existing rotated segments of *path*, newest first."""
+    paths = []
+    while os.path.isfile(_rotated_path(path, len(paths) + 1)):
+        paths.append(_rotated_path(path, len(paths) + 1))
+    return paths
+
+
+class JsonlLog:
+    """
+    A size- and age-rotated, append-only JSONL file. Thread-safe.
+
+    max_bytes or max_age of 0 disables that rotation trigger; backups=None
+    keeps every rotated segment instead of dropping the oldest.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        *,
+        max_bytes: int = 5 * 1024 * 1024,
+        max_age: float = 7 * 24 * 60 * 60,
+        backups: Optional[int] = 5,
+        fsync_interval: float = 5.0,
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.backups = backups
+        self.fsync_interval = fsync_interval
+        self._lock = threading.Lock()
+        self._file = None
+        self._size = 0
+        self._count: Optional[int] = None
+        self._segment_counts: Optional[list] = None  # events in path.1, path.2, ...
+        self._segment_started = 0.0
+        self._last_fsync = 0.0
+        self._dirty = False
+
+    # ------------------------------------------------------------------
+    # Opening / rotation
+    # ------------------------------------------------------------------
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._size = self._file.tell()
+        self._segment_started = self._first_timestamp() or time.time()
+        self._last_fsync = time.monotonic()
+
+    def _first_timestamp(self) -> Optional[float]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                first = f.readline()
+            return float(json.loads(first).get("timestamp")) if first.strip() else None
+        except (OSError, ValueError, TypeError, AttributeError):
+            return None
+
+    def _should_rotate(self, now: float) -> bool:
+        if self._size <= 0:
+            return False
+        if self.max_bytes and self._size >= self.max_bytes:
+            return True
+        return bool(self.max_age) and now - self._segment_started >= self.max_age
+
+    def _rotate(self):
+        self._close_file()
+        newest = self.backups
+        if newest is None:
+            newest = 1
+            while os.path.exists(_rotated_path(self.path, newest)):
+                newest += 1
+        for index in range(newest - 1, 0, -1):
+            source = _rotated_path(self.path, index)
+            if os.path.exists(source):
+                os.replace(source, _rotated_path(self.path, index + 1))
+        if self.backups is None or self.backups > 0:
+            os.replace(self.path, _rotated_path(self.path, 1))
+        else:
+            os.remove(self.path)
+        logger.info(f"Rotated event log {self.path}")
+        if self._segment_counts is not None and self._count is not None:
+            counts = [self._count] + self._segment_counts
+            self._segment_counts = counts if self.backups is None else counts[:self.backups]
+        else:
+            self._segment_counts = None
+        self._open()
+        self._count = 0
+
+    def _close_file(self):
+        if self._file is None:
+            return
+        try:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        finally:
+            self._file.close()
+            self._file = None
+            self._dirty = False
+
+    # ------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------
+
+    def append(self, entry: dict):
+        self.append_many([entry])
+
+    def append_many(self, entries: list):
+        """Append events as one write; fsync if the interval has passed."""
+        if not entries:
+            return
+        payload = "".join(json.dumps(entry, ensure_ascii=False, default=str) + "\n" for entry in entries)
+        with self._lock:
+            if self._file is None:
+                self._open()
+            now = time.time()
+            if self._should_rotate(now):
+                self._rotate()
+            if self._size == 0:
+                self._segment_started = now
+            self._file.write(payload)
+            self._file.flush()
+            self._size += len(payload.encode("utf-8"))
+            if self._count is not None:
+                self._count += len(entries)
+            self._dirty = True
+            if time.monotonic() - self._last_fsync >= self.fsync_interval:
+                self._fsync_locked()
+
+    def _fsync_locked(self):
+        if self._file is None or not self._dirty:
+            return
+        os.fsync(self._file.fileno())
+        self._last_fsync = time.monotonic()
+        self._dirty = False
+
+    def sync(self):
+        """fsync anything appended since the last fsync."""
+        with self._lock:
+            self._fsync_locked()
+
+    def close(self):
+        with self._lock:
+            self._close_file()
+
+    def event_count(self) -> int:
+        """Events in the current segment. Reads the file on the first call only."""
+        with self._lock:
+            if self._count is None:
+                self._count = count_events(self.path)
+            return self._count
+
+    def total_event_count(self) -> int:
+        """Events in the current and every kept rotated segment. Reads each file on the first call only."""
+        with self._lock:
+            if self._count is None:
+                self._count = count_events(self.path)
+            if self._segment_counts is None:
+                self._segment_counts = [count_events(path) for path in _rotated_paths(self.path)]
+            return self._count + sum(self._segment_counts)
+
+    # ------------------------------------------------------------------
+    # Migration
+    # ------------------------------------------------------------------
+
+    def migrate_json_list(self, legacy_path: str) -> int:
+        """
+        One-time import of a legacy JSON-list log. The events are placed before
+        anything already in the JSONL file and the legacy file is renamed to
+        <legacy_path>.migrated. Returns the number of events imported.
+        """
+        if not os.path.isfile(legacy_path):
+            return 0
+        with open(legacy_path, "r", encoding="utf-8") as f:
+            events = json.load(f)
+        if not isinstance(events, list):
+            raise ValueError(f"{legacy_path} is not a JSON list")
+        with self._lock:
+            self._close_file()
+            tmp_path = f"{self.path}.migrating"
+            with open(tmp_path, "w", encoding="utf-8") as out:
+                for event in events:
+                    out.write(json.dumps(event, ensure_ascii=False, default=str) + "\n")
+                if os.path.isfile(self.path):
+                    with open(self.path, "r", encoding="utf-8") as current:
+                        for line in current:
+                            out.write(line)
+                out.flush()
+                os.fsync(out.fileno())
+            os.replace(tmp_path, self.path)
+            os.replace(legacy_path, f"{legacy_path}.migrated")
+            self._count = None
+            self._segment_counts = None
+        logger.info(f"Migrated {len(events)} event(s) from {legacy_path} to {self.path}")
+        return len(events)
+
+
+# ----------------------------------------------------------------------
+# Batched background writer
+# ----------------------------------------------------------------------
+
+class EventSink:
+    """
+    Batches events for a set of named JsonlLogs and writes them from one task.
+
+    submit() only appends to an in-memory backlog, so callers never wait on
+    disk. The writer task wakes on new events, lingers briefly so bursts land
+    in one batch, then writes each log's share of the batch with one write and
+    one fsync (group commit). The backlog is bounded: when it reaches
+    max_backlog the submitting caller writes the backlog itself, which slows
+    producers down to disk speed instead of growing memory without limit.
+    Before start() and after close() events are written inline.
+    """
+
+    def __init__(self, logs: dict, *, max_backlog: int = 10000, max_batch: int = 500, linger: float = 0.05):
+        self.logs = logs
+        self.max_backlog = max_backlog
+        self.max_batch = max_batch
+        self.linger = linger
+        self._backlog: collections.deque = collections.deque()
+        self._write_lock = threading.Lock()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+        self.written = 0
+        self.batches = 0
+        self.backpressure_flushes = 0
+        self.failed = 0
+        self.max_backlog_seen = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """Start the writer task on the running event loop."""
+        if self.running:
+            return
+        self._closing = False
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        if self._backlog:
+            self._wakeup.set()
+
+    def submit(self, name: str, entry: dict):
+        if name not in self.logs:
+            raise KeyError(f"Unknown event log {name!r}")
+        self._backlog.append((name, entry))
+        self.max_backlog_seen = max(self.max_backlog_seen, len(self._backlog))
+        if not self.running or self._closing:
+            self.drain_sync()
+        elif len(self._backlog) >= self.max_backlog:
+            self.backpressure_flushes += 1
+            logger.warning(f"Event sink backlog reached {len(self._backlog)}; writing it inline.")
+            self.drain_sync()
+        else:
+            self._wakeup.set()
+
+    def _write_next(self, limit: Optional[int]):
+        """Take up to *limit* backlog events and write them, in order."""
+        # Taking and writing under one lock keeps an inline drain from overtaking an older batch.
+        with self._write_lock:
+            batch = []
+            while self._backlog and (limit is None or len(batch) < limit):
+                batch.append(self._backlog.popleft())
+            if not batch:
+                return
+            grouped: dict = {}
+            for name, entry in batch:
+                grouped.setdefault(name, []).append(entry)
+            for name, entries in grouped.items():
+                log = self.logs[name]
+                try:
+                    log.append_many(entries)
+                    log.sync()
+                    self.written += len(entries)
+                except Exception as exc:
+                    self.failed += len(entries)
+                    logger.error(f"Failed to write {len(entries)} event(s) to {log.path}: {exc}")
+            self.batches += 1
+
+    def drain_sync(self):
+        """Write the whole backlog from the calling thread."""
+        self._write_next(None)
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            if self.linger and not self._closing:
+                await asyncio.sleep(self.linger)
+            self._wakeup.clear()
+            while self._backlog:
+                await asyncio.to_thread(self._write_next, self.max_batch)
+            if self._closing:
+                return
+
+    async def close(self):
+        """Flush the backlog, stop the writer and close every log."""
+        if self.running:
+            self._closing = True
+            self._wakeup.set()
+            await self._task
+        self.shutdown()
+
+    def shutdown(self):
+        """Synchronous close for when the event loop is already gone."""
+        self.drain_sync()
+        for log in self.logs.values():
+            log.close()
+
+    def metrics(self) -> dict:
+        return {
+            "backlog": len(self._backlog),
+            "max_backlog_seen": self.max_backlog_seen,
+            "written": self.written,
+            "batches": self.batches,
+            "backpressure_flushes": self.backpressure_flushes,
+            "failed": self.failed,
+        }
+
+
+# ----------------------------------------------------------------------
+# Reading
+# ----------------------------------------------------------------------
+
+def read_tail(path: str, limit: int) -> list:
+    """Return up to *limit* of the newest events in *path*, oldest first."""
+    if limit <= 0 or not os.path.isfile(path):
+        return []
+    lines = []
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        remainder = b""
+        while position > 0 and len(lines) <= limit:
+            step = min(TAIL_BLOCK_SIZE, position)
+            position -= step
+            f.seek(position)
+            block = f.read(step) + remainder
+            parts = block.split(b"\n")
+            remainder = parts.pop(0)
+            lines[:0] = [part for part in parts if part.strip()]
+        if position == 0 and remainder.strip():
+            lines.insert(0, remainder)
+    events = []
+    for raw in lines[-limit:]:
+        try:
+            events.append(json.loads(raw))
+        except ValueError:
+            # A torn final line from a crash mid-write; skip it.
+            continue
+    return events
+
+
+def read_tail_segments(path: str, limit: int) -> list:
+    """read_tail() that continues into path.1, path.2, ... while fewer than *limit* events were found."""
+    events = read_tail(path, limit)
+    for older in _rotated_paths(path):
+        if len(events) >= limit:
+            break
+        events[:0] = read_tail(older, limit - len(events))
+    return events
+
+
+def count_events(path: str) -> int:
+    """Number of events in *path*, counted without parsing them."""
+    if not os.path.isfile(path):
+        return 0
+    total = 0
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(1024 * 1024)
+            if not block:
+                return total
+            total += block.count(b"\n")
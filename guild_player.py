@@ -0,0 +1,299 @@
+"""
+Per-guild playback state.
+
+Everything a voice session owns used to hang off the Client singleton and a
+module-level queue, so one process could serve exactly one guild. A
+GuildPlayer now holds that state for one guild:
+
+    queue                 upcoming tracks (a TrackQueue)
+    current track         id, info, now-playing message, playback clock
+    history               last track, session history (a bounded deque), played ids, queue backup
+    votes                 active voice votes
+    volume / speed        session volume, volume lock, playback speed
+    repeat                repeat-one flag, track id and disable history
+    timers                auto-leave, alone speed reset and prefetch tasks
+
+GuildPlayers creates players on demand and tracks which guild the running
+code is acting for in a context variable. Each slash command, event handler
+and playback callback activates its guild before touching playback state;
+tasks started from there inherit it. Code outside any guild (startup,
+background loops that don't iterate players) sees the default guild, which
+keeps single-guild deployments working unchanged.
+
+The Client's playback attributes (client.current_track_info and friends)
+and main.py's module-level queue stay as names, but resolve to the active
+guild's player, so the existing command code needed no new parameters.
+Caches, the download catalog and the yt-dlp executor stay process-wide and
+are shared by every guild.
+"""
+import collections
+import contextlib
+import contextvars
+import functools
+import time
+from collections.abc import MutableSequence
+from dataclasses import dataclass, field, fields
+from typing import Callable, Iterator, Optional
+
+from track_queue import TrackQueue
+
+_active_guild: contextvars.ContextVar = contextvars.ContextVar("active_guild", default=None)
+
+
+@dataclass
+class GuildPlayer:
+    guild_id: int
+    queue: TrackQueue = field(default_factory=TrackQueue)
+    # Voice and playback state
+    current_voice_channel: object = None      # discord.VoiceClient when connected
+    currently_playing: bool = False
+    volume: float = 0.2
+    session_volume_locked: bool = False
+    playback_speed: float = 1.0
+    current_track_id: Optional[str] = None
+    current_track_info: Optional[dict] = None
+    last_track_info: Optional[dict] = None
+    current_track_message: object = None      # discord.Message for the "Now Playing" announcement
+    current_track_message_show_queue: bool = False
+    current_track_message_show_url: bool = True
+    current_track_favorite_notice: str = ""
+    current_track_started_at: Optional[float] = None
+    current_track_offset: float = 0.0          # seconds into the track the running source started at
+    current_track_rate: float = 1.0            # track seconds per second: the running source's speed
+    current_track_paused_at: Optional[float] = None
+    current_track_paused_seconds: float = 0.0  # time the running source spent paused
+    source_swap_pending: bool = False          # the next "after" callback is for a replaced source
+    track_ended_at: Optional[float] = None    # time.monotonic() when the last track finished
+    # Queue and history tracking
+    song_history: collections.deque = field(default_factory=collections.deque)
+    queue_backup: Optional[list] = None
+    backup_timestamp: Optional[float] = None
+    played_tracks: set = field(default_factory=set)
+    active_voice_votes: dict = field(default_factory=dict)
+    repeat_current_track: bool = False
+    repeat_track_id: Optional[str] = None
+    repeat_disable_history: list = field(default_factory=list)
+    # Timers
+    auto_leave_task: object = None
+    alone_speed_reset_task: object = None
+    auto_leave_disconnect_in_progress: bool = False
+    queue_prefetch_task: object = None
+    queue_prefetch_pending: bool = False
+
+    @property
+    def idle(self) -> bool:
+        """No voice connection, nothing playing and nothing queued."""
+        return self.current_voice_channel is None and not self.current_track_info and not self.queue
+
+    # ------------------------------------------------------------------
+    # Playback clock
+    # ------------------------------------------------------------------
+
+    def start_clock(self, *, offset: float = 0.0, rate: float = 1.0, now: Optional[float] = None):
+        """Time a new audio source that starts *offset* seconds into the track and plays at *rate*."""
+        self.current_track_started_at = time.time() if now is None else now
+        self.current_track_offset = max(0.0, float(offset or 0.0))
+        self.current_track_rate = float(rate or 1.0)
+        self.current_track_paused_at = None
+        self.current_track_paused_seconds = 0.0
+
+    def pause_clock(self, now: Optional[float] = None):
+        if self.current_track_started_at is not None and self.current_track_paused_at is None:
+            self.current_track_paused_at = time.time() if now is None else now
+
+    def resume_clock(self, now: Optional[float] = None):
+        if self.current_track_paused_at is None:
+            return
+        now = time.time() if now is None else now
+        self.current_track_paused_seconds += max(0.0, now - self.current_track_paused_at)
+        self.current_track_paused_at = None
+
+    @property
+    def clock_paused(self) -> bool:
+        return self.current_track_paused_at is not None
+
+    def playback_position(self, now: Optional[float] = None) -> Optional[float]:
+        """Seconds into the current track, net of pauses and scaled by speed; None when nothing is timed."""
+        if self.current_track_started_at is None:
+            return None
+        now = time.time() if now is None else now
+        if self.current_track_paused_at is not None:
+            now = min(now, self.current_track_paused_at)
+        played = max(0.0, now - self.current_track_started_at - self.current_track_paused_seconds)
+        return self.current_track_offset + played * self.current_track_rate
+
+
+# Attributes the Client forwards to the active guild's player.
+PLAYER_FIELDS = tuple(item.name for item in fields(GuildPlayer) if item.name not in ("guild_id", "queue"))
+
+
+def _guild_id(value) -> Optional[int]:
+    """A guild id from an int, a guild, or anything with a .guild or .guild_id."""
+    if value is None:
+        return None
+    if isinstance(value, int):
+        return value or None
+    guild_id = getattr(value, "guild_id", None)
+    if guild_id is None:
+        # A channel, member or message; one outside a guild (a DM) has guild None.
+        target = getattr(value, "guild") if hasattr(value, "guild") else value
+        guild_id = getattr(target, "id", None)
+    try:
+        return int(guild_id) or None
+    except (TypeError, ValueError):
+        return None
+
+
+class GuildPlayers:
+    """GuildPlayer registry keyed by guild id, plus the active-guild context."""
+
+    def __init__(self, default_guild_id: int, *, volume: float = 0.2, history_limit: Optional[int] = None,
+                 queue_listener: Optional[Callable] = None):
+        self.default_guild_id = int(default_guild_id)
+        self.volume = volume
+        self.history_limit = history_limit
+        # Called as queue_listener(guild_id, op, *args) for every queue change (see TrackQueue).
+        self.queue_listener = queue_listener
+        self._players: dict = {}
+
+    def get(self, guild=None) -> GuildPlayer:
+        """The player for *guild* (id, guild or context object), the default guild for None."""
+        guild_id = _guild_id(guild) or self.default_guild_id
+        player = self._players.get(guild_id)
+        if player is None:
+            player = self._players[guild_id] = GuildPlayer(
+                guild_id, volume=self.volume, song_history=collections.deque(maxlen=self.history_limit),
+            )
+            if self.queue_listener is not None:
+                player.queue.listener = functools.partial(self.queue_listener, guild_id)
+        return player
+
+    def peek(self, guild) -> Optional[GuildPlayer]:
+        """The player for *guild* if one was created, without creating it."""
+        return self._players.get(_guild_id(guild) or self.default_guild_id)
+
+    def current(self) -> GuildPlayer:
+        return self.get(_active_guild.get())
+
+    def activate(self, guild) -> GuildPlayer:
+        """Make *guild* the active guild for the running task or callback."""
+        guild_id = _guild_id(guild)
+        if guild_id is not None:
+            _active_guild.set(guild_id)
+        return self.current()
+
+    @contextlib.contextmanager
+    def using(self, guild) -> Iterator[GuildPlayer]:
+        """Run a block with *guild* active, restoring the previous guild afterwards."""
+        token = _active_guild.set(_guild_id(guild) or self.default_guild_id)
+        try:
+            yield self.current()
+        finally:
+            _active_guild.reset(token)
+
+    def all(self) -> list:
+        return list(self._players.values())
+
+    def __len__(self) -> int:
+        return len(self._players)
+
+    def metrics(self) -> dict:
+        players = self.all()
+        return {
+            "guilds": len(players),
+            "active": sum(1 for player in players if not player.idle),
+            "queued": sum(len(player.queue) for player in players),
+        }
+
+
+def delegate_player_fields(cls, registry_attribute: str = "players"):
+    """Give *cls* a property per PLAYER_FIELDS entry that reads and writes the active player."""
+    def make(name: str):
+        def fget(self):
+            return getattr(getattr(self, registry_attribute).current(), name)
+
+        def fset(self, value):
+            setattr(getattr(self, registry_attribute).current(), name, value)
+
+        return property(fget, fset, doc=f"Active guild's GuildPlayer.{name}.")
+
+    for name in PLAYER_FIELDS:
+        setattr(cls, name, make(name))
+    return cls
+
+
+class ActiveQueue(MutableSequence):
+    """Stand-in for a TrackQueue that forwards to the active guild's queue."""
+
+    def __init__(self, players: GuildPlayers):
+        self._players = players
+
+    @property
+    def target(self) -> TrackQueue:
+        return self._players.current().queue
+
+    def __len__(self) -> int:
+        return len(self.target)
+
+    def __getitem__(self, position):
+        return self.target[position]
+
+    def __setitem__(self, position, value):
+        self.target[position] = value
+
+    def __delitem__(self, position):
+        del self.target[position]
+
+    def __iter__(self):
+        return iter(self.target)
+
+    def __reversed__(self):
+        return reversed(self.target)
+
+    def __contains__(self, track) -> bool:
+        return track in self.target
+
+    def __bool__(self) -> bool:
+        return bool(self.target)
+
+    def __eq__(self, other) -> bool:
+        return self.target == other
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"ActiveQueue({list(self.target)!r})"
+
+    def __add__(self, other) -> list:
+        return self.target + other
+
+    def __iadd__(self, other):
+        self.target.extend(other)
+        return self
+
+    def insert(self, position: int, track):
+        self.target.insert(position, track)
+
+    def append(self, track):
+        self.target.append(track)
+
+    def extend(self, tracks):
+        self.target.extend(tracks)
+
+    def pop(self, position: int = -1):
+        return self.target.pop(position)
+
+    def remove(self, track):
+        self.target.remove(track)
+
+    def clear(self):
+        self.target.clear()
+
+    def reverse(self):
+        self.target.reverse()
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        # popleft, move, remove_where, positions_of_video, block_span, ...
+        return getattr(self.target, name)
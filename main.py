@@ -1,4 +1,15 @@
 import quotes
+import media_cache
+import ytdl_executor
+import stream_cache
+import event_log
+import track_catalog
+import playlist_repository
+import search_index
+import query_cache
+import guild_player
+import track_record
+import queue_journal
 
 import discord
 from discord import app_commands
@@ -19,6 +30,8 @@ import sys
 import math
 import importlib.util
 import random
+import shlex
+import collections
 from dataclasses import dataclass, field
 from typing import Optional
 
@@ -35,12 +48,22 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 load_dotenv(os.path.join(BASE_DIR, ".env"))
 CACHE_DIR = os.path.join(BASE_DIR, "cache")
 os.makedirs(CACHE_DIR, exist_ok=True)
-downloads_file = os.path.join(BASE_DIR, "downloads.json")
+# Every cache lookup goes through this in-memory index instead of listing CACHE_DIR.
+cache_index = media_cache.CacheIndex(CACHE_DIR, SAFE_MEDIA_EXTENSIONS)
+cache_index.rebuild()
+LEGACY_DOWNLOADS_FILE = os.path.join(BASE_DIR, "downloads.json")
+TRACK_CATALOG_FILE = os.path.join(BASE_DIR, "tracks.sqlite3")
+SEARCH_QUERY_CACHE_FILE = os.path.join(BASE_DIR, "search-queries.sqlite3")
 LAST_SESSION_QUEUE_FILE = os.path.join(BASE_DIR, "last_session_queue.tmp.json")
+QUEUE_JOURNAL_FILE = os.path.join(BASE_DIR, "queue-journal.jsonl")
 PLAYLISTS_DIR = os.path.join(BASE_DIR, "playlists")
-PLAYLIST_BLACKBOX_FILE = os.path.join(BASE_DIR, "playlists-blackbox.json")
-QUEUE_BLACKBOX_FILE = os.path.join(BASE_DIR, "queue-blackbox.json")
-RUNTIME_AUDIT_FILE = os.path.join(BASE_DIR, "runtime-audit.json")
+playlist_repo = playlist_repository.repository_for(PLAYLISTS_DIR)
+PLAYLIST_BLACKBOX_FILE = os.path.join(BASE_DIR, "playlists-blackbox.jsonl")
+QUEUE_BLACKBOX_FILE = os.path.join(BASE_DIR, "queue-blackbox.jsonl")
+LEGACY_PLAYLIST_BLACKBOX_FILE = os.path.join(BASE_DIR, "playlists-blackbox.json")
+LEGACY_QUEUE_BLACKBOX_FILE = os.path.join(BASE_DIR, "queue-blackbox.json")
+RUNTIME_AUDIT_FILE = os.path.join(BASE_DIR, "runtime-audit.jsonl")
+LEGACY_RUNTIME_AUDIT_FILE = os.path.join(BASE_DIR, "runtime-audit.json")
 PLAYLIST_CACHE_POLICY_FILE = os.path.join(BASE_DIR, "playlist-cache-policy.json")
 CHANNEL_VOLUME_CONFIG_FILE = os.path.join(BASE_DIR, "channel-volume-config.json")
 USER_PERMISSIONS_FILE = os.path.join(BASE_DIR, "user-permissions.json")
@@ -81,6 +104,7 @@ DEFAULT_BOT_PRESENCE = "/play (yt-link)"
 UNKNOWN_BOT_PRESENCE = "???"
 BOT_PRESENCE_MAX_LENGTH = 120
 LAST_SESSION_RECOVERY_MAX_AGE_SECONDS = 1800
+LAST_SESSION_RECOVERY_REASONS = ("auto_leave", "restart", "disconnect")
 VOICE_VOTE_TIMEOUT_SECONDS = 45
 REPEAT_TOGGLE_RECENT_SECONDS = 300
 REPEAT_TOGGLE_VOTE_THRESHOLD = 2
@@ -116,6 +140,63 @@ SPOTIFY_ENABLED = env_flag("SPOTIFY_ENABLED", True)   # default on — no API ke
 WEBUI_ENABLED   = env_flag("WEBUI_ENABLED",   True)   # default on — auto-setup handles everything
 WEBUI_PUBLIC_URL = os.getenv("WEBUI_PUBLIC_URL", "").rstrip("/")
 TV_ENABLED = env_flag("TV_ENABLED", False)
+OPUS_PASSTHROUGH_ENABLED = env_flag("OPUS_PASSTHROUGH_ENABLED", True)
+PROGRESSIVE_DOWNLOADS_ENABLED = env_flag("PROGRESSIVE_DOWNLOADS_ENABLED", True)
+PROGRESSIVE_START_BYTES = env_int("PROGRESSIVE_START_BYTES", 256 * 1024, 16 * 1024)
+PROGRESSIVE_STALL_SECONDS = env_int("PROGRESSIVE_STALL_SECONDS", 30, 5)
+STREAM_CACHE_TEE_ENABLED = env_flag("STREAM_CACHE_TEE_ENABLED", False)
+STREAM_CACHE_TEE_MAX_BYTES = env_int("STREAM_CACHE_TEE_MAX_BYTES", 250 * 1024 * 1024, 1024 * 1024)
+CACHE_INDEX_RECONCILE_SECONDS = env_int("CACHE_INDEX_RECONCILE_SECONDS", 300, 30)
+CACHE_EVICTION_POLICY = (os.getenv("CACHE_EVICTION_POLICY") or "lru").strip().lower()
+if CACHE_EVICTION_POLICY not in media_cache.EVICTION_POLICIES:
+    raise RuntimeError(f"CACHE_EVICTION_POLICY must be one of: {', '.join(sorted(media_cache.EVICTION_POLICIES))}.")
+cache_evictor = media_cache.CacheEvictor(cache_index, media_cache.make_eviction_policy(CACHE_EVICTION_POLICY))
+YTDL_INTERACTIVE_WORKERS = env_int("YTDL_INTERACTIVE_WORKERS", 4, 1)
+YTDL_PREFETCH_WORKERS = env_int("YTDL_PREFETCH_WORKERS", 2, 1)
+YTDL_WARMUP_WORKERS = env_int("YTDL_WARMUP_WORKERS", 2, 1)
+PLAYLIST_WARMUP_CONCURRENCY = env_int("PLAYLIST_WARMUP_CONCURRENCY", YTDL_WARMUP_WORKERS, 1)
+ytdl_pool = ytdl_executor.YtdlExecutor({
+    ytdl_executor.INTERACTIVE: YTDL_INTERACTIVE_WORKERS,
+    ytdl_executor.PREFETCH: YTDL_PREFETCH_WORKERS,
+    ytdl_executor.WARMUP: YTDL_WARMUP_WORKERS,
+})
+ytdl_flights = ytdl_executor.SingleFlight()
+STREAM_URL_REFRESH_MARGIN_SECONDS = env_int("STREAM_URL_REFRESH_MARGIN_SECONDS", 300, 30)
+STREAM_URL_REFRESH_INTERVAL_SECONDS = 60
+PREFETCH_LOOKAHEAD_TRACKS = env_int("PREFETCH_LOOKAHEAD_TRACKS", 2, 0)
+TRACK_GAP_SAMPLE_SIZE = 50
+stream_url_cache = stream_cache.StreamUrlCache(refresh_margin=STREAM_URL_REFRESH_MARGIN_SECONDS)
+# Plain-text searches remember the video they resolved to; misses are remembered briefly.
+SEARCH_QUERY_CACHE_TTL_SECONDS = env_int("SEARCH_QUERY_CACHE_TTL_SECONDS", 7 * 24 * 60 * 60, 60)
+SEARCH_QUERY_NEGATIVE_TTL_SECONDS = env_int("SEARCH_QUERY_NEGATIVE_TTL_SECONDS", 600, 0)
+SEARCH_QUERY_CACHE_MAX_ENTRIES = env_int("SEARCH_QUERY_CACHE_MAX_ENTRIES", 20000, 100)
+RUNTIME_AUDIT_MAX_BYTES = env_int("RUNTIME_AUDIT_MAX_BYTES", 5 * 1024 * 1024, 64 * 1024)
+RUNTIME_AUDIT_ROTATE_SECONDS = env_int("RUNTIME_AUDIT_ROTATE_SECONDS", 7 * 24 * 60 * 60, 60)
+RUNTIME_AUDIT_BACKUPS = env_int("RUNTIME_AUDIT_BACKUPS", 5, 0)
+RUNTIME_AUDIT_FSYNC_SECONDS = env_int("RUNTIME_AUDIT_FSYNC_SECONDS", 5, 0)
+runtime_audit_log = event_log.JsonlLog(
+    RUNTIME_AUDIT_FILE,
+    max_bytes=RUNTIME_AUDIT_MAX_BYTES,
+    max_age=RUNTIME_AUDIT_ROTATE_SECONDS,
+    backups=RUNTIME_AUDIT_BACKUPS,
+    fsync_interval=RUNTIME_AUDIT_FSYNC_SECONDS,
+)
+BLACKBOX_SEGMENT_MAX_BYTES = env_int("BLACKBOX_SEGMENT_MAX_BYTES", 5 * 1024 * 1024, 64 * 1024)
+BLACKBOX_MAX_BACKLOG = env_int("BLACKBOX_MAX_BACKLOG", 10000, 100)
+# Blackbox logs are permanent history: segments rotate by size only and are never dropped.
+blackbox_sink = event_log.EventSink({
+    "queue": event_log.JsonlLog(QUEUE_BLACKBOX_FILE, max_bytes=BLACKBOX_SEGMENT_MAX_BYTES, max_age=0, backups=None),
+    "playlist": event_log.JsonlLog(PLAYLIST_BLACKBOX_FILE, max_bytes=BLACKBOX_SEGMENT_MAX_BYTES, max_age=0, backups=None),
+}, max_backlog=BLACKBOX_MAX_BACKLOG)
+for _event_log, _legacy_path in (
+    (runtime_audit_log, LEGACY_RUNTIME_AUDIT_FILE),
+    (blackbox_sink.logs["queue"], LEGACY_QUEUE_BLACKBOX_FILE),
+    (blackbox_sink.logs["playlist"], LEGACY_PLAYLIST_BLACKBOX_FILE),
+):
+    try:
+        _event_log.migrate_json_list(_legacy_path)
+    except Exception as exc:
+        logger.error(f"Failed to migrate {_legacy_path}; leaving it in place: {exc}")
 
 # ---------------------------------------------------------------------------
 # Bot singleton: kill any existing instance before starting
@@ -342,6 +423,7 @@ def remove_download_file(file_path: str, *, video_id: Optional[str] = None, reas
         return False
     try:
         os.remove(file_path)
+        cache_index.discard(file_path)
         logger.info(f"Removed downloaded media file during {reason or 'cleanup'}: {file_path}")
         append_runtime_audit_event("media-file-deleted", details={
             "video_id": video_id,
@@ -353,12 +435,20 @@ def remove_download_file(file_path: str, *, video_id: Optional[str] = None, reas
         logger.error(f"Error removing downloaded media file {file_path}: {e}")
         return False
 
-def save_downloads_metadata(context: str):
+def catalog_cached_track(video_id: str, *, title: str, file_path: str, cache_key: Optional[str]):
+    """Record (or refresh) a short-term cache file in the downloads catalog; a pending expiry is kept."""
     try:
-        with open(downloads_file, 'w') as f:
-            json.dump(downloaded, f)
+        downloads_catalog.upsert(
+            video_id,
+            path=metadata_path_for_cache_file(file_path),
+            cache_key=cache_key,
+            size=cache_index.size_of(file_path),
+            ext=os.path.splitext(file_path)[1].lstrip(".").lower(),
+            title=title,
+        )
+        track_search.add_catalog_track(video_id, title)
     except Exception as e:
-        logger.error(f"Failed to save downloads metadata after {context}: {e}")
+        logger.error(f"Failed to record {video_id} in the downloads catalog: {e}")
 
 def write_json_atomic(path: str, payload: dict):
     os.makedirs(os.path.dirname(path), exist_ok=True)
@@ -421,16 +511,7 @@ def append_runtime_audit_event(action: str, *, actor=None, details: Optional[dic
         "details": sanitize_audit_details(details),
     }
     try:
-        events = []
-        if os.path.isfile(RUNTIME_AUDIT_FILE):
-            with open(RUNTIME_AUDIT_FILE, "r") as f:
-                loaded = json.load(f)
-            if not isinstance(loaded, list):
-                logger.error("Runtime audit file is not a JSON list; preserving it without appending.")
-                return
-            events = loaded
-        events.append(entry)
-        write_json_atomic(RUNTIME_AUDIT_FILE, events)
+        runtime_audit_log.append(entry)
         logger.info(f"Runtime audit: {entry['action']} details={entry['details']}")
     except Exception as exc:
         logger.error(f"Failed to append runtime audit event: {exc}")
@@ -446,28 +527,36 @@ def canonical_cache_key_from_video_id(video_id: Optional[str]) -> Optional[str]:
         return None
     return base64url_cache_key(canonical_youtube_url(video_id))
 
-downloaded = {}
-if os.path.isfile(downloads_file):
-    try:
-        with open(downloads_file, 'r') as f:
-            downloaded = json.load(f)
-    except Exception as e:
-        logger.error(f"Could not load downloads file: {e}")
-        downloaded = {}
-
-# Remove tracks older than 1 hour (3600 seconds) from disk on startup
-current_time = time.time()
-expired_ids = []
-for vid, info in list(downloaded.items()):
-    if current_time - info.get('timestamp', 0) > 3600:
-        file_path = info.get('filepath')
-        remove_download_file(file_path, video_id=vid, reason="startup expiry")
-        expired_ids.append(vid)
-for vid in expired_ids:
-    downloaded.pop(vid, None)
-# Save updated downloads info after cleanup
-save_downloads_metadata("startup cleanup")
-CLEANED_DOWNLOADS = len(expired_ids)
+downloads_catalog = track_catalog.TrackCatalog(TRACK_CATALOG_FILE)
+search_queries = query_cache.SearchQueryCache(
+    SEARCH_QUERY_CACHE_FILE,
+    ttl=SEARCH_QUERY_CACHE_TTL_SECONDS,
+    negative_ttl=SEARCH_QUERY_NEGATIVE_TTL_SECONDS,
+    max_entries=SEARCH_QUERY_CACHE_MAX_ENTRIES,
+)
+try:
+    downloads_catalog.migrate_json(
+        LEGACY_DOWNLOADS_FILE,
+        normalize_path=lambda path: metadata_path_for_cache_file(path_from_metadata(path)) if path else None,
+        size_of=cache_index.size_of,
+    )
+except Exception as e:
+    logger.error(f"Could not migrate {LEGACY_DOWNLOADS_FILE}; leaving it in place: {e}")
+# Downloads that were never played are left alone while the bot runs and, as with the old
+# startup sweep, are deleted at the next start once they have gone an hour without use.
+downloads_catalog.schedule_idle(time.time() - track_catalog.LEGACY_EXPIRY_SECONDS, time.time())
+
+def video_id_is_cached(video_id: str) -> bool:
+    return bool(cache_index.paths_for_key(canonical_cache_key_from_video_id(video_id)))
+
+track_search = search_index.index_for(playlist_repo)
+track_search.cache_probe = video_id_is_cached
+for catalog_entry in downloads_catalog.records():
+    track_search.add_catalog_track(catalog_entry.video_id, catalog_entry.title)
+SEARCH_RESULT_LIMIT = 50
+# Discord accepts at most 25 autocomplete choices, each name at most 100 characters.
+AUTOCOMPLETE_CHOICE_LIMIT = 25
+AUTOCOMPLETE_LABEL_LENGTH = 100
 
 # Setup YouTube-DL (yt_dlp) options
 ytdl_options = {
@@ -527,18 +616,33 @@ def atempo_filter_for_speed(speed: float) -> str:
     factors.append(speed)
     return ",".join(f"atempo={factor:.6g}" for factor in factors)
 
-def ffmpeg_audio_options_for_speed(speed: Optional[float] = None, *, reconnect: bool = False) -> dict:
+def ffmpeg_audio_options_for_speed(speed: Optional[float] = None, *, reconnect: bool = False,
+                                   start_seconds: float = 0.0) -> dict:
+    """ffmpeg options for *speed*; start_seconds seeks the input so playback resumes mid-track."""
     speed = float(speed or 1.0)
     options = "-vn"
     if abs(speed - 1.0) > 0.001:
         options += f" -filter:a {atempo_filter_for_speed(speed)}"
     result = {"options": options}
+    before_options = []
+    if start_seconds and start_seconds > 0:
+        before_options.append(f"-ss {start_seconds:.3f}")
     if reconnect:
-        result["before_options"] = FFMPEG_RECONNECT_OPTIONS
+        before_options.append(FFMPEG_RECONNECT_OPTIONS)
+    if before_options:
+        result["before_options"] = " ".join(before_options)
     return result
 
 ffmpeg_options = ffmpeg_audio_options_for_speed(1.0, reconnect=True)
 
+def ffmpeg_stream_options(speed: Optional[float] = None, headers: Optional[dict] = None) -> dict:
+    """ffmpeg options for a direct media URL, sending the request headers yt-dlp resolved it with."""
+    result = ffmpeg_audio_options_for_speed(speed, reconnect=True)
+    if headers:
+        header_block = "".join(f"{name}: {value}\r\n" for name, value in headers.items())
+        result["before_options"] += f" -headers {shlex.quote(header_block)}"
+    return result
+
 def playback_speed_for_track(track: Optional[dict] = None) -> float:
     raw_speed = (track or {}).get("playback_speed") if track else None
     speed, _ = normalize_playback_speed(raw_speed if raw_speed is not None else getattr(client, "playback_speed", 1.0))
@@ -564,13 +668,20 @@ def coerce_int(value, label):
         raise RuntimeError(f"{label} must be a numeric Discord snowflake.") from None
 
 # Initialize constants and global state
-queue = []  # list of track dicts for upcoming songs
 FAVORITE_REACTION = "⭐"
 QUEUE_REACTION = "📜"
 REPEAT_REACTION = "🔂"
 CONTROL_REACTIONS = (FAVORITE_REACTION, "◀️", "⏸️", "▶️", REPEAT_REACTION, QUEUE_REACTION)
 DISCORD_MESSAGE_SAFE_LIMIT = 1900
-MAX_QUEUE_LENGTH = 50
+# Non-admin queue cap. The queue is indexed, so this can be raised into the thousands.
+MAX_QUEUE_LENGTH = env_int("MAX_QUEUE_LENGTH", 50, 1)
+# Session history and /suggestions history are ring buffers of the newest entries.
+SONG_HISTORY_LIMIT = env_int("SONG_HISTORY_LIMIT", 1000, 1)
+SUGGESTION_HISTORY_LIMIT = env_int("SUGGESTION_HISTORY_LIMIT", 200, 1)
+# Queue journal entries between snapshots; bounds what a restart has to replay.
+QUEUE_JOURNAL_SNAPSHOT_EVERY = env_int("QUEUE_JOURNAL_SNAPSHOT_EVERY", 500, 1)
+# How often the playing position is journaled; a crash resumes at most this far back.
+QUEUE_JOURNAL_POSITION_SECONDS = env_int("QUEUE_JOURNAL_POSITION_SECONDS", 5, 1)
 MIN_FREE_DOWNLOAD_MB = 512
 DOWNLOAD_DELETE_DELAY_MIN_SECONDS = 0
 DOWNLOAD_DELETE_DELAY_MAX_SECONDS = 86400
@@ -581,6 +692,65 @@ AUTO_LEAVE_MAX_DELAY_SECONDS = 3600
 BOT_TOKEN = get_env_value("BOT_TOKEN", "bot_token")
 MY_GUILD_ID = coerce_int(get_env_value("MY_GUILD", "my_guild"), "MY_GUILD")
 MY_GUILD = discord.Object(id=MY_GUILD_ID)
+# Further guilds to sync slash commands to; each one gets its own player and queue.
+EXTRA_GUILD_IDS = [
+    coerce_int(value, "EXTRA_GUILD_IDS")
+    for value in re.split(r"[\s,]+", get_env_value("EXTRA_GUILD_IDS", "extra_guild_ids", default="", required=False))
+    if value
+]
+COMMAND_GUILDS = [MY_GUILD] + [discord.Object(id=guild_id) for guild_id in dict.fromkeys(EXTRA_GUILD_IDS) if guild_id != MY_GUILD_ID]
+# Every guild's queue changes and track starts, so a restart can bring the session back.
+session_journal = queue_journal.QueueJournal(QUEUE_JOURNAL_FILE, snapshot_every=QUEUE_JOURNAL_SNAPSHOT_EVERY)
+guild_players = guild_player.GuildPlayers(
+    MY_GUILD_ID, volume=DEFAULT_VOLUME_LEVEL / 100.0, history_limit=SONG_HISTORY_LIMIT,
+    queue_listener=session_journal.queue_changed,
+)
+# Upcoming track dicts of the guild the running command or callback acts for (a TrackQueue per guild).
+queue = guild_player.ActiveQueue(guild_players)
+
+def journal_track_started(track: dict):
+    player = guild_players.current()
+    session_journal.append(
+        player.guild_id, "started",
+        track=track_record.to_dict(track), started_at=player.current_track_started_at,
+        offset=player.current_track_offset,
+    )
+
+def journal_playback_position(player: guild_player.GuildPlayer):
+    position = player.playback_position()
+    if position is not None and player.current_track_info:
+        session_journal.append(player.guild_id, "position", seconds=round(position, 3))
+
+def close_session_journal():
+    """Journal every playing guild's position, then write the final snapshot and stop journaling."""
+    for player in guild_players.all():
+        journal_playback_position(player)
+    session_journal.close()
+
+def start_playback_clock(track: dict, offset: float = 0.0):
+    """Start the active guild's playback clock for a source starting *offset* seconds into *track*."""
+    guild_players.current().start_clock(offset=offset, rate=playback_speed_for_track(track))
+
+def current_playback_position() -> Optional[float]:
+    """Seconds into the active guild's current track, net of pauses and scaled by playback speed."""
+    return guild_players.current().playback_position()
+
+def pause_playback_clock(player: Optional[guild_player.GuildPlayer] = None):
+    """Pause a guild's playback clock (the active guild's by default) and journal where it stopped."""
+    player = player or guild_players.current()
+    player.pause_clock()
+    journal_playback_position(player)
+
+def resume_playback_clock(player: Optional[guild_player.GuildPlayer] = None):
+    (player or guild_players.current()).resume_clock()
+
+async def journal_playback_positions_periodically():
+    """Journal where each playing guild is in its current track."""
+    while True:
+        await asyncio.sleep(QUEUE_JOURNAL_POSITION_SECONDS)
+        for player in guild_players.all():
+            if player.currently_playing and not player.clock_paused:
+                journal_playback_position(player)
 QUOTES_ID = coerce_int(get_env_value("QUOTES_ID", "quotes_id", default="0", required=False), "QUOTES_ID")
 
 # Admin configuration (role and specific user allowed commands like reboot etc. + extra info privileges ;))
@@ -739,38 +909,24 @@ def cache_file_size(file_path: str) -> int:
     return 0
 
 def cache_total_bytes() -> int:
-    total = 0
-    if not os.path.isdir(CACHE_DIR):
-        return 0
-    for filename in os.listdir(CACHE_DIR):
-        path = os.path.join(CACHE_DIR, filename)
-        if is_safe_cache_path(path):
-            try:
-                total += os.path.getsize(path)
-            except OSError:
-                continue
-    return total
+    return cache_index.total_bytes
 
 def cache_has_room(projected_bytes: int = 0) -> bool:
     return cache_total_bytes() + max(0, projected_bytes or 0) <= CACHE_HARD_LIMIT_BYTES
 
+def indexed_cache_paths(key: Optional[str], *, prefer_playlist: bool = True, expected_cache_key: Optional[str] = None):
+    """Yield indexed cache files for a cache key or legacy id, dropping stale index entries."""
+    for path in cache_index.paths_for_key(key, prefer_playlist=prefer_playlist):
+        if is_safe_cache_path(path, expected_cache_key):
+            yield path
+        elif not os.path.lexists(path):
+            cache_index.discard(path)
+
 def find_legacy_cache_file(video_id: Optional[str], *, prefer_playlist: bool = True) -> tuple:
-    if not video_id or not os.path.isdir(CACHE_DIR):
-        return None, False
-    try:
-        filenames = os.listdir(CACHE_DIR)
-    except OSError as exc:
-        logger.warning(f"Could not inspect cache directory for legacy file: {exc}")
+    if not video_id:
         return None, False
-    stems = [f"plst-{video_id}", video_id] if prefer_playlist else [video_id, f"plst-{video_id}"]
-    for stem in stems:
-        for filename in filenames:
-            file_stem, ext = os.path.splitext(filename)
-            if file_stem != stem or ext.lower() not in SAFE_MEDIA_EXTENSIONS:
-                continue
-            path = os.path.join(CACHE_DIR, filename)
-            if is_safe_cache_path(path):
-                return path, stem.startswith("plst-")
+    for path in indexed_cache_paths(video_id, prefer_playlist=prefer_playlist):
+        return path, os.path.basename(path).startswith("plst-")
     return None, False
 
 def adopt_legacy_cache_file(video_id: Optional[str], cache_key: Optional[str], *, prefer_playlist: bool = True) -> Optional[str]:
@@ -789,6 +945,8 @@ def adopt_legacy_cache_file(video_id: Optional[str], cache_key: Optional[str], *
         return target_path if is_safe_cache_path(target_path, cache_key) else None
     try:
         os.replace(legacy_path, target_path)
+        cache_index.discard(legacy_path)
+        cache_index.add(target_path)
     except OSError as exc:
         logger.warning(
             f"Could not adopt legacy cache file for {video_id}: "
@@ -807,25 +965,14 @@ def adopt_legacy_cache_file(video_id: Optional[str], cache_key: Optional[str], *
     return target_path if is_safe_cache_path(target_path, cache_key) else None
 
 def find_existing_cache_file(cache_key: Optional[str], *, prefer_playlist: bool = True, video_id: Optional[str] = None) -> Optional[str]:
-    if not cache_key or not os.path.isdir(CACHE_DIR):
+    if not cache_key:
         return None
     if not is_valid_cache_key(cache_key):
         logger.warning(f"Cache lookup skipped invalid cache key: {str(cache_key)[:80]}")
         return None
-    try:
-        filenames = os.listdir(CACHE_DIR)
-    except OSError as exc:
-        logger.warning(f"Could not inspect cache directory: {exc}")
-        return None
-    prefixes = [f"plst-{cache_key}.", f"{cache_key}."] if prefer_playlist else [f"{cache_key}.", f"plst-{cache_key}."]
-    for prefix in prefixes:
-        for filename in filenames:
-            if not filename.startswith(prefix):
-                continue
-            path = os.path.join(CACHE_DIR, filename)
-            if is_safe_cache_path(path, cache_key):
-                logger.debug(f"Cache hit for key={cache_key}: {metadata_path_for_cache_file(path)}")
-                return path
+    for path in indexed_cache_paths(cache_key, prefer_playlist=prefer_playlist, expected_cache_key=cache_key):
+        logger.debug(f"Cache hit for key={cache_key}: {metadata_path_for_cache_file(path)}")
+        return path
     adopted = adopt_legacy_cache_file(video_id, cache_key, prefer_playlist=prefer_playlist)
     if adopted:
         return adopted
@@ -856,6 +1003,46 @@ def cached_file_for_track(track: dict, *, prefer_playlist: bool = True) -> Optio
         return path_from_metadata(cache_path)
     return find_existing_cache_file(cache_key, prefer_playlist=prefer_playlist, video_id=video_id)
 
+async def reconcile_cache_index_periodically():
+    """Keep the in-memory cache index and byte counters in step with disk."""
+    loop = asyncio.get_event_loop()
+    while True:
+        await asyncio.sleep(CACHE_INDEX_RECONCILE_SECONDS)
+        try:
+            drift = await loop.run_in_executor(None, cache_index.reconcile)
+        except Exception as exc:
+            logger.warning(f"Cache index reconcile failed: {exc}")
+            continue
+        if drift:
+            append_runtime_audit_event("cache-index-reconciled", details={
+                "drift": drift,
+                "files": len(cache_index),
+                **{f"{name}_bytes": value for name, value in cache_index.byte_counters().items()},
+            })
+
+async def refresh_stream_urls_periodically():
+    """Re-resolve cached stream URLs for the current and queued tracks before they expire."""
+    while True:
+        await asyncio.sleep(STREAM_URL_REFRESH_INTERVAL_SECONDS)
+        wanted = []
+        for player in guild_players.all():
+            with guild_players.using(player.guild_id):
+                wanted.extend(
+                    str(track.get("id") or "")
+                    for track in current_session_cache_targets()
+                    if not track.get("file")
+                )
+        for video_id in stream_url_cache.due_for_refresh(wanted, lead_time=STREAM_URL_REFRESH_INTERVAL_SECONDS):
+            url = canonical_youtube_url(video_id)
+            try:
+                data = await extract_stream_info(url, lane=ytdl_executor.PREFETCH)
+            except Exception as exc:
+                logger.info(f"Stream URL refresh failed for {video_id}: {exc}")
+                stream_url_cache.invalidate(video_id)
+                continue
+            if data and stream_url_cache.put(data.get("id") or video_id, data, refreshed=True):
+                logger.debug(f"Refreshed stream URL for {video_id} before expiry.")
+
 def youtube_url_for_track(track: dict) -> str:
     return track.get('webpage_url') or youtube_watch_url + str(track.get('id') or '')
 
@@ -1095,10 +1282,10 @@ def run_startup_diagnostics() -> StartupReport:
 
     try:
         os.makedirs(BASE_DIR, exist_ok=True)
-        with open(downloads_file, "a"):
+        with open(TRACK_CATALOG_FILE, "a"):
             pass
     except OSError as exc:
-        report.errors.append(f"Cannot write downloads cache at {downloads_file}: {exc}")
+        report.errors.append(f"Cannot write downloads catalog at {TRACK_CATALOG_FILE}: {exc}")
 
     try:
         os.makedirs(CACHE_DIR, exist_ok=True)
@@ -1110,7 +1297,7 @@ def run_startup_diagnostics() -> StartupReport:
         limit_mb = CACHE_HARD_LIMIT_BYTES // (1024 * 1024)
         if cache_total_bytes() > CACHE_HARD_LIMIT_BYTES:
             report.warnings.append(
-                f"Cache directory is over the hard cap ({cache_mb} MB / {limit_mb} MB); new downloads will stream."
+                f"Cache directory is over the hard cap ({cache_mb} MB / {limit_mb} MB); unpinned files will be evicted before new downloads."
             )
         else:
             report.notes.append(f"Cache storage available ({cache_mb} MB / {limit_mb} MB used).")
@@ -1171,9 +1358,6 @@ def run_startup_diagnostics() -> StartupReport:
     except Exception as exc:
         report.warnings.append(f"Disk usage check failed: {exc}")
 
-    if CLEANED_DOWNLOADS:
-        report.notes.append(f"Pruned {CLEANED_DOWNLOADS} expired download(s) on startup.")
-
     if QUOTE_GUESSER_ENABLED and _guesser is not None:
         report.notes.append("Quote guesser enabled (daily challenge available in WebUI).")
     elif QUOTE_GUESSER_ENABLED and _guesser is None:
@@ -1684,6 +1868,19 @@ def save_runtime_permissions_config():
     runtime["voice_votes_enabled"] = bool(getattr(client, "voice_votes_enabled", True))
     save_user_permissions_config()
 
+async def extract_stream_info(url: str, *, loop=None, lane: str = ytdl_executor.INTERACTIVE) -> Optional[dict]:
+    """Resolve a direct media URL with yt-dlp and remember it in stream_url_cache."""
+    loop = loop or asyncio.get_event_loop()
+    data, _ = await ytdl_flights.run(
+        ("stream_info", url),
+        lambda: loop.run_in_executor(ytdl_pool.lane(lane), lambda: ytdl.extract_info(url, download=False)),
+    )
+    if data and 'entries' in data:
+        data = next((entry for entry in data['entries'] if entry), None)
+    if data:
+        stream_url_cache.put(data.get('id'), data)
+    return data
+
 class YTDLSource(discord.PCMVolumeTransformer):
     """
     Class for creating an audio source from YouTube using yt_dlp and ffmpeg.
@@ -1695,37 +1892,52 @@ class YTDLSource(discord.PCMVolumeTransformer):
         self.url = data.get('url')
 
     @classmethod
-    async def from_url(cls, url, *, loop=None, stream=False, speed: Optional[float] = None):
-        """Gets an audio source from a YouTube URL (or search query)."""
-        url, _ = normalize_youtube_query(url)
+    async def from_url(cls, url, *, loop=None, stream=False, speed: Optional[float] = None, lane: str = ytdl_executor.INTERACTIVE):
+        """
+        Gets an audio source from a YouTube URL (or search query).
+        Streams reuse a still-valid direct URL from stream_url_cache when there is one.
+        """
+        url, video_id = normalize_youtube_query(url)
         loop = loop or asyncio.get_event_loop()
-        data = await loop.run_in_executor(None, lambda: ytdl.extract_info(url, download=not stream))
-        if data is None:
-            return None, url
-        if 'entries' in data:
-            data = next((entry for entry in data['entries'] if entry), None)
+        if stream:
+            entry = stream_url_cache.get(video_id)
+            if entry is not None:
+                logger.debug(f"Stream URL cache hit for {video_id} (expires in {int(entry.expires_at - time.time())}s)")
+                ffmpeg_args = ffmpeg_stream_options(speed, entry.headers)
+                data = dict(entry.data)
+                return cls(discord.FFmpegPCMAudio(entry.url, **ffmpeg_args), data=data, volume=client.volume), data.get('webpage_url', url)
+            data = await extract_stream_info(url, loop=loop, lane=lane)
+        else:
+            data, _ = await ytdl_flights.run(
+                ("download_info", url),
+                lambda: loop.run_in_executor(ytdl_pool.lane(lane), lambda: ytdl.extract_info(url, download=True)),
+            )
+            if data and 'entries' in data:
+                data = next((entry for entry in data['entries'] if entry), None)
         if data is None:
             return None, url
         # If stream=True, use the direct URL; otherwise use downloaded filename
-        filename = data['url'] if stream else ytdl.prepare_filename(data)
-        ffmpeg_args = ffmpeg_audio_options_for_speed(speed or 1.0, reconnect=True)
+        if stream:
+            filename = data['url']
+            ffmpeg_args = ffmpeg_stream_options(speed, data.get('http_headers'))
+        else:
+            filename = ytdl.prepare_filename(data)
+            ffmpeg_args = ffmpeg_audio_options_for_speed(speed or 1.0, reconnect=True)
         return cls(discord.FFmpegPCMAudio(filename, **ffmpeg_args), data=data, volume=client.volume), data.get('webpage_url', url)
 
+class GuildCommandTree(app_commands.CommandTree):
+    async def interaction_check(self, interaction) -> bool:
+        # Commands and autocomplete act on the invoking guild's player.
+        guild_players.activate(interaction.guild_id)
+        return True
+
 class Client(discord.Client):
     def __init__(self, *, intents: discord.Intents):
         super().__init__(intents=intents)
-        self.tree = app_commands.CommandTree(self)
-        # Voice and playback state
-        self.current_voice_channel = None      # discord.VoiceClient when connected
-        self.currently_playing = False
-        self.volume = DEFAULT_VOLUME_LEVEL / 100.0
-        self.session_volume_locked = False
-        self.current_track_id = None
-        self.current_track_info = None         # current track's info (dict)
-        self.last_track_info = None            # last played track's info (dict)
-        self.current_track_message = None      # discord.Message for the "Now Playing" announcement
-        self.current_track_message_show_queue = False
-        self.current_track_message_show_url = True
+        self.tree = GuildCommandTree(self)
+        # Voice, playback, queue, vote and repeat state is per guild; the
+        # attributes delegated below resolve to the active guild's player.
+        self.players = guild_players
         # Admin-controllable flags
         self.download_mode = True              # True = download-and-play, False = stream-only
         self.log_verbose = False               # True = DEBUG logging on
@@ -1740,7 +1952,6 @@ class Client(discord.Client):
         self.playspeed_allow_all = bool(runtime_config.get("playspeed_allow_all", False))
         self.status_play_public = bool(runtime_config.get("status_play_public", False))
         self.voice_votes_enabled = bool(runtime_config.get("voice_votes_enabled", True))
-        self.playback_speed = 1.0
         self.nowplaying_cooldown_seconds = int(
             runtime_config.get("nowplaying_cooldown_seconds", DEFAULT_NOWPLAYING_COOLDOWN_SECONDS)
         )
@@ -1750,14 +1961,7 @@ class Client(discord.Client):
         self.download_delete_delay_seconds = DEFAULT_DOWNLOAD_DELETE_DELAY_SECONDS
         self.auto_leave_enabled = False
         self.auto_leave_delay_seconds = AUTO_LEAVE_DEFAULT_DELAY_SECONDS
-        self.auto_leave_task = None
-        self.alone_speed_reset_task = None
-        self.auto_leave_disconnect_in_progress = False
-        # Queue and history tracking
-        self.song_history = []                # list of all tracks requested in current session
-        self.queue_backup = None              # backup of last cleared queue (for restore)
-        self.backup_timestamp = None          # timestamp for queue backup
-        self.suggestion_history = []
+        self.suggestion_history = collections.deque(maxlen=SUGGESTION_HISTORY_LIMIT)
         self.recent_commands = []
         self.playlist_pager_message_id = None
         self.playlist_pager = None
@@ -1771,19 +1975,14 @@ class Client(discord.Client):
         self.playlist_cache_tasks = {}
         self.playlist_creation_sessions = {}
         self.playlist_creation_timeout_tasks = {}
-        self.active_voice_votes = {}
         self.download_debug_messages = False
         self.debug_playback_messages = {}
-        self.repeat_current_track = False
-        self.repeat_track_id = None
-        self.repeat_disable_history = []
-        self.current_track_favorite_notice = ""
-        self.current_track_started_at = None
         self.last_presence_text = None
-        # File deletion task tracking
-        self.deletion_tasks = {}              # map video_id -> asyncio.Future
-        # Played tracks tracking
-        self.played_tracks = set()           # set of video IDs that have been played (for history status)
+        self.cache_index_reconcile_task = None
+        self.stream_url_refresh_task = None
+        self.playback_position_task = None
+        # Track-to-track gap tracking (all guilds)
+        self.track_gap_samples = collections.deque(maxlen=TRACK_GAP_SAMPLE_SIZE)
         # Spotify import review state
         self.pending_spotify_imports = {}    # import_id -> spotify_import.PendingImport
         self.spotify_review_message_ids = {} # message_id -> import_id
@@ -1797,9 +1996,20 @@ class Client(discord.Client):
         self.tv_restart_window_start = None
 
     async def setup_hook(self):
-        # Sync application commands to the specified guild
-        self.tree.copy_global_to(guild=MY_GUILD)
-        await self.tree.sync(guild=MY_GUILD)
+        recover_queue_journal()
+        # Sync application commands to the configured guilds
+        for guild in COMMAND_GUILDS:
+            self.tree.copy_global_to(guild=guild)
+            await self.tree.sync(guild=guild)
+
+    async def close(self):
+        # Snapshot the sessions before voice disconnects clear them, so /play:last works after a restart.
+        close_session_journal()
+        # Write any queued blackbox events before the loop goes away.
+        await blackbox_sink.close()
+        await super().close()
+
+guild_player.delegate_player_fields(Client)
 
 # Intents setup (enable message content for slash commands to work properly)
 intents = discord.Intents.default()
@@ -1838,7 +2048,7 @@ def build_runtime_status():
         f"- queue links: `{'disabled' if client.queue_links_disabled else 'enabled'}`",
         f"- public /status play: `{'enabled' if client.status_play_public else 'disabled'}`",
         f"- voice votes: `{'enabled' if client.voice_votes_enabled else 'disabled'}`",
-        f"- song delete delay: `{client.download_delete_delay_seconds}s`",
+        f"- song delete delay: `{client.download_delete_delay_seconds}s` (`{downloads_catalog.scheduled_count()}` download(s) scheduled)",
         f"- auto leave: `{'enabled' if client.auto_leave_enabled else 'disabled'}` (`{client.auto_leave_delay_seconds}s`)",
         f"- nowplaying cooldown: `{client.nowplaying_cooldown_seconds}s`",
         f"- cache: `{cache_mb:.1f} MB / {cache_limit_mb} MB`",
@@ -1846,6 +2056,46 @@ def build_runtime_status():
         f"- force global playlist cache: `{client.force_global_playlist_cache_mode}`",
         f"- favorites cache: `{'enabled' if favorites_cache.get('enabled') else 'disabled'}` (`{fav_cache_mb} MB`, `{favorites_cache.get('per_user_tracks', FAVORITES_CACHE_DEFAULT_TRACKS_PER_USER)}` tracks/user)",
     ]
+    lines.append("")
+    lines.append("**yt-dlp lanes**")
+    for kind, stats in ytdl_flights.metrics().items():
+        lines.append(f"- coalesced {kind}: `{stats['joins']}` joined of `{stats['calls']}` call(s)")
+    gaps = list(client.track_gap_samples)
+    if gaps:
+        lines.append(
+            f"- track gap (end -> next audio): last `{gaps[-1] * 1000:.0f} ms`, "
+            f"avg `{sum(gaps) / len(gaps) * 1000:.0f} ms`, max `{max(gaps) * 1000:.0f} ms` over `{len(gaps)}` change(s); "
+            f"prefetching `{PREFETCH_LOOKAHEAD_TRACKS}` track(s) ahead"
+        )
+    stream_stats = stream_url_cache.metrics()
+    lines.append(
+        f"- stream url cache: `{stream_stats['entries']}` entries, `{stream_stats['hits']}` hit(s) / "
+        f"`{stream_stats['misses']}` miss(es) (`{stream_stats['hit_rate'] * 100:.0f}%`), "
+        f"`{stream_stats['refreshed']}` refreshed, `{stream_stats['expired']}` expired"
+    )
+    query_stats = search_queries.metrics()
+    lines.append(
+        f"- search query cache: `{query_stats['entries']}` entries, `{query_stats['hits']}` hit(s) + "
+        f"`{query_stats['negative_hits']}` cached miss(es) / `{query_stats['misses']}` lookup miss(es) "
+        f"(`{query_stats['hit_rate'] * 100:.0f}%`), `{query_stats['invalidated']}` invalidated"
+    )
+    player_stats = guild_players.metrics()
+    lines.append(
+        f"- guild players: `{player_stats['active']}/{player_stats['guilds']}` active, "
+        f"`{player_stats['queued']}` track(s) queued across guilds, commands synced to `{len(COMMAND_GUILDS)}` guild(s)"
+    )
+    journal_stats = session_journal.metrics()
+    lines.append(
+        f"- queue journal: `{journal_stats['since_snapshot']}` entr(ies) since the last snapshot, "
+        f"`{journal_stats['snapshots']}` snapshot(s); startup replayed `{journal_stats['replayed']}` "
+        f"in `{journal_stats['replay_seconds'] * 1000:.0f} ms`"
+    )
+    for name, stats in ytdl_pool.metrics().items():
+        lines.append(
+            f"- {name}: `{stats['running']}/{stats['workers']}` running, `{stats['queued']}` queued, "
+            f"wait avg `{stats['wait_avg'] * 1000:.0f} ms` p95 `{stats['wait_p95'] * 1000:.0f} ms`, "
+            f"`{stats['completed']}` done / `{stats['failed']}` failed / `{stats['cancelled']}` cancelled"
+        )
     latest_suggestion = format_suggestion_record(client.suggestion_history[-1]) if client.suggestion_history else None
     lines.append("")
     lines.append("**latest suggestion**")
@@ -1883,9 +2133,7 @@ def build_playback_status() -> str:
     voice_channel = getattr(voice, "channel", None)
     cached_file = cached_file_for_track(track) if track else None
     duration = track.get("duration") or 0
-    elapsed = 0
-    if client.current_track_started_at:
-        elapsed = max(0, int(time.time() - client.current_track_started_at))
+    elapsed = int(current_playback_position() or 0)
     lines = ["**playback status**"]
     if not track:
         lines.append("- state: `idle`")
@@ -1913,6 +2161,7 @@ def build_playback_status() -> str:
         f"- playback speed: `{playback_speed_for_track(track):g}x`",
         f"- repeat-one: `{bool(client.repeat_current_track and client.repeat_track_id == str(track.get('id') or ''))}`",
         f"- cache mode: `{discord.utils.escape_markdown(str(track.get('cache_mode') or 'streaming'))}`",
+        f"- audio path: `{track.get('playback_path') or ('pcm' if cached_file else 'stream')}`",
         f"- cached file: `{metadata_path_for_cache_file(cached_file) if cached_file else 'none'}`",
         f"- file extension: `{discord.utils.escape_markdown(str(track.get('ext') or 'unknown'))}`",
         f"- file size: `{human_bytes(track.get('filesize') or cache_file_size(cached_file) if cached_file else track.get('filesize'))}`",
@@ -2175,7 +2424,7 @@ def normal_speed_message() -> str:
     return "Speed `1` is normal time. Multiplying time by one changes nothing. Bold choice."
 
 def clone_track_for_repeat(track: dict, *, repeat_loop: bool = False) -> dict:
-    clone = dict(track)
+    clone = track_record.from_dict(track)
     if repeat_loop:
         clone["repeat_loop"] = True
     else:
@@ -2231,10 +2480,11 @@ def format_recent_user_suggestions(user, limit: int = 5) -> list:
 
 def user_stats_message(user) -> str:
     uid = user_id_value(user)
-    playlists = load_playlists()
-    normal_playlists = [p for p in playlists if not is_favorites_playlist(p)]
-    owned = [p for p in normal_playlists if playlist_owner_id(p) == uid]
-    managed = [p for p in normal_playlists if uid in playlist_manager_ids(p) and playlist_owner_id(p) != uid]
+    owned = [p for p in playlist_repo.owned_by(uid, copy=False) if not is_favorites_playlist(p)]
+    managed = [
+        p for p in playlist_repo.managed_by(uid, copy=False)
+        if not is_favorites_playlist(p) and playlist_owner_id(p) != uid
+    ]
     favorites = favorites_playlist_for_user(user, create=False)
     favorite_tracks = favorites.get("tracks", []) if favorites else []
     favorite_visibility = favorites.get("visibility", "private") if favorites else "private"
@@ -2371,7 +2621,10 @@ def set_client_volume_level(level: int, *, allow_unsafe: bool = False):
         level = SAFE_VOLUME_MAX_LEVEL
     client.volume = level / 100.0
     voice = active_voice_client()
-    if voice and getattr(voice, "source", None):
+    if voice and isinstance(getattr(voice, "source", None), discord.FFmpegOpusAudio):
+        # The passthrough gain is fixed inside ffmpeg; live changes need the PCM path.
+        switch_current_track_to_pcm(voice, "volume change")
+    elif voice and getattr(voice, "source", None):
         try:
             voice.source.volume = client.volume
         except Exception as exc:
@@ -2479,7 +2732,7 @@ async def connect_or_move_to_voice_channel(ctx, voice_channel, *, reason: str):
         else:
             client.current_voice_channel = await voice_channel.connect()
             if not client.currently_playing:
-                client.song_history = []
+                client.song_history.clear()
             logger.info(f"Connected bot to voice channel {voice_channel.name} for {reason}.")
         apply_channel_volume_default(voice_channel, reason)
         cancel_auto_leave_task(reason)
@@ -2586,9 +2839,10 @@ async def perform_stop_action() -> str:
             logger.error(f"Error stopping voice client: {exc}")
         logger.info("Stopping playback, clearing queue, and disconnecting.")
         queue.clear()
+        # Cleared before disconnecting, so the disconnect is not taken for a dropped connection.
+        await clear_playback_tracking("stop command")
         await voice.disconnect()
         client.current_voice_channel = None
-        await clear_playback_tracking("stop command")
         client.currently_playing = False
         client.current_track_started_at = None
         reset_session_volume("voice disconnect")
@@ -2638,7 +2892,7 @@ async def _start_tv_stream(channel, url):
     # The original URL is kept in tv_stream_url so it can be re-resolved on reconnect.
     client.tv_stream_url = url
     try:
-        resolved_url = await _tv_module.resolve_stream_url(url)
+        resolved_url = await _tv_module.resolve_stream_url(url, executor=ytdl_pool.lane(ytdl_executor.INTERACTIVE))
     except Exception as exc:
         logger.error(f"TV stream URL resolution failed: {exc}")
         if channel:
@@ -3004,8 +3258,8 @@ def cancel_alone_speed_reset_task(reason: str = ""):
 def current_playback_recovery_tracks() -> list:
     tracks = []
     if client.current_track_info:
-        tracks.append(dict(client.current_track_info))
-    tracks.extend(dict(track) for track in queue)
+        tracks.append(track_record.to_dict(client.current_track_info))
+    tracks.extend(track_record.to_dict(track) for track in queue)
     return tracks
 
 def queue_blackbox_track_entry(track: dict) -> dict:
@@ -3028,50 +3282,55 @@ def append_queue_blackbox_event(action: str, *, tracks: Optional[list] = None, a
         "current_track": queue_blackbox_track_entry(client.current_track_info) if client.current_track_info else None,
         "queue_count": len(queue),
         "tracks": [queue_blackbox_track_entry(track) for track in (tracks or [])],
-        "details": details or {},
+        "details": dict(details or {}),
     }
     try:
-        events = []
-        if os.path.isfile(QUEUE_BLACKBOX_FILE):
-            with open(QUEUE_BLACKBOX_FILE, "r") as f:
-                loaded = json.load(f)
-            if not isinstance(loaded, list):
-                logger.error("Queue blackbox file is not a JSON list; preserving it without appending.")
-                return
-            events = loaded
-        events.append(entry)
-        write_json_atomic(QUEUE_BLACKBOX_FILE, events)
+        blackbox_sink.submit("queue", entry)
     except Exception as exc:
         logger.error(f"Failed to append queue blackbox event: {exc}")
 
-def save_last_session_recovery(voice_channel=None) -> int:
+def last_session_recovery_path() -> str:
+    """The active guild's saved-session file; MY_GUILD keeps the original file name."""
+    guild_id = guild_players.current().guild_id
+    if guild_id == MY_GUILD_ID:
+        return LAST_SESSION_QUEUE_FILE
+    root, ext = os.path.splitext(LAST_SESSION_QUEUE_FILE)
+    return f"{root}.{guild_id}{ext}"
+
+def save_last_session_recovery(voice_channel=None, *, reason: str = "auto_leave") -> int:
     tracks = current_playback_recovery_tracks()
     if not tracks:
         return 0
     text_channel = None
     if client.current_track_message:
         text_channel = getattr(client.current_track_message, "channel", None)
+    position = current_playback_position() if client.current_track_info else None
     payload = {
         "timestamp": time.time(),
-        "reason": "auto_leave",
+        "reason": reason,
         "boot_id": getattr(client, "boot_id", None),
+        "guild_id": guild_players.current().guild_id,
         "voice_channel_id": getattr(voice_channel, "id", None),
         "voice_channel_name": getattr(voice_channel, "name", None),
         "text_channel_id": getattr(text_channel, "id", None),
+        # Seconds into tracks[0] (the interrupted track); None when nothing was playing.
+        "position_seconds": round(position, 3) if position is not None else None,
         "tracks": tracks,
     }
-    write_json_atomic(LAST_SESSION_QUEUE_FILE, payload)
+    path = last_session_recovery_path()
+    write_json_atomic(path, payload)
     append_queue_blackbox_event("last-session-saved", tracks=tracks, details={
-        "reason": "auto_leave",
+        "reason": reason,
         "voice_channel_id": payload["voice_channel_id"],
         "text_channel_id": payload["text_channel_id"],
+        "position_seconds": payload["position_seconds"],
     })
-    logger.info(f"Saved last session recovery with {len(tracks)} track(s) to {LAST_SESSION_QUEUE_FILE}.")
+    logger.info(f"Saved last session recovery with {len(tracks)} track(s) to {path}.")
     return len(tracks)
 
 def validate_last_session_recovery_payload(payload: dict) -> Optional[str]:
-    if payload.get("reason") != "auto_leave":
-        return "saved session is legacy or was not created by auto-leave"
+    if payload.get("reason") not in LAST_SESSION_RECOVERY_REASONS:
+        return "saved session is legacy or was not created by auto-leave or restart recovery"
     try:
         timestamp = float(payload.get("timestamp") or 0)
     except (TypeError, ValueError):
@@ -3087,10 +3346,11 @@ def validate_last_session_recovery_payload(payload: dict) -> Optional[str]:
     return None
 
 def load_last_session_recovery() -> tuple:
-    if not os.path.isfile(LAST_SESSION_QUEUE_FILE):
+    path = last_session_recovery_path()
+    if not os.path.isfile(path):
         return None, "no saved last session file"
     try:
-        with open(LAST_SESSION_QUEUE_FILE, "r") as f:
+        with open(path, "r") as f:
             payload = json.load(f)
         if not isinstance(payload, dict):
             append_queue_blackbox_event("last-session-rejected", details={
@@ -3118,48 +3378,92 @@ def load_last_session_recovery() -> tuple:
 
 def remove_last_session_recovery():
     try:
-        if os.path.isfile(LAST_SESSION_QUEUE_FILE):
-            os.remove(LAST_SESSION_QUEUE_FILE)
+        path = last_session_recovery_path()
+        if os.path.isfile(path):
+            os.remove(path)
             logger.info("Removed last session recovery file after successful restore.")
     except Exception as exc:
         logger.warning(f"Failed to remove last session recovery file: {exc}")
 
+def recover_queue_journal() -> int:
+    """
+    Rebuild each guild's queue and current track from the queue journal and
+    save them as /play:last recovery files. Runs once at startup; returns the
+    number of guilds with a session to recover.
+    """
+    try:
+        states = session_journal.load()
+    except Exception as exc:
+        logger.error(f"Failed to replay queue journal: {exc}")
+        states = {}
+    recovered = 0
+    for guild_id, state in states.items():
+        tracks = ([state["current"]] if state.get("current") else []) + list(state.get("queue") or [])
+        if not tracks:
+            continue
+        payload = {
+            "timestamp": state.get("updated_at") or time.time(),
+            "reason": "restart",
+            "boot_id": getattr(client, "boot_id", None),
+            "guild_id": guild_id,
+            "voice_channel_id": None,
+            "voice_channel_name": None,
+            "text_channel_id": None,
+            "position_seconds": state.get("position") if state.get("current") else None,
+            "tracks": tracks,
+        }
+        try:
+            with guild_players.using(guild_id):
+                path = last_session_recovery_path()
+                write_json_atomic(path, payload)
+                append_queue_blackbox_event("last-session-saved", tracks=tracks, details={
+                    "reason": "restart",
+                    "position_seconds": payload["position_seconds"],
+                })
+        except Exception as exc:
+            logger.error(f"Failed to save recovered session for guild {guild_id}: {exc}")
+            continue
+        recovered += 1
+        logger.info(f"Recovered {len(tracks)} track(s) for guild {guild_id} from the queue journal into {path}.")
+    stats = session_journal.metrics()
+    logger.info(
+        f"Queue journal replayed {stats['replayed']} entr(ies) in {stats['replay_seconds'] * 1000:.1f} ms; "
+        f"{recovered} guild session(s) can be restored with /play:last."
+    )
+    # This process starts with empty queues; record from a clean snapshot.
+    session_journal.reset()
+    return recovered
+
+def saved_session_resume_position(payload: dict, track: dict) -> float:
+    """Where to resume the first saved track: 0 when unknown, too early or already at the end."""
+    try:
+        position = float(payload.get("position_seconds") or 0)
+        duration = float(track.get("duration") or 0)
+    except (TypeError, ValueError):
+        return 0.0
+    if position < 1 or (duration and position >= duration - 1):
+        return 0.0
+    return position
+
 def is_play_last_query(value: str) -> bool:
     return str(value or "").strip().lower() in {"last", "play:last", "/play:last"}
 
-async def play_saved_track_now(voice, channel, track: dict):
+async def play_saved_track_now(voice, channel, track: dict, *, start_seconds: float = 0.0):
+    """Play *track* now; a cached file resumes start_seconds in, other sources start over."""
     if not track.get("webpage_url") and track.get("id"):
         track["webpage_url"] = youtube_watch_url + str(track.get("id"))
-    requester = track.get("requested_by_user_id")
-    await resolve_track_for_playback(track, requested_by=requester)
-    cached_file = None if user_has_group(requester, "nodownload") else cached_file_for_track(track)
-    speed = playback_speed_for_track(track)
-    track["playback_speed"] = speed
-    if cached_file:
-        track["file"] = cached_file
-        append_runtime_audit_event("playback-source-cache", actor=requester, details={
-            "video_id": track.get("id"),
-            "title": track.get("title"),
-            "cache_path": metadata_path_for_cache_file(cached_file),
-            "speed": speed,
-        })
-        source = discord.FFmpegPCMAudio(cached_file, **ffmpeg_audio_options_for_speed(speed))
-        player = discord.PCMVolumeTransformer(source, volume=client.volume)
-    else:
-        append_runtime_audit_event("playback-source-stream", actor=requester, details={
-            "video_id": track.get("id"),
-            "title": track.get("title"),
-            "reason": "nodownload" if user_has_group(requester, "nodownload") else "cache_unavailable",
-            "speed": speed,
-        })
-        player, _ = await YTDLSource.from_url(track['webpage_url'], stream=True, speed=speed)
+    player = await build_audio_player(track, start_seconds=start_seconds)
+    if start_seconds and track.get("playback_path") not in SEEKABLE_PLAYBACK_PATHS:
+        logger.info(f"Restarting {track.get('id')} from the beginning: no cached file to seek in.")
+        start_seconds = 0.0
     voice.play(player, after=lambda e, vid=track.get('id'): after_played_track(e, vid, channel))
     client.current_track_id = track.get('id')
     client.currently_playing = True
     client.last_track_info = client.current_track_info
     client.current_track_info = track
-    client.current_track_started_at = time.time()
+    start_playback_clock(track, offset=start_seconds)
     sync_repeat_for_started_track(track)
+    journal_track_started(track)
     if track not in client.song_history:
         client.song_history.append(track)
     await publish_now_playing(channel, track)
@@ -3190,7 +3494,7 @@ async def restore_last_session(ctx) -> bool:
             apply_channel_volume_default(ctx.user.voice.channel, "play last join")
             cancel_auto_leave_task("play last joined voice")
             cancel_alone_speed_reset_task("play last joined voice")
-            client.song_history = []
+            client.song_history.clear()
             await ctx.followup.send(f"Joined voice channel {ctx.user.voice.channel.name}")
         except Exception as exc:
             logger.error(f"Voice connection failed during /play last: {exc}")
@@ -3200,25 +3504,30 @@ async def restore_last_session(ctx) -> bool:
         client.current_voice_channel = voice
         if not await require_voice_control(ctx, "restore last session"):
             return False
-    first_track = dict(tracks[0])
-    queue[:] = [dict(track) for track in tracks[1:]]
+    first_track = track_record.from_dict(tracks[0])
+    queue[:] = [track_record.from_dict(track) for track in tracks[1:]]
+    start_seconds = saved_session_resume_position(payload, first_track)
     try:
-        await play_saved_track_now(voice, ctx.channel, first_track)
+        await play_saved_track_now(voice, ctx.channel, first_track, start_seconds=start_seconds)
     except Exception as exc:
         logger.error(f"Failed to restore last session playback: {exc}")
         await ctx.followup.send("Failed to restore the saved last session.")
         return False
     remove_last_session_recovery()
+    resumed_at = guild_players.current().current_track_offset
     append_queue_blackbox_event("last-session-restored", tracks=tracks, actor=ctx.user, details={
         "saved_boot_id": payload.get("boot_id"),
         "saved_at": payload.get("timestamp"),
+        "resumed_at_seconds": resumed_at,
     })
     append_runtime_audit_event("last-session-restored", actor=ctx.user, details={
         "track_count": len(tracks),
         "saved_boot_id": payload.get("boot_id"),
         "saved_at": payload.get("timestamp"),
+        "resumed_at_seconds": resumed_at,
     })
-    await ctx.followup.send(f"Restored last session with {len(tracks)} track(s).")
+    resume_note = f", resuming at {format_seconds(resumed_at)}" if resumed_at else ""
+    await ctx.followup.send(f"Restored last session with {len(tracks)} track(s){resume_note}.")
     logger.info(f"Restored last session through /play:last with {len(tracks)} track(s).")
     return True
 
@@ -3365,45 +3674,28 @@ def make_playlist_metadata(name: str, owner, visibility: str = "private") -> dic
         "deleted": False,
     }
 
+def normalize_loaded_playlist(playlist: dict) -> dict:
+    for track in playlist.get("tracks", []):
+        normalize_playlist_track_cache_fields(track)
+    return playlist
+
 def load_playlists(*, include_deleted: bool = False, purge_expired: bool = True) -> list:
-    playlists = []
-    if not os.path.isdir(PLAYLISTS_DIR):
-        return playlists
     if purge_expired:
         purge_expired_deleted_playlists()
-    for root, _, files in os.walk(PLAYLISTS_DIR):
-        if "metadata.json" not in files:
-            continue
-        path = os.path.join(root, "metadata.json")
-        try:
-            with open(path, "r") as f:
-                playlist = json.load(f)
-            playlist.setdefault("tracks", [])
-            playlist.setdefault("manager_user_ids", [])
-            playlist.setdefault("visibility", "private")
-            playlist.setdefault("locked", False)
-            playlist.setdefault("type", "playlist")
-            playlist.setdefault("folder", os.path.basename(root))
-            playlist.setdefault("cache_mode", "follow_global")
-            for track in playlist.get("tracks", []):
-                normalize_playlist_track_cache_fields(track)
-            if playlist.get("deleted") and not include_deleted:
-                continue
-            playlists.append(playlist)
-        except Exception as exc:
-            logger.error(f"Failed to load playlist metadata {path}: {exc}")
-    return playlists
+    return [
+        normalize_loaded_playlist(playlist)
+        for playlist in playlist_repo.playlists(include_deleted=include_deleted)
+    ]
 
 def save_playlist(playlist: dict):
-    write_json_atomic(playlist_metadata_path(playlist), playlist)
+    playlist_repo.save(playlist, playlist_metadata_path(playlist))
 
 def playlist_video_links(playlist: dict) -> list:
-    links = []
-    for track in playlist.get("tracks", []):
-        link = track.get("webpage_url") or youtube_watch_url + str(track.get("id") or "")
-        if link and link not in links:
-            links.append(link)
-    return links
+    links = (
+        track.get("webpage_url") or youtube_watch_url + str(track.get("id") or "")
+        for track in playlist.get("tracks", [])
+    )
+    return list(dict.fromkeys(link for link in links if link))
 
 def append_playlist_blackbox_event(action: str, playlist: dict, actor=None):
     event = {
@@ -3413,22 +3705,13 @@ def append_playlist_blackbox_event(action: str, playlist: dict, actor=None):
         "playlist_name": playlist.get("name"),
         "owner_user_id": playlist.get("owner_user_id"),
         "owner_discord_name": playlist.get("owner_discord_name"),
-        "manager_user_ids": playlist.get("manager_user_ids", []),
+        "manager_user_ids": list(playlist.get("manager_user_ids", [])),
         "youtube_links": playlist_video_links(playlist),
         "actor_user_id": user_id_value(actor) if actor else None,
         "actor_discord_name": user_display(actor) if actor else None,
     }
     try:
-        if os.path.isfile(PLAYLIST_BLACKBOX_FILE):
-            with open(PLAYLIST_BLACKBOX_FILE, "r") as f:
-                events = json.load(f)
-            if not isinstance(events, list):
-                logger.error("Playlist blackbox file is not a JSON list; preserving it without appending.")
-                return
-        else:
-            events = []
-        events.append(event)
-        write_json_atomic(PLAYLIST_BLACKBOX_FILE, events)
+        blackbox_sink.submit("playlist", event)
     except Exception as exc:
         logger.error(f"Failed to append playlist blackbox event: {exc}")
 
@@ -3505,6 +3788,7 @@ def safe_remove_playlist_folder(playlist: dict) -> bool:
             return False
         if os.path.isdir(real_folder):
             shutil.rmtree(real_folder)
+        playlist_repo.discard(playlist_metadata_path(playlist))
         return True
     except Exception as exc:
         logger.error(f"Failed to remove playlist folder {folder}: {exc}")
@@ -3514,7 +3798,7 @@ def purge_expired_deleted_playlists():
     now = time.time()
     if not os.path.isdir(PLAYLISTS_DIR):
         return
-    for playlist in load_playlists(include_deleted=True, purge_expired=False):
+    for playlist in playlist_repo.playlists(include_deleted=True, copy=False):
         if playlist.get("deleted") and playlist.get("delete_after", 0) <= now:
             if safe_remove_playlist_folder(playlist):
                 logger.info(f"Purged expired deleted playlist: {playlist.get('name')} ({playlist.get('id')})")
@@ -3558,9 +3842,11 @@ def can_manage_playlist(user, playlist: dict) -> bool:
     return is_user_admin(user) or user_id_value(user) == playlist_owner_id(playlist)
 
 def visible_playlists_for(user) -> list:
+    """Read-only: these are the repository's stored playlists, not copies."""
     uid = user_id_value(user)
+    purge_expired_deleted_playlists()
     playlists = [
-        playlist for playlist in load_playlists()
+        playlist for playlist in playlist_repo.playlists(copy=False)
         if not is_favorites_playlist(playlist) and can_view_playlist(user, playlist)
     ]
     return sorted(
@@ -3575,15 +3861,14 @@ def resolve_playlist_reference(reference: str, user=None, *, require_visible: bo
     lookup = playlist_lookup_key(reference)
     if not lookup:
         return None
+    purge_expired_deleted_playlists()
     candidates = []
-    for playlist in load_playlists(include_deleted=include_deleted):
+    for playlist in playlist_repo.find(lookup, include_deleted=include_deleted):
         if is_favorites_playlist(playlist):
             continue
-        names = {playlist.get("id", "").lower(), playlist.get("name", "").lower()}
-        if lookup in names:
-            if require_visible and user is not None and not can_view_playlist(user, playlist):
-                continue
-            candidates.append(playlist)
+        if require_visible and user is not None and not can_view_playlist(user, playlist):
+            continue
+        candidates.append(playlist)
     if not candidates:
         return None
     uid = user_id_value(user)
@@ -3595,7 +3880,7 @@ def resolve_playlist_reference(reference: str, user=None, *, require_visible: bo
             playlist.get("name", "").lower(),
         )
     )
-    return candidates[0]
+    return normalize_loaded_playlist(candidates[0])
 
 def is_playlist_reference(value: str, user=None) -> bool:
     text = str(value or "").strip()
@@ -3612,6 +3897,9 @@ def playlist_track_from_track(track: dict, user) -> dict:
     }
     if track.get("needs_refresh"):
         item["needs_refresh"] = True
+    uploader = metadata_value(track, "uploader", "channel", default=None)
+    if uploader:
+        item["uploader"] = str(uploader)
     normalize_playlist_track_cache_fields(item, source_track=track)
     return item
 
@@ -3777,13 +4065,14 @@ def favorites_playlist_for_user(user, *, create: bool = False) -> Optional[dict]
     uid = user_id_value(user)
     if not uid:
         return None
-    for playlist in load_playlists(include_deleted=False):
-        if is_favorites_playlist(playlist) and playlist_owner_id(playlist) == uid:
-            if user_display(user) and playlist.get("owner_discord_name") != user_display(user):
-                playlist["owner_discord_name"] = user_display(user)
-                playlist["name"] = f"{user_display(user)} favorites"
-                save_playlist(playlist)
-            return playlist
+    found = playlist_repo.favorites_for(uid)
+    if found:
+        playlist = normalize_loaded_playlist(found[1])
+        if user_display(user) and playlist.get("owner_discord_name") != user_display(user):
+            playlist["owner_discord_name"] = user_display(user)
+            playlist["name"] = f"{user_display(user)} favorites"
+            save_playlist(playlist)
+        return playlist
     if not create:
         return None
     playlist = make_favorites_metadata(user)
@@ -3816,24 +4105,48 @@ def set_favorites_cache_policy(enabled: bool, *, max_gb: Optional[float] = None,
         policy.setdefault("per_user_tracks", FAVORITES_CACHE_DEFAULT_TRACKS_PER_USER)
     save_user_permissions_config()
 
-def favorite_cache_bytes() -> int:
-    total = 0
-    seen = set()
-    for playlist in load_playlists():
-        if not is_favorites_playlist(playlist):
+def favorite_cache_stems(playlist: Optional[dict]) -> set:
+    """Playlist cache stems referenced by *playlist* if it is a live favorites playlist."""
+    stems = set()
+    if not playlist or not is_favorites_playlist(playlist) or playlist.get("deleted"):
+        return stems
+    for track in playlist.get("tracks", []):
+        file_path = path_from_metadata(track.get("cache_path"))
+        if not file_path:
             continue
-        for track in playlist.get("tracks", []):
-            cache_key = cache_key_for_track(track)
-            file_path = path_from_metadata(track.get("cache_path"))
-            if not file_path or file_path in seen:
-                continue
-            if is_safe_cache_path(file_path, cache_key) and os.path.basename(file_path).startswith("plst-"):
-                try:
-                    total += os.path.getsize(file_path)
-                    seen.add(file_path)
-                except OSError:
-                    continue
-    return total
+        stem, _ = os.path.splitext(os.path.basename(file_path))
+        if stem.startswith("plst-"):
+            stems.add(stem)
+    return stems
+
+# Favorites stems per playlist path, and how many favorites playlists reference each stem.
+favorite_stems_by_playlist: dict = {}
+favorite_stem_refs = collections.Counter()
+
+def update_favorite_cache_accounting(path: str, previous: Optional[dict], current: Optional[dict]):
+    """Playlist repository listener: keep cache_index.favorites_bytes in step with favorites playlists."""
+    stems = favorite_cache_stems(current)
+    old_stems = favorite_stems_by_playlist.pop(path, set())
+    if stems:
+        favorite_stems_by_playlist[path] = stems
+    added, removed = [], []
+    for stem in stems - old_stems:
+        favorite_stem_refs[stem] += 1
+        if favorite_stem_refs[stem] == 1:
+            added.append(stem)
+    for stem in old_stems - stems:
+        favorite_stem_refs[stem] -= 1
+        if favorite_stem_refs[stem] <= 0:
+            del favorite_stem_refs[stem]
+            removed.append(stem)
+    if added or removed:
+        cache_index.update_favorite_stems(added, removed)
+
+playlist_repo.add_listener(update_favorite_cache_accounting)
+
+def favorite_cache_bytes() -> int:
+    playlist_repo.refresh()
+    return cache_index.favorites_bytes
 
 async def prepare_favorites_cache_round_robin() -> dict:
     policy = favorites_cache_policy()
@@ -3848,53 +4161,43 @@ async def prepare_favorites_cache_round_robin() -> dict:
         and not user_has_group(playlist_owner_id(playlist), "nodownload")
     ]
     favorites.sort(key=lambda item: (item.get("generated_at", 0), playlist_owner_id(item)))
-    current_bytes = favorite_cache_bytes()
-    result = {"enabled": True, "downloaded": 0, "reused": 0, "bytes": current_bytes, "capped": False}
+    budget = ytdl_executor.ByteBudget(max_bytes, used=favorite_cache_bytes())
+    result = {"enabled": True, "downloaded": 0, "reused": 0, "bytes": budget.used, "capped": False}
     changed = set()
-    for index in range(per_user_tracks):
-        for playlist in favorites:
-            tracks = playlist.get("tracks", [])
-            if index >= len(tracks):
-                continue
-            if current_bytes >= max_bytes:
-                result["capped"] = True
-                continue
-            track = tracks[index]
-            normalize_playlist_track_cache_fields(track)
-            cache_key = cache_key_for_track(track)
-            existing = find_existing_cache_file(cache_key, prefer_playlist=True, video_id=str(track.get("id") or "").strip() or None)
-            if existing and os.path.basename(existing).startswith("plst-"):
-                apply_cache_fields(track, existing, cache_mode="playlist")
-                result["reused"] += 1
-                changed.add(playlist.get("id"))
-                continue
-            try:
-                did_download, size = await cache_playlist_track(
-                    track,
-                    playlist_cache=True,
-                    projected_limit=max(0, max_bytes - current_bytes),
-                )
-            except Exception as exc:
-                logger.warning(f"Favorites cache download failed for {track.get('id')}: {exc}")
-                continue
-            if did_download:
-                if current_bytes + size > max_bytes:
-                    file_path = track.get("file")
-                    cache_key = cache_key_for_track(track)
-                    if file_path and is_safe_cache_path(file_path, cache_key):
-                        try:
-                            os.remove(file_path)
-                        except OSError as exc:
-                            logger.warning(f"Failed to remove over-limit favorites cache file {file_path}: {exc}")
-                    apply_cache_fields(track, None, cache_mode="streaming")
-                    result["capped"] = True
-                    continue
-                current_bytes += size
-                result["downloaded"] += 1
-                result["bytes"] = current_bytes
-                changed.add(playlist.get("id"))
-            elif size == 0 and current_bytes >= max_bytes:
-                result["capped"] = True
+    round_robin = [
+        (playlist, playlist["tracks"][index])
+        for index in range(per_user_tracks)
+        for playlist in favorites
+        if index < len(playlist.get("tracks", []))
+    ]
+
+    async def warm(playlist: dict, track: dict):
+        if budget.remaining <= 0:
+            result["capped"] = True
+            return
+        normalize_playlist_track_cache_fields(track)
+        cache_key = cache_key_for_track(track)
+        existing = find_existing_cache_file(cache_key, prefer_playlist=True, video_id=str(track.get("id") or "").strip() or None)
+        if existing and os.path.basename(existing).startswith("plst-"):
+            apply_cache_fields(track, existing, cache_mode="playlist")
+            result["reused"] += 1
+            changed.add(playlist.get("id"))
+            return
+        try:
+            did_download, _ = await cache_playlist_track(track, playlist_cache=True, budget=budget)
+        except Exception as exc:
+            logger.warning(f"Favorites cache download failed for {track.get('id')}: {exc}")
+            return
+        if did_download:
+            result["downloaded"] += 1
+            result["bytes"] = budget.used
+            changed.add(playlist.get("id"))
+
+    await ytdl_executor.run_bounded(
+        [lambda playlist=playlist, track=track: warm(playlist, track) for playlist, track in round_robin],
+        concurrency=PLAYLIST_WARMUP_CONCURRENCY,
+    )
+    result["capped"] = result["capped"] or budget.capped
     for playlist in favorites:
         if playlist.get("id") in changed:
             playlist["predownloaded"] = True
@@ -4003,21 +4306,21 @@ def playlist_to_queue_tracks(playlist: dict, *, block_id: Optional[str] = None)
     queue_tracks = []
     for index, track in enumerate(active_tracks, start=1):
         normalize_playlist_track_cache_fields(track)
-        queue_track = {
-            "id": str(track.get("id") or ""),
-            "title": str(track.get("title") or "Unknown title"),
-            "webpage_url": track.get("webpage_url") or youtube_watch_url + str(track.get("id") or ""),
-            "cache_key": track.get("cache_key"),
-            "cache_mode": track.get("cache_mode", "streaming"),
-            "cache_path": track.get("cache_path"),
-            "ext": track.get("ext"),
-            "needs_refresh": bool(track.get("needs_refresh")),
-            "playlist_id": playlist.get("id"),
-            "playlist_name": playlist.get("name"),
-            "playlist_block_id": block_id,
-            "playlist_index": index,
-            "playlist_total": total,
-        }
+        queue_track = track_record.TrackRecord(
+            id=str(track.get("id") or ""),
+            title=str(track.get("title") or "Unknown title"),
+            webpage_url=track.get("webpage_url") or youtube_watch_url + str(track.get("id") or ""),
+            cache_key=track.get("cache_key"),
+            cache_mode=track.get("cache_mode", "streaming"),
+            cache_path=track.get("cache_path"),
+            ext=track.get("ext"),
+            needs_refresh=bool(track.get("needs_refresh")),
+            playlist_id=playlist.get("id"),
+            playlist_name=playlist.get("name"),
+            playlist_block_id=block_id,
+            playlist_index=index,
+            playlist_total=total,
+        )
         cached_file = cached_file_for_track(queue_track)
         if cached_file:
             queue_track["file"] = cached_file
@@ -4029,11 +4332,8 @@ def active_playlist_block_id() -> Optional[str]:
     return current.get("playlist_block_id")
 
 def playlist_block_end_index(block_id: str) -> int:
-    last_index = -1
-    for index, track in enumerate(queue):
-        if track.get("playlist_block_id") == block_id:
-            last_index = index
-    return last_index
+    span = queue.block_span(block_id)
+    return span[1] if span else -1
 
 def insert_after_active_playlist(track: dict):
     block_id = active_playlist_block_id()
@@ -4073,6 +4373,112 @@ def playlist_list_pages_for(user) -> list:
         lines.append(f"- {format_playlist_title(playlist)} - {count} song(s), {relation}")
     return chunk_lines("**playlists**", lines, PLAYLIST_PAGE_SIZE)
 
+def search_library(query: str, user, *, limit: int = SEARCH_RESULT_LIMIT) -> list:
+    """Ranked search_index hits for *query* among the playlists *user* can view."""
+    playlist_repo.refresh()
+    return track_search.search(
+        query, limit=limit, can_view=lambda playlist: can_view_playlist(user, playlist),
+        recent_scope=guild_players.current().guild_id,
+    )
+
+def autocomplete_label(*parts) -> str:
+    label = " - ".join(str(part) for part in parts if part)
+    if len(label) > AUTOCOMPLETE_LABEL_LENGTH:
+        label = label[:AUTOCOMPLETE_LABEL_LENGTH - 1] + "…"
+    return label
+
+def media_autocomplete_choices(user, current: str, *, include_playlists: bool) -> list:
+    """
+    Choices for a free-text media option, from the local search index. Track
+    choices submit a watch URL and playlist choices a playlist: or -favorites
+    reference, so picking one never runs a yt-dlp search.
+    """
+    text = str(current or "").strip()
+    if text.lower().startswith(("http://", "https://", "www.", "-")) or is_play_last_query(text):
+        return []
+    guild_id = guild_players.current().guild_id
+    track_search.note_recent(list(client.song_history)[-track_search.max_recent:], scope=guild_id)
+    hits = track_search.suggest(
+        text,
+        limit=AUTOCOMPLETE_CHOICE_LIMIT,
+        can_view=lambda playlist: can_view_playlist(user, playlist),
+        kind=None if include_playlists else search_index.TRACK,
+        recent_scope=guild_id,
+    )
+    choices = []
+    for hit in hits:
+        if hit.kind == search_index.TRACK:
+            label = autocomplete_label(hit.title, hit.uploader, "cached" if hit.cached else "")
+            choices.append(app_commands.Choice(name=label, value=youtube_watch_url + hit.key))
+            continue
+        playlist = playlist_repo.get(hit.key, copy=False)
+        if not playlist:
+            continue
+        if is_favorites_playlist(playlist):
+            value = f"-favorites {playlist_owner_id(playlist)}"
+            label = autocomplete_label(f"favorites: {playlist.get('owner_discord_name') or hit.title}")
+        else:
+            value = f"playlist:{hit.key}"
+            label = autocomplete_label(f"playlist: {hit.title}", f"{len(playlist.get('tracks', []))} song(s)")
+        choices.append(app_commands.Choice(name=label, value=value))
+    return choices
+
+def playlist_autocomplete_choices(user, current: str) -> list:
+    """Choices for a playlist option: visible non-favorites playlists, submitted by id."""
+    def visible(playlist: dict) -> bool:
+        return not is_favorites_playlist(playlist) and can_view_playlist(user, playlist)
+
+    text = str(current or "").strip()
+    if text.lower().startswith("playlist:"):
+        text = text.split(":", 1)[1].strip()
+    if text:
+        hits = track_search.suggest(text, limit=AUTOCOMPLETE_CHOICE_LIMIT, can_view=visible, kind=search_index.PLAYLIST)
+        playlists = [playlist_repo.get(hit.key, copy=False) for hit in hits]
+    else:
+        uid = user_id_value(user)
+        playlists = sorted(
+            (playlist for playlist in playlist_repo.playlists(copy=False) if visible(playlist)),
+            key=lambda playlist: (0 if playlist_owner_id(playlist) == uid else 1, playlist.get("name", "").lower()),
+        )[:AUTOCOMPLETE_CHOICE_LIMIT]
+    return [
+        app_commands.Choice(
+            name=autocomplete_label(playlist.get("name") or playlist.get("id"), f"{len(playlist.get('tracks', []))} song(s)"),
+            value=str(playlist.get("id")),
+        )
+        for playlist in playlists
+        if playlist
+    ]
+
+async def play_query_autocomplete(ctx, current: str) -> list:
+    return media_autocomplete_choices(ctx.user, current, include_playlists=True)
+
+async def track_query_autocomplete(ctx, current: str) -> list:
+    return media_autocomplete_choices(ctx.user, current, include_playlists=False)
+
+async def playlist_name_autocomplete(ctx, current: str) -> list:
+    return playlist_autocomplete_choices(ctx.user, current)
+
+def search_result_pages(query: str, hits: list) -> list:
+    lines = []
+    for index, hit in enumerate(hits, start=1):
+        title = discord.utils.escape_markdown(hit.title)
+        if hit.kind == search_index.PLAYLIST:
+            kind = "favorites" if hit.playlists and hit.playlists[0].get("type") == "favorites" else "playlist"
+            lines.append(f"{index}. {kind} **{title}** (`{hit.key}`)")
+            continue
+        details = []
+        if hit.uploader:
+            details.append(discord.utils.escape_markdown(hit.uploader))
+        if hit.cached:
+            details.append("cached")
+        names = [discord.utils.escape_markdown(str(playlist.get("name") or "")) for playlist in hit.playlists[:3]]
+        if names:
+            more = f" +{len(hit.playlists) - 3}" if len(hit.playlists) > 3 else ""
+            details.append(f"in {', '.join(names)}{more}")
+        suffix = f" - {', '.join(details)}" if details else ""
+        lines.append(f"{index}. **{title}** (`{hit.key}`){suffix}")
+    return chunk_lines(f"**search: {discord.utils.escape_markdown(query)}**", lines, PLAYLIST_TRACK_PAGE_SIZE)
+
 def playlist_detail_pages(playlist: dict) -> list:
     lines = [
         f"- owner: **{discord.utils.escape_markdown(str(playlist.get('owner_discord_name', 'unknown')))}** (`{playlist_owner_id(playlist)}`)",
@@ -4168,7 +4574,7 @@ async def send_presence_operation_notice(channel, message: str):
 
 async def update_bot_presence(track: Optional[dict] = None, *, reason: str = "", channel=None):
     presence_text, source = bot_presence_for_track(track if client.currently_playing else None)
-    fallback_title = track.get("title", "-") if isinstance(track, dict) else "-"
+    fallback_title = track.get("title", "-") if track_record.is_track(track) else "-"
     if source == "title-fallback":
         logger.info(
             "Bot presence used title fallback formatting: "
@@ -4193,8 +4599,8 @@ async def update_bot_presence(track: Optional[dict] = None, *, reason: str = "",
             "source": source,
             "reason": reason,
             "error": str(exc),
-            "track_id": track.get("id") if isinstance(track, dict) else None,
-            "title": track.get("title") if isinstance(track, dict) else None,
+            "track_id": track.get("id") if track_record.is_track(track) else None,
+            "title": track.get("title") if track_record.is_track(track) else None,
         })
         try:
             await client.change_presence(activity=discord.Game(name=DEFAULT_BOT_PRESENCE))
@@ -4219,6 +4625,8 @@ def format_queue_section(*, max_chars=None, show_links=True) -> str:
         lines.append("_Queue is empty._")
         return "\n".join(lines)
 
+    # Track the joined length as lines are added instead of re-joining them per track.
+    length = len(lines[0])
     for index, track in enumerate(queue, start=1):
         title, url = track_display_parts(track)
         entry = [f"**{index}. {title}**"]
@@ -4228,12 +4636,13 @@ def format_queue_section(*, max_chars=None, show_links=True) -> str:
             entry.append(f"*{url}*")
         remaining = len(queue) - index
         footer = f"_and {remaining} more queued song(s)._" if remaining else None
-        candidate_lines = lines + entry + ([footer] if footer else [])
-        if max_chars and len("\n".join(candidate_lines)) > max_chars:
+        entry_length = sum(len(line) + 1 for line in entry)
+        if max_chars and length + entry_length + (len(footer) + 1 if footer else 0) > max_chars:
             hidden_count = len(queue) - index + 1
             lines.append(f"_and {hidden_count} more queued song(s)._")
             break
         lines.extend(entry)
+        length += entry_length
     return "\n".join(lines)
 
 def format_now_playing(track: dict, *, show_queue: bool = False, show_url: bool = True) -> str:
@@ -4283,6 +4692,7 @@ async def remove_control_reactions(message):
 
 async def clear_playback_tracking(reason: str, *, remove_controls: bool = True):
     old_message = client.current_track_message
+    was_playing = client.current_track_info is not None
     client.currently_playing = False
     client.current_track_id = None
     client.current_track_info = None
@@ -4293,6 +4703,8 @@ async def clear_playback_tracking(reason: str, *, remove_controls: bool = True):
     client.current_track_favorite_notice = ""
     client.repeat_current_track = False
     client.repeat_track_id = None
+    if was_playing:
+        session_journal.append(guild_players.current().guild_id, "stopped", reason=reason)
     if remove_controls:
         await remove_control_reactions(old_message)
     logger.info(f"Cleared playback tracking state: {reason}.")
@@ -4533,6 +4945,7 @@ def expanded_help_pages() -> list:
         "\n".join([
             "**playlists**",
             "/playlist list - Browse your playlists and visible public playlists.",
+            "/search <query> - Find songs across playlists, favorites, and downloads.",
             "/playlist new - Guided playlist creation.",
             "/playlist new <name> <private|public|current|currentqueue|jono> - Create or import.",
             "/playlist show <name> - Show playlist details.",
@@ -4644,6 +5057,7 @@ def expanded_help_pages() -> list:
             "**help - playlists and favorites**",
             "",
             "`/playlist list` - browse saved playlists.",
+            "`/search` - find songs across playlists, favorites, and downloads.",
             "`/playlist new` - guided creation.",
             "`/playlist new <name> current` - import the upcoming queue.",
             "`/playlist show` / `/playlist edit` - inspect playlist details.",
@@ -4804,6 +5218,7 @@ def expanded_help_pages() -> list:
             "**help - playlists and favorites**",
             "",
             "`/playlist list` - browse saved playlists.",
+            "`/search` - find songs across playlists, favorites, and downloads.",
             "`/playlist new` - guided creation.",
             "`/playlist new <name> current` - import the upcoming queue.",
             "`/playlist show` / `/playlist edit` - inspect playlist details.",
@@ -4964,6 +5379,7 @@ def expanded_help_pages() -> list:
             "**help - playlists and favorites**",
             "",
             "`/playlist list` - browse saved playlists.",
+            "`/search` - find songs across playlists, favorites, and downloads.",
             "`/playlist new` - guided creation.",
             "`/playlist new <name> current` - import the upcoming queue.",
             "`/playlist show` / `/playlist edit` - inspect playlist details.",
@@ -5512,6 +5928,15 @@ def command_help_pages() -> dict:
             "notes": ["Admin only.", "The panel covers download mode, Discord download logs, Python DEBUG logging, admin operation trail, queue links, auto-leave, favorites autocache, playlist cache policy, playspeed allow-all, and nowplaying cooldown.", "Most toggles are runtime state unless that setting already writes to a policy file."],
             "errors": ["Admin permission required.", "Discord may block reaction cleanup if the bot lacks reaction permissions."],
         },
+        "search": {
+            "purpose": "find songs across playlists, favorites, and downloads",
+            "synopsis": ["/search <query>"],
+            "description": "Searches song titles, uploaders, and playlist names in every playlist and favorites list you can view, plus tracks the bot has downloaded. Cached songs rank higher because they start instantly.",
+            "arguments": ["query - words to look for; the last word also matches as a prefix."],
+            "examples": ["/search daft punk", "/search road trip"],
+            "notes": ["Results show the video id, uploader, whether the song is cached, and which playlists contain it.", "Private playlists and favorites only appear for their owner, managers, and admins."],
+            "errors": ["No songs or playlists matched that search."],
+        },
         "userstats": {
             "purpose": "admin inspect one user's bot state",
             "synopsis": ["/userstats <user>"],
@@ -5841,15 +6266,7 @@ def enough_disk_for_download() -> bool:
         return True
 
 def estimate_total_downloaded_bytes() -> int:
-    total = 0
-    for vid, info in downloaded.items():
-        fp = info.get('filepath')
-        if fp and is_safe_download_path(fp, vid):
-            try:
-                total += os.path.getsize(path_from_metadata(fp))
-            except Exception:
-                continue
-    return total
+    return downloads_catalog.total_size()
 
 async def download_youtube_to_cache(
     video_url: str,
@@ -5857,14 +6274,24 @@ async def download_youtube_to_cache(
     *,
     playlist: bool = False,
     debug_report: Optional[DebugPlaybackMessage] = None,
+    info: Optional[dict] = None,
+    lane: str = ytdl_executor.INTERACTIVE,
+    progressive: Optional[media_cache.ProgressiveDownload] = None,
 ) -> tuple:
+    """
+    Download a track into the cache and return (path, ext, data).
+
+    Pass the *info* dict from an earlier extract_info(download=False) to
+    download its chosen format directly instead of extracting again. With
+    *progressive* (which needs *info*), yt-dlp writes straight to the temp
+    file and its paths are published so playback can read it while it grows.
+    """
     logger.debug(
         f"download_youtube_to_cache: url={video_url[:80]} "
-        f"cache_key={cache_key} playlist={playlist}"
+        f"cache_key={cache_key} playlist={playlist} reuse_info={info is not None}"
     )
     prefix = "plst-" if playlist else ""
     temp_token = secrets.token_hex(4)
-    cache_bytes_before = cache_total_bytes()
     options = dict(ytdl_options)
     options["outtmpl"] = os.path.join(CACHE_DIR, f".download-{prefix}{cache_key}-{temp_token}.%(ext)s")
     loop = asyncio.get_event_loop()
@@ -5887,8 +6314,14 @@ async def download_youtube_to_cache(
             schedule_debug_playback_update(debug_report, loop)
 
         options["progress_hooks"] = [debug_progress_hook]
+    if progressive is not None:
+        options["nopart"] = True
     downloader = yt_dlp.YoutubeDL(options)
-    data = await loop.run_in_executor(None, lambda: downloader.extract_info(video_url, download=True))
+    if progressive is not None and info is not None:
+        expected_temp = downloader.prepare_filename(info)
+        expected_ext = os.path.splitext(expected_temp)[1].lstrip(".").lower()
+        progressive.begin(expected_temp, cache_path_for_key(cache_key, expected_ext, playlist=playlist))
+    data = await loop.run_in_executor(ytdl_pool.lane(lane), lambda: media_cache.download_resolved(downloader, video_url, info))
     if data is None:
         raise Exception("Failed to download track info")
     if 'entries' in data:
@@ -5905,17 +6338,84 @@ async def download_youtube_to_cache(
     target_path = cache_path_for_key(cache_key, ext, playlist=playlist)
     if not is_safe_cache_path(temp_path):
         raise Exception("Downloaded file path failed safety validation.")
-    if cache_bytes_before + os.path.getsize(temp_path) > CACHE_HARD_LIMIT_BYTES:
+    file_size = os.path.getsize(temp_path)
+    if not ensure_cache_room(file_size, reason="download finished over estimate"):
         try:
             os.remove(temp_path)
         except OSError:
             pass
         raise Exception("Cache hard limit reached; download refused.")
     os.replace(temp_path, target_path)
+    cache_index.add(target_path, file_size)
     if not is_safe_cache_path(target_path, cache_key):
         raise Exception("Final cache file failed safety validation.")
     return target_path, ext, data
 
+def record_track_download(video_id: str, *, title: str, cache_key: str, file_path: str, requested_by=None):
+    catalog_cached_track(video_id, title=title, file_path=file_path, cache_key=cache_key)
+    logger.info(f"Downloaded '{title}' ({video_id}) to {file_path}")
+    append_runtime_audit_event("cache-download-complete", actor=requested_by, details={
+        "video_id": video_id,
+        "title": title,
+        "cache_path": metadata_path_for_cache_file(file_path),
+        "bytes": cache_file_size(file_path),
+    })
+
+progressive_downloads = {}  # cache_key -> (media_cache.ProgressiveDownload, asyncio.Task)
+
+def start_progressive_download(
+    page_url: str,
+    cache_key: str,
+    *,
+    video_id: str,
+    title: str,
+    requested_by=None,
+    info: Optional[dict] = None,
+    debug_report: Optional[DebugPlaybackMessage] = None,
+    lane: str = ytdl_executor.INTERACTIVE,
+) -> tuple:
+    """
+    Start (or join) a cache download that playback can read while it runs.
+    Returns (progress, task); the task resolves like download_youtube_to_cache
+    and records the finished file in the catalog.
+    """
+    existing = progressive_downloads.get(cache_key)
+    if existing and not existing[1].done():
+        return existing
+    progress = media_cache.ProgressiveDownload()
+
+    async def run():
+        try:
+            result = await download_youtube_to_cache(
+                page_url, cache_key, playlist=False, debug_report=debug_report,
+                info=info, lane=lane, progressive=progress,
+            )
+        except BaseException as exc:
+            progress.finish(exc)
+            raise
+        progress.finish()
+        record_track_download(video_id, title=title, cache_key=cache_key, file_path=result[0], requested_by=requested_by)
+        return result
+
+    entry = (progress, asyncio.create_task(run()))
+    progressive_downloads[cache_key] = entry
+    entry[1].add_done_callback(lambda task: finish_progressive_download(cache_key, entry, task))
+    return entry
+
+def finish_progressive_download(cache_key: str, entry: tuple, task: asyncio.Task):
+    if progressive_downloads.get(cache_key) is entry:
+        del progressive_downloads[cache_key]
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning(f"Progressive download for {cache_key} failed: {task.exception()}")
+
+async def wait_for_progressive_start(progress: media_cache.ProgressiveDownload) -> bool:
+    """Wait for PROGRESSIVE_START_BYTES on disk. False if the download finished (or failed) first."""
+    while not progress.finished.is_set():
+        if progress.started.is_set() and progress.bytes_written() >= PROGRESSIVE_START_BYTES:
+            return True
+        await asyncio.sleep(0.05)
+    return False
+
 def youtube_playlist_watch_url(playlist_id: str, video_id: Optional[str] = None) -> str:
     if video_id:
         return f"{youtube_watch_url}{video_id}&list={urllib.parse.quote(playlist_id)}"
@@ -5963,7 +6463,7 @@ def playback_error_message(error, user=None) -> str:
         return "YouTube extraction needs a supported JavaScript runtime. Ask an admin to install `deno` or `node` on PATH."
     return "Failed to add or play that track. Check the bot logs for details." + admin_suffix
 
-async def fetch_search_fallback_metadata(query: str, original_error):
+async def fetch_search_fallback_metadata(query: str, original_error, *, lane: str = ytdl_executor.INTERACTIVE):
     """Try a few search results when yt-dlp's first selected result is unavailable."""
     options = dict(ytdl_options)
     options["default_search"] = "ytsearch5"
@@ -5971,7 +6471,7 @@ async def fetch_search_fallback_metadata(query: str, original_error):
     options["extract_flat"] = "in_playlist"
     loop = asyncio.get_event_loop()
     extractor = yt_dlp.YoutubeDL(options)
-    search_data = await loop.run_in_executor(None, lambda: extractor.extract_info(f"ytsearch5:{query}", download=False))
+    search_data = await loop.run_in_executor(ytdl_pool.lane(lane), lambda: extractor.extract_info(f"ytsearch5:{query}", download=False))
     entries = [entry for entry in (search_data or {}).get("entries", []) if entry]
     last_error = original_error
     for entry in entries[:5]:
@@ -5979,7 +6479,7 @@ async def fetch_search_fallback_metadata(query: str, original_error):
         if not video_id:
             continue
         try:
-            return await loop.run_in_executor(None, lambda vid=video_id: ytdl.extract_info(canonical_youtube_url(vid), download=False))
+            return await loop.run_in_executor(ytdl_pool.lane(lane), lambda vid=video_id: ytdl.extract_info(canonical_youtube_url(vid), download=False))
         except Exception as exc:
             last_error = exc
             logger.info(f"Skipping unavailable fallback search result {video_id} for {query!r}: {exc}")
@@ -6008,26 +6508,26 @@ def playlist_entry_to_track(entry: dict, *, playlist_id: str, playlist_name: str
     title = str(entry.get("title") or "Unknown title")
     if title.lower() in {"[deleted video]", "[private video]"}:
         return None
-    return {
-        "id": video_id,
-        "title": title,
-        "webpage_url": canonical_youtube_url(video_id),
-        "cache_key": canonical_cache_key_from_video_id(video_id),
-        "cache_mode": "streaming",
-        "cache_path": None,
-        "ext": None,
-        "playlist_id": f"youtube:{playlist_id}",
-        "playlist_name": playlist_name,
-        "playlist_block_id": block_id,
-        "playlist_index": index,
-        "playlist_total": total,
-        "youtube_playlist_id": playlist_id,
-        "youtube_playlist_url": youtube_playlist_watch_url(playlist_id, video_id),
+    return track_record.TrackRecord(
+        id=video_id,
+        title=title,
+        webpage_url=canonical_youtube_url(video_id),
+        cache_key=canonical_cache_key_from_video_id(video_id),
+        cache_mode="streaming",
+        cache_path=None,
+        ext=None,
+        playlist_id=f"youtube:{playlist_id}",
+        playlist_name=playlist_name,
+        playlist_block_id=block_id,
+        playlist_index=index,
+        playlist_total=total,
+        youtube_playlist_id=playlist_id,
+        youtube_playlist_url=youtube_playlist_watch_url(playlist_id, video_id),
         # Playlist extraction is metadata-only. Resolve each track through the
         # normal fetch path when it reaches playback so duration/cache rules
         # are still applied before ffmpeg sees it.
-        "needs_refresh": True,
-    }
+        needs_refresh=True,
+    )
 
 def rotate_playlist_entries_for_selected(entries: list, selected_video_id: Optional[str]) -> list:
     if not selected_video_id:
@@ -6064,7 +6564,7 @@ async def fetch_youtube_playlist_tracks(query: str, requested_by=None, debug_rep
 
     loop = asyncio.get_event_loop()
     extractor = yt_dlp.YoutubeDL(options)
-    data = await loop.run_in_executor(None, lambda: extractor.extract_info(query, download=False))
+    data = await loop.run_in_executor(ytdl_pool.lane(ytdl_executor.INTERACTIVE), lambda: extractor.extract_info(query, download=False))
     entries = [entry for entry in (data or {}).get("entries", []) if entry]
     if not entries:
         raise Exception("No playable entries were found in that YouTube playlist.")
@@ -6129,24 +6629,103 @@ def preserve_playlist_context(original: dict, resolved: dict) -> dict:
     resolved.pop("needs_refresh", None)
     original.clear()
     original.update(resolved)
+    # The track may be queued, and its id can change when it resolves.
+    queue.invalidate()
     return original
 
-async def resolve_track_for_playback(track: dict, requested_by=None, debug_report: Optional[DebugPlaybackMessage] = None) -> dict:
+async def resolve_track_for_playback(
+    track: dict,
+    requested_by=None,
+    debug_report: Optional[DebugPlaybackMessage] = None,
+    *,
+    lane: str = ytdl_executor.INTERACTIVE,
+) -> dict:
     if not track.get("needs_refresh"):
         return track
     requester = requested_by or track.get("requested_by_user_id")
-    resolved = await fetch_track(track.get("webpage_url") or canonical_youtube_url(track.get("id")), requested_by=requester, debug_report=debug_report)
+    resolved = await fetch_track(track.get("webpage_url") or canonical_youtube_url(track.get("id")), requested_by=requester, debug_report=debug_report, lane=lane)
     if resolved.get("needs_confirm"):
         raise Exception("Track needs admin confirmation before playback.")
     return preserve_playlist_context(track, resolved)
 
-async def fetch_track(query: str, requested_by=None, debug_report: Optional[DebugPlaybackMessage] = None):
+async def fetch_track(query: str, requested_by=None, debug_report: Optional[DebugPlaybackMessage] = None, *, lane: str = ytdl_executor.INTERACTIVE):
     """
     Fetches YouTube track info for the given query (URL or search term).
     If download_mode is True, downloads the audio (unless cached) and returns track info with file path.
     If download_mode is False, returns track info for streaming (no file path).
     Applies size and duration restrictions based on user permissions.
+    yt-dlp work runs in the given ytdl_pool lane.
+
+    Concurrent calls for the same video (or search text) by requesters with the
+    same download permissions share one resolution and download.
+
+    Plain search text is looked up in search_queries first: a remembered
+    result goes straight down the video-id path (cache index, downloads
+    catalog), and a remembered miss fails without searching again.
     """
+    search_text = search_cache_query(query)
+    cached = search_queries.get(search_text) if search_text else None
+    try:
+        if cached is not None and cached.failed:
+            raise Exception("No playable result found for query (the same search recently found nothing).")
+        if cached is not None:
+            await append_debug_playback_event(debug_report, f"search cache hit: {cached.video_id}", force=True)
+            try:
+                return await fetch_track_shared(canonical_youtube_url(cached.video_id), requested_by, debug_report, lane=lane)
+            except Exception as exc:
+                if not is_search_miss_error(exc):
+                    raise
+                logger.info(f"Cached search result {cached.video_id} for {query!r} is no longer playable; searching again: {exc}")
+                search_queries.invalidate_video(cached.video_id)
+        result = await fetch_track_shared(query, requested_by, debug_report, lane=lane)
+    except Exception as e:
+        if search_text and cached is None and is_search_miss_error(e):
+            search_queries.put_failure(search_text)
+        if debug_report and not debug_report.error:
+            debug_report.error = str(e)
+            await finish_debug_playback_message(debug_report, status="error", error=str(e))
+        raise
+    if search_text and result.get("id"):
+        search_queries.put(search_text, result["id"], title=str(result.get("title") or ""))
+    return result
+
+def search_cache_query(query: str) -> Optional[str]:
+    """The search_queries key text for plain search text, or None for URLs."""
+    text = str(query or "").strip()
+    if not text or not is_search_query(text) or parse_youtube_video_id(text):
+        return None
+    return text
+
+def is_search_miss_error(error) -> bool:
+    """True for failures that mean the search result itself is unusable, not transient errors."""
+    lower = str(error or "").lower()
+    return any(marker in lower for marker in (
+        "no playable result", "no data found", "video unavailable",
+        "this video is not available", "private video",
+    ))
+
+async def fetch_track_shared(query: str, requested_by=None, debug_report: Optional[DebugPlaybackMessage] = None, *, lane: str = ytdl_executor.INTERACTIVE):
+    """fetch_track without the search cache: coalesces concurrent fetches of the same video or text."""
+    _, video_id = normalize_youtube_query(query)
+    key = (
+        "fetch_track",
+        video_id or str(query or "").strip().lower(),
+        client.download_mode,
+        user_has_group(requested_by, "nodownload"),
+        is_user_admin(requested_by),
+    )
+    result, joined = await ytdl_flights.run(
+        key,
+        lambda: fetch_track_uncoalesced(query, requested_by=requested_by, debug_report=debug_report, lane=lane),
+    )
+    if joined:
+        logger.debug(f"fetch_track joined an in-flight resolution for {key[1]}")
+        await append_debug_playback_event(debug_report, "joined an in-flight fetch of the same track", force=True)
+    # Each caller gets its own compact record, even when the fetch was shared.
+    return track_record.from_dict(result)
+
+async def fetch_track_uncoalesced(query: str, requested_by=None, debug_report: Optional[DebugPlaybackMessage] = None, *, lane: str = ytdl_executor.INTERACTIVE):
+    """The body of fetch_track; call fetch_track instead so duplicate requests are shared."""
     # Determine the full YouTube URL and video ID for URL inputs. Search text is
     # passed directly to yt-dlp so it can use its own maintained search extractor.
     video_url, video_id = normalize_youtube_query(query)
@@ -6163,9 +6742,9 @@ async def fetch_track(query: str, requested_by=None, debug_report: Optional[Debu
     # If we have a video_id and it's cached (and in download mode), use the cached file.
     if video_id and client.download_mode and not force_stream_only:
         existing_cache = find_existing_cache_file(cache_key, prefer_playlist=True, video_id=video_id)
-        info = downloaded.get(video_id, {})
-        if existing_cache and info.get('title'):
-            title = info.get('title', 'Unknown title')
+        catalog_entry = downloads_catalog.get(video_id)
+        if existing_cache and catalog_entry and catalog_entry.title:
+            title = catalog_entry.title
             if debug_report:
                 debug_report.title = title
                 debug_report.video_id = video_id
@@ -6183,15 +6762,7 @@ async def fetch_track(query: str, requested_by=None, debug_report: Optional[Debu
                 "source": "downloads_metadata",
             })
             if cache_mode != "playlist":
-                downloaded[video_id] = {
-                    'title': title,
-                    'filepath': existing_cache,
-                    'timestamp': time.time(),
-                    'cache_key': cache_key,
-                    'cache_path': metadata_path_for_cache_file(existing_cache),
-                    'ext': os.path.splitext(existing_cache)[1].lstrip(".").lower(),
-                }
-                save_downloads_metadata("cache reuse")
+                catalog_cached_track(video_id, title=title, file_path=existing_cache, cache_key=cache_key)
             return {
                 'id': video_id,
                 'title': title,
@@ -6203,10 +6774,10 @@ async def fetch_track(query: str, requested_by=None, debug_report: Optional[Debu
                 'ext': os.path.splitext(existing_cache)[1].lstrip(".").lower(),
             }
 
-    if video_id and video_id in downloaded and client.download_mode and not force_stream_only:
-        info = downloaded[video_id]
-        file_path = info.get('filepath')
-        title = info.get('title', 'Unknown title')
+    catalog_entry = downloads_catalog.get(video_id) if video_id and client.download_mode and not force_stream_only else None
+    if catalog_entry:
+        file_path = path_from_metadata(catalog_entry.path)
+        title = catalog_entry.title or 'Unknown title'
         page_url = youtube_watch_url + video_id
         if file_path and is_safe_download_path(file_path, video_id):
             logger.debug(f"Using cached file for {video_id}: {title}")
@@ -6220,7 +6791,7 @@ async def fetch_track(query: str, requested_by=None, debug_report: Optional[Debu
             return {'id': video_id, 'title': title, 'webpage_url': page_url, 'file': file_path}
         else:
             # Cached metadata exists but file is missing; remove from cache
-            downloaded.pop(video_id, None)
+            downloads_catalog.delete(video_id)
             logger.info(f"Cache entry for {video_id} removed (file not found)")
 
     # Not cached or not using cache: fetch metadata (and download if needed)
@@ -6234,11 +6805,11 @@ async def fetch_track(query: str, requested_by=None, debug_report: Optional[Debu
         loop = asyncio.get_event_loop()
         # Always extract metadata without downloading first (to get info like duration and size)
         try:
-            data = await loop.run_in_executor(None, lambda: ytdl.extract_info(video_url, download=False))
+            data = await loop.run_in_executor(ytdl_pool.lane(lane), lambda: ytdl.extract_info(video_url, download=False))
         except Exception as exc:
             if not video_id and is_search_query(query):
                 logger.info(f"Primary search result failed for {query!r}; trying fallback search results: {exc}")
-                data = await fetch_search_fallback_metadata(query, exc)
+                data = await fetch_search_fallback_metadata(query, exc, lane=lane)
             else:
                 raise
         if data is None:
@@ -6291,15 +6862,7 @@ async def fetch_track(query: str, requested_by=None, debug_report: Optional[Debu
                 await append_debug_playback_event(debug_report, f"cache hit: {cache_mode}", force=True)
                 await edit_debug_playback_message(debug_report, force=True)
             if cache_mode != "playlist":
-                downloaded[video_id] = {
-                    'title': title,
-                    'filepath': existing_cache,
-                    'timestamp': time.time(),
-                    'cache_key': cache_key,
-                    'cache_path': metadata_path_for_cache_file(existing_cache),
-                    'ext': os.path.splitext(existing_cache)[1].lstrip(".").lower(),
-                }
-                save_downloads_metadata("cache reuse")
+                catalog_cached_track(video_id, title=title, file_path=existing_cache, cache_key=cache_key)
             logger.info(f"Using cached file for {video_id}: {title}")
             append_runtime_audit_event("cache-hit", actor=requested_by, details={
                 "video_id": video_id,
@@ -6326,8 +6889,8 @@ async def fetch_track(query: str, requested_by=None, debug_report: Optional[Debu
         if client.download_mode and not force_stream_only:
             if not enough_disk_for_download():
                 raise Exception(f"Less than {MIN_FREE_DOWNLOAD_MB}MB free on disk; download refused.")
-            if not cache_has_room(filesize or 0):
-                logger.warning("Cache hard limit reached; streaming without downloading.")
+            if not ensure_cache_room(filesize or 0, reason="track download", actor=requested_by):
+                logger.warning("Cache hard limit reached and nothing evictable; streaming without downloading.")
                 append_runtime_audit_event("cache-hard-cap-stream", actor=requested_by, details={
                     "video_id": video_id,
                     "title": title,
@@ -6372,24 +6935,32 @@ async def fetch_track(query: str, requested_by=None, debug_report: Optional[Debu
         # Download mode: download the audio file using yt_dlp
         logger.info(f"Downloading track '{title}' ({video_id})...")
         await append_debug_playback_event(debug_report, "cache miss; downloading audio", stage="downloading", force=True)
-        file_path, ext, _ = await download_youtube_to_cache(video_url, cache_key, playlist=False, debug_report=debug_report)
-        # Cache the downloaded file info
-        downloaded[video_id] = {
-            'title': title,
-            'filepath': file_path,
-            'timestamp': time.time(),
-            'cache_key': cache_key,
-            'cache_path': metadata_path_for_cache_file(file_path),
-            'ext': ext,
-        }
-        save_downloads_metadata("track download")
-        logger.info(f"Downloaded '{title}' ({video_id}) to {file_path}")
-        append_runtime_audit_event("cache-download-complete", actor=requested_by, details={
-            "video_id": video_id,
-            "title": title,
-            "cache_path": metadata_path_for_cache_file(file_path),
-            "bytes": cache_file_size(file_path),
-        })
+        if PROGRESSIVE_DOWNLOADS_ENABLED and lane == ytdl_executor.INTERACTIVE:
+            progress, download_task = start_progressive_download(
+                page_url, cache_key, video_id=video_id, title=title, requested_by=requested_by,
+                info=data, debug_report=debug_report, lane=lane,
+            )
+            if await wait_for_progressive_start(progress):
+                final_path = progress.final_path
+                if debug_report:
+                    debug_report.cache_state = "downloading"
+                await append_debug_playback_event(debug_report, "enough audio buffered; playing while the download finishes", stage="progressive", force=True)
+                return {
+                    'id': video_id,
+                    'title': title,
+                    'webpage_url': page_url,
+                    'file': final_path,
+                    'cache_key': cache_key,
+                    'cache_path': metadata_path_for_cache_file(final_path),
+                    'cache_mode': 'shortterm',
+                    'ext': os.path.splitext(final_path)[1].lstrip(".").lower(),
+                    **metadata,
+                }
+            # Finished (or failed) before playback needed it; the task holds the outcome.
+            file_path, ext, _ = await download_task
+        else:
+            file_path, ext, _ = await download_youtube_to_cache(page_url, cache_key, playlist=False, debug_report=debug_report, info=data, lane=lane)
+            record_track_download(video_id, title=title, cache_key=cache_key, file_path=file_path, requested_by=requested_by)
         if debug_report:
             debug_report.cache_state = "downloaded"
             debug_report.stage = "cached"
@@ -6423,7 +6994,7 @@ async def ensure_voice_for_playback(ctx):
                 apply_channel_volume_default(ctx.user.voice.channel, "playback join")
                 cancel_auto_leave_task("playback joined voice")
                 cancel_alone_speed_reset_task("playback joined voice")
-                client.song_history = []
+                client.song_history.clear()
                 await ctx.followup.send(f"Joined voice channel {ctx.user.voice.channel.name}")
             except Exception as e:
                 logger.error(f"Voice connection failed: {e}")
@@ -6438,7 +7009,107 @@ async def ensure_voice_for_playback(ctx):
             return None
     return voice
 
-async def build_audio_player(track: dict):
+OPUS_PASSTHROUGH_EXTENSIONS = {"webm", "opus", "ogg", "mka"}
+
+async def cached_file_is_opus(track: dict, cached_file: str) -> bool:
+    """True when a cached file holds a 48 kHz Opus stream ffmpeg can pass through."""
+    ext = os.path.splitext(cached_file)[1].lstrip(".").lower()
+    if ext not in OPUS_PASSTHROUGH_EXTENSIONS:
+        return False
+    acodec = str(metadata_value(track, "acodec")).lower()
+    if acodec != "unknown":
+        if acodec != "opus":
+            return False
+        asr = metadata_value(track, "asr")
+        if asr == "unknown":
+            return True
+        try:
+            return int(float(asr)) == 48000
+        except (TypeError, ValueError):
+            return False
+    try:
+        codec, _ = await discord.FFmpegOpusAudio.probe(cached_file)
+    except Exception as exc:
+        logger.debug(f"Opus probe failed for {cached_file}: {exc}")
+        return False
+    return codec == "opus"
+
+def opus_passthrough_source(cached_file: str, volume: float, *, start_seconds: float = 0.0):
+    """
+    Opus packets for discord straight from ffmpeg. At 100% volume ffmpeg copies
+    the stream untouched; otherwise it applies the gain and re-encodes, which
+    still keeps decoding, the volume multiply and Opus encoding out of Python.
+    """
+    before_options = f"-ss {start_seconds:.3f}" if start_seconds > 0 else None
+    if abs(volume - 1.0) < 0.001:
+        return discord.FFmpegOpusAudio(cached_file, codec="opus", before_options=before_options, options="-vn")
+    return discord.FFmpegOpusAudio(cached_file, before_options=before_options, options=f"-vn -filter:a volume={volume:.4f}")
+
+async def build_cached_audio_source(track: dict, cached_file: str, speed: float, *, start_seconds: float = 0.0):
+    """
+    Audio source for a cached file: Opus passthrough when possible, PCM otherwise.
+    start_seconds seeks the file before decoding, to resume an interrupted track.
+    """
+    if OPUS_PASSTHROUGH_ENABLED and abs(speed - 1.0) < 0.001 and await cached_file_is_opus(track, cached_file):
+        track["playback_path"] = "opus-passthrough"
+        return opus_passthrough_source(cached_file, client.volume, start_seconds=start_seconds)
+    track["playback_path"] = "pcm"
+    source = discord.FFmpegPCMAudio(cached_file, **ffmpeg_audio_options_for_speed(speed, start_seconds=start_seconds))
+    return discord.PCMVolumeTransformer(source, volume=client.volume)
+
+def switch_current_track_to_pcm(voice, reason: str) -> bool:
+    """
+    Replace a playing Opus passthrough source with the PCM path at the current
+    position, so live volume changes take effect immediately.
+
+    The PCM source is started with play() rather than assigned to
+    voice.source: a voice client that has only played Opus has no encoder.
+    """
+    track = client.current_track_info or {}
+    cached_file = track.get("file")
+    old_source = getattr(voice, "source", None)
+    # The "after" callback needs the text channel; the now-playing message was sent there.
+    channel = getattr(client.current_track_message, "channel", None)
+    if not cached_file or channel is None or not isinstance(old_source, discord.FFmpegOpusAudio):
+        return False
+    if not (voice.is_playing() or voice.is_paused()):
+        return False
+    paused = voice.is_paused()
+    elapsed = current_playback_position() or 0.0
+    speed = playback_speed_for_track(track)
+    options = ffmpeg_audio_options_for_speed(speed, start_seconds=elapsed)
+    try:
+        source = discord.PCMVolumeTransformer(discord.FFmpegPCMAudio(cached_file, **options), volume=client.volume)
+    except Exception as exc:
+        logger.error(f"Could not switch {track.get('id')} from Opus passthrough to PCM: {exc}")
+        return False
+    # Stopping runs the old source's after callback; it must not advance the queue.
+    client.source_swap_pending = True
+    voice.stop()
+    try:
+        voice.play(source, after=lambda e, vid=track.get('id'): after_played_track(e, vid, channel))
+    except Exception as exc:
+        client.source_swap_pending = False
+        source.cleanup()
+        logger.error(f"Could not restart {track.get('id')} on the PCM path: {exc}")
+        return False
+    if paused:
+        voice.pause()
+    start_playback_clock(track, offset=elapsed)
+    if paused:
+        guild_players.current().pause_clock()
+    track["playback_path"] = "pcm"
+    logger.info(f"Switched {track.get('id')} from Opus passthrough to PCM at {elapsed:.1f}s ({reason}).")
+    return True
+
+SEEKABLE_PLAYBACK_PATHS = {"pcm", "opus-passthrough"}
+
+async def build_audio_player(track: dict, *, start_seconds: float = 0.0):
+    """
+    Audio source for *track*: the cache, an in-flight progressive download, a
+    stream tee or a direct stream. start_seconds applies to cached files only;
+    track["playback_path"] says which source was used.
+    """
     await resolve_track_for_playback(track, requested_by=track.get("requested_by_user_id"))
     cached_file = None if user_has_group(track.get("requested_by_user_id"), "nodownload") else cached_file_for_track(track)
     speed = playback_speed_for_track(track)
@@ -6451,7 +7122,22 @@ async def build_audio_player(track: dict):
             "cache_path": metadata_path_for_cache_file(cached_file),
             "speed": speed,
         })
-        source = discord.FFmpegPCMAudio(cached_file, **ffmpeg_audio_options_for_speed(speed))
+        cache_index.touch(cached_file)
+        return await build_cached_audio_source(track, cached_file, speed, start_seconds=start_seconds)
+    progressive = None if user_has_group(track.get("requested_by_user_id"), "nodownload") else progressive_downloads.get(cache_key_for_track(track))
+    if progressive and progressive[0].started.is_set():
+        progress, _ = progressive
+        append_runtime_audit_event("playback-source-cache", actor=track.get("requested_by_user_id"), details={
+            "video_id": track.get("id"),
+            "title": track.get("title"),
+            "cache_path": metadata_path_for_cache_file(progress.final_path),
+            "speed": speed,
+            "progressive": True,
+        })
+        track["file"] = progress.final_path
+        track["playback_path"] = "progressive"
+        reader = progress.open_reader(stall_timeout=PROGRESSIVE_STALL_SECONDS)
+        source = discord.FFmpegPCMAudio(reader, pipe=True, **ffmpeg_audio_options_for_speed(speed))
         return discord.PCMVolumeTransformer(source, volume=client.volume)
     append_runtime_audit_event("playback-source-stream", actor=track.get("requested_by_user_id"), details={
         "video_id": track.get("id"),
@@ -6459,20 +7145,139 @@ async def build_audio_player(track: dict):
         "reason": "nodownload" if user_has_group(track.get("requested_by_user_id"), "nodownload") else "cache_unavailable",
         "speed": speed,
     })
+    if stream_tee_eligible(track):
+        player = await build_stream_tee_source(track, speed)
+        if player is not None:
+            return player
+    track["playback_path"] = "stream"
     player, _ = await YTDLSource.from_url(track['webpage_url'], stream=True, speed=speed)
     return player
 
+stream_tees = {}  # video_id -> media_cache.ProgressiveDownload
+
+def stream_tee_eligible(track: dict) -> bool:
+    return (
+        STREAM_CACHE_TEE_ENABLED
+        and client.download_mode
+        and not user_has_group(track.get("requested_by_user_id"), "nodownload")
+        and not track.get("is_live")
+        and bool(cache_key_for_track(track))
+        and str(track.get("id") or "") not in stream_tees
+    )
+
+async def build_stream_tee_source(track: dict, speed: float):
+    """
+    Stream a track through the bot instead of handing ffmpeg the URL: the
+    direct media URL is fetched into a cache temp file and ffmpeg reads that
+    file as it grows, so the bytes played are also the bytes cached. Returns
+    None when the stream cannot be teed and should be played directly.
+    """
+    video_id = str(track.get("id") or "")
+    cache_key = cache_key_for_track(track)
+    entry = stream_url_cache.get(video_id)
+    if entry is not None:
+        url, headers, data = entry.url, entry.headers, dict(entry.data)
+    else:
+        data = await extract_stream_info(track["webpage_url"])
+        if not data:
+            return None
+        url, headers = data.get("url"), data.get("http_headers") or {}
+    ext = str(data.get("ext") or "").lower()
+    size = data.get("filesize") or data.get("filesize_approx") or 0
+    if not url or data.get("is_live") or f".{ext}" not in SAFE_MEDIA_EXTENSIONS or size > STREAM_CACHE_TEE_MAX_BYTES:
+        return None
+    progress = media_cache.ProgressiveDownload()
+    progress.begin(
+        os.path.join(CACHE_DIR, f".download-{cache_key}-{secrets.token_hex(4)}.{ext}"),
+        cache_path_for_key(cache_key, ext),
+    )
+    stream_tees[video_id] = progress
+    asyncio.create_task(run_stream_tee(track, progress, url, headers))
+    track["playback_path"] = "stream-tee"
+    logger.info(f"Teeing stream of {video_id} into {metadata_path_for_cache_file(progress.final_path)}")
+    reader = progress.open_reader(stall_timeout=PROGRESSIVE_STALL_SECONDS)
+    source = discord.FFmpegPCMAudio(reader, pipe=True, **ffmpeg_audio_options_for_speed(speed))
+    return YTDLSource(source, data=data, volume=client.volume)
+
+async def run_stream_tee(track: dict, progress: media_cache.ProgressiveDownload, url: str, headers: dict):
+    """Fetch a teed stream to its temp file, then promote it into the cache if it finished."""
+    video_id = str(track.get("id") or "")
+    loop = asyncio.get_event_loop()
+    try:
+        size = await loop.run_in_executor(
+            None,
+            lambda: media_cache.fetch_to_file(
+                url, headers, progress.temp_path, cancelled=progress.cancelled, max_bytes=STREAM_CACHE_TEE_MAX_BYTES,
+            ),
+        )
+        promote_stream_tee(track, progress, size)
+        progress.finish()
+    except BaseException as exc:
+        progress.finish(exc)
+        discard_stream_tee_file(progress.temp_path)
+        if isinstance(exc, media_cache.DownloadCancelled):
+            logger.info(f"Stream tee for {video_id} stopped before the download finished; nothing cached.")
+        elif isinstance(exc, media_cache.DownloadTooLarge):
+            logger.warning(f"Stream tee for {video_id} stopped and discarded: {exc}")
+        else:
+            logger.warning(f"Stream tee for {video_id} failed: {exc}")
+        if isinstance(exc, asyncio.CancelledError):
+            raise
+    finally:
+        if stream_tees.get(video_id) is progress:
+            del stream_tees[video_id]
+
+def discard_stream_tee_file(temp_path: Optional[str]):
+    try:
+        if temp_path:
+            os.remove(temp_path)
+    except OSError:
+        pass
+
+def promote_stream_tee(track: dict, progress: media_cache.ProgressiveDownload, size: int):
+    """Move a completed stream tee into the cache, subject to the cache cap and eviction."""
+    video_id = str(track.get("id") or "")
+    cache_key = cache_key_for_track(track)
+    temp_path, final_path = progress.temp_path, progress.final_path
+    reason = None
+    if size <= 0 or not is_safe_cache_path(temp_path):
+        reason = "incomplete or unsafe temp file"
+    elif find_existing_cache_file(cache_key, prefer_playlist=True, video_id=video_id):
+        reason = "already cached"
+    elif not ensure_cache_room(size, reason="stream tee", actor=track.get("requested_by_user_id")):
+        reason = "cache hard limit"
+    if reason:
+        discard_stream_tee_file(temp_path)
+        logger.info(f"Stream tee for {video_id} not cached: {reason}.")
+        append_runtime_audit_event("stream-tee-discarded", actor=track.get("requested_by_user_id"), details={
+            "video_id": video_id,
+            "reason": reason,
+            "bytes": size,
+        })
+        return
+    os.replace(temp_path, final_path)
+    cache_index.add(final_path, size)
+    record_track_download(
+        video_id,
+        title=str(track.get("title") or "Unknown title"),
+        cache_key=cache_key,
+        file_path=final_path,
+        requested_by=track.get("requested_by_user_id"),
+    )
+
 async def start_track_now(ctx, voice, track: dict, *, debug_report: Optional[DebugPlaybackMessage] = None):
     await resolve_track_for_playback(track, requested_by=ctx.user, debug_report=debug_report)
     await append_debug_playback_event(debug_report, "building ffmpeg audio source", stage="ffmpeg", force=True)
     player = await build_audio_player(track)
     voice.play(player, after=lambda e, vid=track['id']: after_played_track(e, vid, ctx.channel))
+    client.track_ended_at = None
     client.current_track_id = track['id']
     client.currently_playing = True
     client.last_track_info = client.current_track_info
     client.current_track_info = track
-    client.current_track_started_at = time.time()
+    start_playback_clock(track)
     sync_repeat_for_started_track(track)
+    journal_track_started(track)
     client.song_history.append(track)
     await publish_now_playing(
         ctx.channel,
@@ -6482,6 +7287,7 @@ async def start_track_now(ctx, voice, track: dict, *, debug_report: Optional[Deb
     )
     await append_debug_playback_event(debug_report, "playback started", stage="playing", force=True)
     logger.info(f"Playing now: {track['title']} ({track['id']})")
+    schedule_queue_prefetch("track started")
 
 async def prompt_move_track_next(ctx, track: dict, playlist_name: str):
     title = discord.utils.escape_markdown(str(track.get("title") or "Unknown title"))
@@ -6641,13 +7447,94 @@ def effective_playlist_cache_mode(playlist: dict) -> str:
         return client.playlist_cache_default_mode
     return mode
 
+def pinned_cache_stems() -> set:
+    """Playlist cache stems eviction must keep: cached playlists and enabled favorites."""
+    stems = set()
+    favorites_enabled = bool(favorites_cache_policy().get("enabled"))
+    for playlist in playlist_repo.playlists(copy=False):
+        if is_favorites_playlist(playlist):
+            if not favorites_enabled:
+                continue
+        elif effective_playlist_cache_mode(playlist) == "streaming":
+            continue
+        for track in playlist.get("tracks", []):
+            file_path = path_from_metadata(track.get("cache_path"))
+            if not file_path:
+                continue
+            stem, _ = os.path.splitext(os.path.basename(file_path))
+            if stem.startswith("plst-"):
+                stems.add(stem)
+    return stems
+
+def protected_cache_paths() -> set:
+    """Files for every guild's current and queued tracks, which eviction never removes."""
+    paths = set()
+    for player in guild_players.all():
+        with guild_players.using(player.guild_id):
+            targets = current_session_cache_targets()
+        for track in targets:
+            for value in (track.get("file"), path_from_metadata(track.get("cache_path"))):
+                if value:
+                    paths.add(value)
+    return paths
+
+def ensure_cache_room(projected_bytes: int = 0, *, reason: str, actor=None) -> bool:
+    """Evict unpinned cache files until *projected_bytes* fit under CACHE_HARD_LIMIT_BYTES."""
+    projected_bytes = max(0, projected_bytes or 0)
+    with cache_evictor.lock:
+        if cache_has_room(projected_bytes):
+            return True
+        needed = cache_total_bytes() + projected_bytes - CACHE_HARD_LIMIT_BYTES
+        plan = cache_evictor.plan(needed, pinned_stems=pinned_cache_stems(), protected_paths=protected_cache_paths())
+        if not plan:
+            logger.warning(f"Cache eviction could not free {human_bytes(needed)} for {reason}; everything left is pinned or in use.")
+            append_runtime_audit_event("cache-eviction-insufficient", actor=actor, details={
+                "reason": reason,
+                "needed_bytes": needed,
+                "projected_bytes": projected_bytes,
+                "cache_bytes": cache_total_bytes(),
+                "policy": cache_evictor.policy.name,
+            })
+            return False
+        for entry, priority in plan:
+            if not is_safe_cache_path(entry.path):
+                cache_index.discard(entry.path)
+                continue
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+            except OSError as exc:
+                logger.warning(f"Failed to evict cache file {entry.path}: {exc}")
+                continue
+            cache_index.discard(entry.path)
+            cache_evictor.evicted(entry, priority)
+            downloads_catalog.delete_by_path(metadata_path_for_cache_file(entry.path))
+            logger.info(f"Evicted {metadata_path_for_cache_file(entry.path)} ({human_bytes(entry.size)}) for {reason}.")
+            append_runtime_audit_event("cache-evicted", actor=actor, details={
+                "reason": reason,
+                "policy": cache_evictor.policy.name,
+                "cache_class": "playlist" if entry.is_playlist else "shortterm",
+                "cache_path": metadata_path_for_cache_file(entry.path),
+                "bytes": entry.size,
+                "hits": entry.hits,
+                "last_access": entry.last_access,
+            })
+        return cache_has_room(projected_bytes)
+
 def playlist_cache_status_line(playlist: dict) -> str:
     configured = playlist.get("cache_mode", "follow_global")
     effective = effective_playlist_cache_mode(playlist)
     forced = " forced-global" if client.force_global_playlist_cache_mode else ""
     return f"cache mode: `{configured}` -> `{effective}`{forced}"
 
-async def cache_playlist_track(track: dict, *, playlist_cache: bool, projected_limit: Optional[int] = None) -> tuple:
+async def cache_playlist_track(
+    track: dict,
+    *,
+    playlist_cache: bool,
+    budget: Optional[ytdl_executor.ByteBudget] = None,
+    lane: str = ytdl_executor.WARMUP,
+) -> tuple:
     cache_key = cache_key_for_track(track)
     video_id = str(track.get("id") or "").strip()
     if not cache_key or not video_id:
@@ -6657,24 +7544,96 @@ async def cache_playlist_track(track: dict, *, playlist_cache: bool, projected_l
         apply_cache_fields(track, existing, cache_mode="playlist" if os.path.basename(existing).startswith("plst-") else "shortterm")
         return False, 0
     url = track.get("webpage_url") or canonical_youtube_url(video_id)
+
+    async def download():
+        downloaded = await download_track_file_to_cache(url, cache_key, playlist_cache=playlist_cache, budget=budget, lane=lane)
+        # The budget the file was charged to travels with it, for callers that join this flight.
+        return downloaded and (*downloaded, budget)
+
+    cached, joined = await ytdl_flights.run(("cache_track", cache_key, playlist_cache), download)
+    if not cached:
+        return False, 0
+    file_path, ext, charged_budget = cached
+    apply_cache_fields(track, file_path, cache_mode="playlist" if playlist_cache else "shortterm")
+    track["ext"] = ext
+    size = cache_file_size(file_path)
+    if joined:
+        if budget is None or budget is charged_budget:
+            # Downloaded and counted by another caller on the same budget (or none).
+            return False, 0
+        # Another warmup paid for the download; this one still owes the file's size.
+        if not budget.settle(0, size):
+            return False, 0
+    return True, size
+
+async def download_track_file_to_cache(
+    url: str,
+    cache_key: str,
+    *,
+    playlist_cache: bool,
+    budget: Optional[ytdl_executor.ByteBudget] = None,
+    lane: str = ytdl_executor.WARMUP,
+) -> Optional[tuple]:
+    """
+    Resolve and download one track for cache_playlist_track; returns (path, ext) or None if skipped.
+
+    With a budget, the reported size is reserved before downloading and the
+    file is discarded again if its real size no longer fits.
+    """
     loop = asyncio.get_event_loop()
-    data = await loop.run_in_executor(None, lambda: ytdl.extract_info(url, download=False))
+    data = await loop.run_in_executor(ytdl_pool.lane(lane), lambda: ytdl.extract_info(url, download=False))
     if data is None:
-        return False, 0
+        return None
     if 'entries' in data:
         data = next((entry for entry in data['entries'] if entry), None)
     if data is None:
-        return False, 0
+        return None
     filesize = data.get('filesize') or data.get('filesize_approx') or 0
-    if projected_limit is not None and filesize and filesize > projected_limit:
-        return False, 0
-    if not enough_disk_for_download() or not cache_has_room(filesize or 0):
-        logger.warning("Playlist cache download skipped because disk/cache limit was reached.")
-        return False, 0
-    file_path, ext, _ = await download_youtube_to_cache(url, cache_key, playlist=playlist_cache)
-    apply_cache_fields(track, file_path, cache_mode="playlist" if playlist_cache else "shortterm")
-    track["ext"] = ext
-    return True, cache_file_size(file_path)
+    if budget is not None and not budget.reserve(filesize):
+        return None
+    settled = False
+    try:
+        if not enough_disk_for_download() or not ensure_cache_room(filesize or 0, reason="playlist cache download"):
+            logger.warning("Playlist cache download skipped because disk/cache limit was reached.")
+            return None
+        file_path, ext, _ = await download_youtube_to_cache(url, cache_key, playlist=playlist_cache, info=data, lane=lane)
+        settled = True
+        if budget is not None and not budget.settle(filesize, cache_file_size(file_path)):
+            discard_over_budget_cache_file(file_path, cache_key)
+            return None
+    finally:
+        if budget is not None and not settled:
+            budget.release(filesize)
+    return file_path, ext
+
+def discard_over_budget_cache_file(file_path: str, cache_key: str):
+    if not file_path or not is_safe_cache_path(file_path, cache_key):
+        return
+    try:
+        os.remove(file_path)
+        cache_index.discard(file_path)
+    except OSError as exc:
+        logger.warning(f"Failed to remove over-budget cache file {file_path}: {exc}")
+    logger.info(f"Discarded over-budget cache file {file_path}")
+
+def queue_positions(*, include_current: bool = True) -> dict:
+    """id(track) -> position for queued tracks; the current track is -1."""
+    positions = {id(track): index for index, track in enumerate(queue)}
+    if include_current and client.current_track_info:
+        positions.setdefault(id(client.current_track_info), -1)
+    return positions
+
+def order_by_queue_position(tracks: list, *, include_current: bool = True) -> list:
+    """(index, track) pairs for the tracks still current or queued, soonest to play first."""
+    positions = queue_positions(include_current=include_current)
+    pending = [(index, track) for index, track in enumerate(tracks) if id(track) in positions]
+    pending.sort(key=lambda item: positions[id(item[1])])
+    return pending
+
+def playlist_block_pending(tracks: list) -> bool:
+    """True while any of *tracks* is still playing or queued."""
+    positions = queue_positions()
+    return any(id(track) in positions for track in tracks)
 
 def playlist_cache_result_summary(result: dict) -> str:
     prepared = result.get("prepared", 0)
@@ -6687,7 +7646,7 @@ def playlist_cache_result_summary(result: dict) -> str:
     return ", ".join(parts)
 
 def playlist_cache_warm_message(playlist: dict, result: dict) -> Optional[str]:
-    if result.get("mode") == "streaming" or result.get("skipped"):
+    if result.get("mode") == "streaming" or result.get("skipped") or result.get("cancelled"):
         return None
     if not (result.get("prepared") or result.get("downloaded") or result.get("reused") or result.get("failed")):
         return None
@@ -6720,20 +7679,23 @@ async def cache_playlist_tracks_for_playback(playlist: dict, tracks: list, *, ac
         result["skipped"] = True
         result["reason"] = "streaming"
         return result
-    downloaded_bytes = 0
     track_limit = PLAYLIST_CACHE_BOUNDED_TRACK_LIMIT if mode == "bounded" else len(tracks)
-    byte_limit = PLAYLIST_CACHE_BOUNDED_BYTES if mode == "bounded" else CACHE_HARD_LIMIT_BYTES
+    budget = ytdl_executor.ByteBudget(PLAYLIST_CACHE_BOUNDED_BYTES if mode == "bounded" else CACHE_HARD_LIMIT_BYTES)
     changed = False
     playlist_tracks = playlist.get("tracks", [])
-
-    for index, queue_track in enumerate(tracks):
-        if mode == "bounded" and (result["considered"] >= track_limit or downloaded_bytes >= byte_limit):
-            result["capped"] = index < len(tracks)
-            break
+    pending = order_by_queue_position(tracks)
+    if len(pending) > track_limit:
+        result["capped"] = True
+        pending = pending[:track_limit]
+
+    async def warm(index: int, queue_track: dict):
+        nonlocal changed
+        if client.current_track_info is not queue_track and not track_is_queued(queue_track):
+            return
         result["considered"] += 1
         cache_key = cache_key_for_track(queue_track)
         if not cache_key:
-            continue
+            return
         existing = find_existing_cache_file(cache_key, prefer_playlist=True, video_id=str(queue_track.get("id") or "").strip() or None)
         if existing:
             apply_cache_fields(queue_track, existing, cache_mode="playlist" if os.path.basename(existing).startswith("plst-") else "shortterm")
@@ -6742,35 +7704,30 @@ async def cache_playlist_tracks_for_playback(playlist: dict, tracks: list, *, ac
             result["reused"] += 1
             result["prepared"] += 1
             changed = True
-            continue
+            return
         try:
-            did_download, size = await cache_playlist_track(
-                queue_track,
-                playlist_cache=True,
-                projected_limit=max(0, byte_limit - downloaded_bytes),
-            )
+            did_download, size = await cache_playlist_track(queue_track, playlist_cache=True, budget=budget)
         except Exception as exc:
             result["failed"] += 1
             logger.warning(f"Playlist cache download failed for {queue_track.get('id')}: {exc}")
-            continue
+            return
         if did_download:
-            if downloaded_bytes + size > byte_limit:
-                file_path = queue_track.get("file")
-                if file_path and is_safe_cache_path(file_path, cache_key):
-                    try:
-                        os.remove(file_path)
-                    except OSError as exc:
-                        logger.warning(f"Failed to remove over-limit playlist cache file {file_path}: {exc}")
-                apply_cache_fields(queue_track, None, cache_mode="streaming")
-                result["capped"] = True
-                break
             result["downloaded"] += 1
             result["prepared"] += 1
-            downloaded_bytes += size
             result["bytes"] += size
             if index < len(playlist_tracks):
                 apply_cache_fields(playlist_tracks[index], queue_track.get("file"), cache_mode="playlist")
             changed = True
+
+    run = await ytdl_executor.run_bounded(
+        [lambda index=index, track=track: warm(index, track) for index, track in pending],
+        concurrency=PLAYLIST_WARMUP_CONCURRENCY,
+        active=lambda: playlist_block_pending(tracks),
+    )
+    result["capped"] = result["capped"] or budget.capped
+    if run["cancelled"]:
+        result["cancelled"] = True
+        logger.info(f"Playlist cache warmup for {playlist.get('name')} ({playlist.get('id')}) stopped: playlist left the queue.")
     if changed:
         playlist["predownloaded"] = True
         playlist["predownloaded_at"] = time.time()
@@ -6981,11 +7938,8 @@ async def enqueue_playlist(ctx, playlist: dict, command_name: str):
     logger.info(f"Queued playlist via /{command_name}: {playlist['name']} ({playlist['id']})")
 
 def move_existing_playlist_block_to_front(playlist_id: str) -> int:
-    moving = [track for track in queue if track.get("playlist_id") == playlist_id]
-    if not moving:
-        return 0
-    queue[:] = [track for track in queue if track.get("playlist_id") != playlist_id]
-    queue[0:0] = moving
+    moving = queue.remove_where("playlist_id", playlist_id)
+    queue.extendleft(moving)
     return len(moving)
 
 async def add_playlist_to_queue_front(ctx, playlist: dict):
@@ -7019,27 +7973,39 @@ async def add_playlist_to_queue_front(ctx, playlist: dict):
 
 async def predownload_playlist_files(playlist: dict) -> int:
     downloaded_count = 0
-    for track in playlist.get("tracks", []):
+    cache_full = False
+
+    async def predownload(track: dict):
+        nonlocal downloaded_count, cache_full
+        if cache_full:
+            return
         normalize_playlist_track_cache_fields(track)
         video_id = str(track.get("id") or "")
         if not video_id:
-            continue
+            return
         cached_file = cached_file_for_track(track)
         if cached_file and os.path.basename(cached_file).startswith("plst-"):
             apply_cache_fields(track, cached_file, cache_mode="playlist")
-            continue
+            return
         url = track.get("webpage_url") or youtube_watch_url + video_id
         cache_key = cache_key_for_track(track)
         if not cache_key:
-            continue
-        if not cache_has_room():
-            logger.warning("Playlist predownload stopped because cache hard limit was reached.")
-            break
-        file_path, ext, _ = await download_youtube_to_cache(url, cache_key, playlist=True)
+            return
+        if not ensure_cache_room(reason="playlist predownload"):
+            if not cache_full:
+                logger.warning("Playlist predownload stopped because cache hard limit was reached.")
+            cache_full = True
+            return
+        file_path, ext, _ = await download_youtube_to_cache(url, cache_key, playlist=True, lane=ytdl_executor.WARMUP)
         apply_cache_fields(track, file_path, cache_mode="playlist")
         track["ext"] = ext
         track["permanent_downloaded_at"] = time.time()
         downloaded_count += 1
+
+    await ytdl_executor.run_bounded(
+        [lambda track=track: predownload(track) for track in playlist.get("tracks", [])],
+        concurrency=PLAYLIST_WARMUP_CONCURRENCY,
+    )
     playlist["predownloaded"] = True
     playlist["predownloaded_at"] = time.time()
     playlist["cache_mode"] = "keep_cached"
@@ -7053,7 +8019,7 @@ def current_session_cache_targets(*, include_current: bool = True) -> list:
     tracks.extend(queue)
     return [
         track for track in tracks
-        if isinstance(track, dict) and (track.get("webpage_url") or track.get("id"))
+        if track_record.is_track(track) and (track.get("webpage_url") or track.get("id"))
     ]
 
 async def cache_current_session_tracks(*, include_current: bool = True) -> dict:
@@ -7068,28 +8034,32 @@ async def cache_current_session_tracks(*, include_current: bool = True) -> dict:
     }
     tracks = current_session_cache_targets(include_current=include_current)
     result["total"] = len(tracks)
-    for track in tracks:
+
+    async def cache_session_track(track: dict):
+        if client.current_track_info is not track and not track_is_queued(track):
+            result["skipped"] += 1
+            return
         requester = track.get("requested_by_user_id")
         if user_has_group(requester, "nodownload"):
             result["restricted"] += 1
             logger.info(f"Session cache skipped nodownload track: {track.get('title')} ({track.get('id')})")
-            continue
+            return
         cache_key = cache_key_for_track(track)
         video_id = str(track.get("id") or "").strip()
         if not cache_key or not video_id:
             result["skipped"] += 1
-            continue
+            return
         existing = cached_file_for_track(track) or find_existing_cache_file(cache_key, prefer_playlist=True, video_id=video_id)
         if existing:
             apply_cache_fields(track, existing, cache_mode="playlist" if os.path.basename(existing).startswith("plst-") else "shortterm")
             result["reused"] += 1
-            continue
+            return
         try:
             did_download, size = await cache_playlist_track(track, playlist_cache=False)
         except Exception as exc:
             result["failed"] += 1
             logger.warning(f"Session cache download failed for {track.get('title')} ({video_id}): {exc}")
-            continue
+            return
         if did_download:
             result["downloaded"] += 1
             result["bytes"] += size
@@ -7098,6 +8068,11 @@ async def cache_current_session_tracks(*, include_current: bool = True) -> dict:
                 result["reused"] += 1
             else:
                 result["skipped"] += 1
+
+    await ytdl_executor.run_bounded(
+        [lambda track=track: cache_session_track(track) for track in tracks],
+        concurrency=PLAYLIST_WARMUP_CONCURRENCY,
+    )
     return result
 
 async def playlist_creation_timeout(key: tuple, channel, marker: float):
@@ -7338,44 +8313,115 @@ async def handle_playlist_creation_message(msg) -> bool:
         return True
     return False
 
+def track_is_queued(track: dict) -> bool:
+    return queue.contains_track(track)
+
+async def prefetch_track(track: dict):
+    """
+    Get a queued track ready the way play_next_channel would, ahead of time.
+
+    Tracks with needs_refresh go through the normal fetch path, so nodownload,
+    stream-only mode, size limits and the cache cap apply exactly as they do at
+    playback. Anything that will stream gets its direct URL resolved into
+    stream_url_cache. Prefetch never adds files to the playlist cache, so the
+    bounded playlist and favorites budgets are left to their warmups.
+    """
+    requester = track.get("requested_by_user_id")
+    if track.get("needs_refresh"):
+        await resolve_track_for_playback(track, requested_by=requester, lane=ytdl_executor.PREFETCH)
+    if user_has_group(requester, "nodownload") or not cached_file_for_track(track):
+        video_id = str(track.get("id") or "")
+        if video_id and not stream_url_cache.is_fresh(video_id):
+            await extract_stream_info(youtube_url_for_track(track), lane=ytdl_executor.PREFETCH)
+
+async def prefetch_upcoming_tracks(reason: str):
+    while True:
+        client.queue_prefetch_pending = False
+        for track in list(queue[:PREFETCH_LOOKAHEAD_TRACKS]):
+            if not track_is_queued(track):
+                continue
+            try:
+                await prefetch_track(track)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                logger.info(f"Prefetch of queued track {track.get('id')} failed ({reason}): {exc}")
+        if not client.queue_prefetch_pending:
+            return
+
+def schedule_queue_prefetch(reason: str):
+    """Prepare the next PREFETCH_LOOKAHEAD_TRACKS queued tracks while the current one plays."""
+    if PREFETCH_LOOKAHEAD_TRACKS <= 0 or not queue:
+        return
+    task = client.queue_prefetch_task
+    if task is not None and not task.done():
+        client.queue_prefetch_pending = True
+        return
+    client.queue_prefetch_task = asyncio.create_task(prefetch_upcoming_tracks(reason))
+
+def record_track_gap(track: dict):
+    """Record the silence between the previous track ending and this one starting."""
+    ended_at = client.track_ended_at
+    client.track_ended_at = None
+    if ended_at is None:
+        return
+    gap = time.monotonic() - ended_at
+    client.track_gap_samples.append(gap)
+    logger.debug(f"Track gap before {track.get('id')}: {gap * 1000:.0f} ms")
+
+def playing_video_ids() -> set:
+    """Video ids of the tracks playing right now, in every guild."""
+    return {str(player.current_track_id) for player in guild_players.all() if player.current_track_id}
+
+def expire_downloaded_tracks(catalog_entries: list) -> int:
+    """Delete a batch of expired short-term downloads; tracks still playing or queued get a fresh delay."""
+    in_use = playing_video_ids()
+    for player in guild_players.all():
+        in_use |= player.queue.video_ids()
+    deferred = [catalog_entry.video_id for catalog_entry in catalog_entries if catalog_entry.video_id in in_use]
+    if deferred:
+        # Never less than the scheduler's retry delay: a 0s delete delay would make the row due again at once.
+        delay = max(client.download_delete_delay_seconds, download_expiry.retry_delay)
+        downloads_catalog.set_expiry(deferred, time.time() + delay)
+    expired = [catalog_entry for catalog_entry in catalog_entries if catalog_entry.video_id not in in_use]
+    removed = 0
+    for catalog_entry in expired:
+        if remove_download_file(path_from_metadata(catalog_entry.path), video_id=catalog_entry.video_id, reason="delayed playback cleanup"):
+            removed += 1
+    downloads_catalog.delete_many(catalog_entry.video_id for catalog_entry in expired)
+    if expired or deferred:
+        append_runtime_audit_event("delayed-playback-cleanup", details={
+            "video_ids": [catalog_entry.video_id for catalog_entry in expired],
+            "removed": removed,
+            "deferred_video_ids": deferred,
+        })
+        logger.info(f"Expired {len(expired)} downloaded song(s) ({removed} file(s) removed), deferred {len(deferred)} still in use.")
+    return len(expired)
+
+download_expiry = track_catalog.ExpiryScheduler(downloads_catalog, expire_downloaded_tracks)
+
 def after_played_track(error, video_id, channel):
     """Callback that runs after a track finishes playing or is stopped."""
+    # Runs on the voice thread; play_next_channel below inherits this guild.
+    guild_players.activate(channel)
+    if client.source_swap_pending:
+        # switch_current_track_to_pcm stopped this source and already started its replacement.
+        client.source_swap_pending = False
+        return
+    client.track_ended_at = time.monotonic()
     if error:
         logger.error(f"Error in playback: {error}")
     # Mark this track as played in history
     if video_id:
         client.played_tracks.add(video_id)
+    # A stream tee still downloading when its track ends is abandoned, not cached.
+    tee = stream_tees.get(str(video_id or ""))
+    if tee is not None and not tee.finished.is_set():
+        tee.cancel()
     # Schedule deletion of the file after the configured delay (if it exists in cache)
-    if video_id in downloaded:
-        delete_delay = client.download_delete_delay_seconds
-        async def remove_file():
-            await asyncio.sleep(delete_delay)
-            # If the deletion task was canceled due to reuse, skip actual deletion
-            if video_id not in client.deletion_tasks:
-                return
-            info = downloaded.get(video_id)
-            if info:
-                file_path = info.get('filepath')
-                removed = remove_download_file(file_path, video_id=video_id, reason="delayed playback cleanup")
-                downloaded.pop(video_id, None)
-                save_downloads_metadata("delayed playback cleanup")
-                append_runtime_audit_event("delayed-playback-cleanup", details={
-                    "video_id": video_id,
-                    "removed": removed,
-                    "delay_seconds": delete_delay,
-                    "path": file_path,
-                })
-            # Remove this task from tracking
-            client.deletion_tasks.pop(video_id, None)
-        # If a deletion task is already scheduled for this video, cancel it
-        if video_id in client.deletion_tasks:
-            try:
-                client.deletion_tasks[video_id].cancel()
-            except Exception as e:
-                logger.debug(f"Canceling previous deletion task for {video_id}: {e}")
-        # Schedule the deletion task in the event loop
-        task = asyncio.run_coroutine_threadsafe(remove_file(), client.loop)
-        client.deletion_tasks[video_id] = task
+    delete_delay = client.download_delete_delay_seconds
+    if downloads_catalog.record_play(video_id, expires_at=time.time() + delete_delay):
+        download_expiry.wake()
         append_runtime_audit_event("delayed-playback-cleanup-scheduled", details={
             "video_id": video_id,
             "delay_seconds": delete_delay,
@@ -7392,7 +8438,7 @@ def after_played_track(error, video_id, channel):
         and client.repeat_track_id == video_id
         and client.current_track_info
     ):
-        replay_track = dict(client.current_track_info)
+        replay_track = track_record.from_dict(client.current_track_info)
         queue.insert(0, replay_track)
         logger.info(f"Repeat-one queued current track again: {replay_track.get('title')} ({video_id})")
 
@@ -7401,19 +8447,21 @@ def after_played_track(error, video_id, channel):
 
 async def play_next_channel(channel):
     """Plays the next track in the queue, if any."""
+    guild_players.activate(channel)
+    voice = active_voice_client(channel.guild)
+    if (voice is None or not voice.is_connected()) and client.current_track_info and not client.auto_leave_disconnect_in_progress:
+        # The track stopped because the voice connection went away, not because it ended.
+        saved_count = save_last_session_recovery(getattr(voice, "channel", None), reason="disconnect")
+        await clear_playback_tracking("voice connection lost")
+        await update_bot_presence_idle(reason="voice connection lost", channel=channel)
+        if saved_count:
+            await channel.send(f"Lost the voice connection. Saved {saved_count} song(s); continue with `/play:last`.")
+        return
     if len(queue) > 0:
-        track = queue.pop(0)
+        track = queue.popleft()
         try:
-            await resolve_track_for_playback(track, requested_by=track.get("requested_by_user_id"))
-            cached_file = None if user_has_group(track.get("requested_by_user_id"), "nodownload") else cached_file_for_track(track)
-            speed = playback_speed_for_track(track)
-            track["playback_speed"] = speed
-            if cached_file:
-                track["file"] = cached_file
-                source = discord.FFmpegPCMAudio(cached_file, **ffmpeg_audio_options_for_speed(speed))
-                player = discord.PCMVolumeTransformer(source, volume=client.volume)
-            else:
-                player, _ = await YTDLSource.from_url(track['webpage_url'], stream=True, speed=speed)
+            # Same source selection as /play: cache, an in-flight progressive download, then the stream.
+            player = await build_audio_player(track)
             guild = channel.guild
             client.current_track_id = track['id']
             # Start playback and provide callback
@@ -7421,14 +8469,17 @@ async def play_next_channel(channel):
             if voice is None:
                 raise RuntimeError("No active voice client for queued playback.")
             voice.play(player, after=lambda e, vid=track['id']: after_played_track(e, vid, channel))
+            record_track_gap(track)
             client.currently_playing = True
             # Update current and last track info
             client.last_track_info = client.current_track_info
             client.current_track_info = track
-            client.current_track_started_at = time.time()
+            start_playback_clock(track)
             sync_repeat_for_started_track(track)
+            journal_track_started(track)
             await publish_now_playing(channel, track)
             logger.info(f"Started playing: {track['title']} ({track['id']})")
+            schedule_queue_prefetch("track started")
             # Add track to session history if not already recorded
             if track not in client.song_history:
                 client.song_history.append(track)
@@ -7449,13 +8500,26 @@ async def on_ready():
     await update_bot_presence_idle(reason="startup")
     logger.info(f"{client.user} on käynnistynyt.")
     logger.info(build_runtime_status())
-    try:
-        synced = await client.tree.sync(guild=MY_GUILD)
-        logger.info(f"Synced {len(synced)} command(s)")
-    except Exception as e:
-        logger.error(f"Sync error: {e}")
+    for guild in COMMAND_GUILDS:
+        try:
+            synced = await client.tree.sync(guild=guild)
+            logger.info(f"Synced {len(synced)} command(s) to guild {guild.id}")
+        except Exception as e:
+            logger.error(f"Sync error for guild {guild.id}: {e}")
+    blackbox_sink.start()
+    session_journal.start()
+    download_expiry.start()
+    if client.cache_index_reconcile_task is None or client.cache_index_reconcile_task.done():
+        client.cache_index_reconcile_task = asyncio.create_task(reconcile_cache_index_periodically())
+    if client.stream_url_refresh_task is None or client.stream_url_refresh_task.done():
+        client.stream_url_refresh_task = asyncio.create_task(refresh_stream_urls_periodically())
+    if client.playback_position_task is None or client.playback_position_task.done():
+        client.playback_position_task = asyncio.create_task(journal_playback_positions_periodically())
     if _webui_module is not None:
-        bot_state = _webui_module.BotState(client_ref=client, queue_ref=queue)
+        bot_state = _webui_module.BotState(
+            client_ref=client, players_ref=guild_players, audit_log=runtime_audit_log,
+            pause_clock=pause_playback_clock, resume_clock=resume_playback_clock,
+        )
         await _webui_module.start(
             playlists_dir=PLAYLISTS_DIR,
             bot_state=bot_state,
@@ -7495,11 +8559,15 @@ async def on_ready():
 
 @client.event
 async def on_voice_state_update(member, before, after):
+    guild_players.activate(member)
     # If the bot client leaves voice entirely, reset tracking state
     bot_id = getattr(client.user, "id", None)
     if bot_id and member.id == bot_id and after.channel is None:
         if not client.auto_leave_disconnect_in_progress:
             cancel_auto_leave_task("bot disconnected")
+            if client.current_track_info:
+                # Dropped from voice mid-track: keep the session and its position for /play:last.
+                save_last_session_recovery(before.channel, reason="disconnect")
         cancel_alone_speed_reset_task("bot disconnected")
         client.current_voice_channel = None
         await clear_playback_tracking("bot disconnected")
@@ -7526,6 +8594,7 @@ async def on_voice_state_update(member, before, after):
 @client.event
 async def on_message(msg):
     """On receiving a message in monitored channel, save quotes."""
+    guild_players.activate(msg.guild)
     if await handle_playlist_creation_message(msg):
         return
     if QUOTES_ID and msg.channel == client.get_channel(QUOTES_ID):
@@ -7550,6 +8619,7 @@ async def on_reaction_add(reaction, user):
     """Handles reaction-based controls for playback and confirmation prompts."""
     if user == client.user:
         return  # ignore the bot's own reactions
+    guild_players.activate(reaction.message.guild)
     if await handle_playlist_pager_reaction(reaction, user):
         return
     if await handle_debug_playback_reaction(reaction, user):
@@ -7592,9 +8662,11 @@ async def on_reaction_add(reaction, user):
             if voice:
                 if voice.is_playing():
                     voice.pause()
+                    pause_playback_clock()
                     logger.info("Audio paused via reaction.")
                 elif voice.is_paused():
                     voice.resume()
+                    resume_playback_clock()
                     logger.info("Audio resumed via reaction.")
         elif emoji == "◀️":
             await request_voice_vote(user, reaction.message.channel, "previous", "replay the previous track")
@@ -7842,6 +8914,7 @@ async def webui_command(ctx):
         discord_user_id=ctx.user.id,
         discord_username=str(ctx.user),
         is_admin=is_user_admin(ctx.user),
+        guild_id=ctx.guild_id or 0,
     )
 
     link = f"{webui_url}/?s={session.token}"
@@ -7878,7 +8951,7 @@ async def join(ctx):
             cancel_auto_leave_task("joined voice")
             cancel_alone_speed_reset_task("joined voice")
             # Reset session history when joining a new voice channel
-            client.song_history = []
+            client.song_history.clear()
             await ctx.response.send_message(f"Joined voice channel {target_channel.name}")
         except Exception as e:
             logger.error(f"Join error: {e}")
@@ -7933,6 +9006,22 @@ async def config_show(ctx):
             logger.warning(f"Failed to add config reaction {emoji}: {exc}")
     logger.info(f"Config panel opened by {user_display(ctx.user)} ({user_id_value(ctx.user)}).")
 
+@app_commands.describe(query="Words from a song title, uploader, or playlist name")
+@client.tree.command(name="search")
+async def search(ctx, query: str):
+    """Search songs across playlists, favorites, and downloaded tracks."""
+    record_command(ctx)
+    started = time.perf_counter()
+    hits = search_library(query, ctx.user)
+    logger.info(
+        f"[search] user={user_display(ctx.user)} query={query[:80]!r} hits={len(hits)} "
+        f"took={(time.perf_counter() - started) * 1000:.1f}ms"
+    )
+    if not hits:
+        await ctx.response.send_message("No songs or playlists matched that search.", ephemeral=True)
+        return
+    await send_paged_playlist_message(ctx, search_result_pages(query, hits))
+
 @app_commands.describe(user="User to inspect")
 @client.tree.command(name="userstats")
 async def userstats(ctx, user: discord.Member):
@@ -7989,16 +9078,16 @@ async def clear_queue(ctx):
             if str(reaction.emoji) == "👍":
                 # Admin confirmed file deletion
                 count = 0
-                current_id = client.current_track_id
-                for vid, info in list(downloaded.items()):
-                    if vid == current_id:
-                        # Do not delete the file of the currently playing track, if any
+                playing_ids = playing_video_ids()
+                removed_ids = []
+                for record in downloads_catalog.records():
+                    if record.video_id in playing_ids:
+                        # Do not delete the file of a currently playing track, in any guild
                         continue
-                    file_path = info.get('filepath')
-                    if remove_download_file(file_path, video_id=vid, reason="admin clear_queue"):
+                    if remove_download_file(path_from_metadata(record.path), video_id=record.video_id, reason="admin clear_queue"):
                         count += 1
-                    downloaded.pop(vid, None)
-                save_downloads_metadata("admin clear_queue deletion")
+                    removed_ids.append(record.video_id)
+                downloads_catalog.delete_many(removed_ids)
                 await ctx.followup.send(f"Queue cleared and {count} files deleted from disk.")
                 append_runtime_audit_event("clear-queue", actor=ctx.user, details={
                     "queue_count": len(client.queue_backup or []),
@@ -8036,6 +9125,7 @@ async def skip(ctx):
     repeat=f"Repeat a single-track request; values above {MAX_PLAY_REPEAT_COUNT} enable repeat-one loop",
     speed=f"Playback speed from {MIN_PLAYBACK_SPEED:g} to {MAX_PLAYBACK_SPEED:g}; requires admin, playspeed group, or allow-all",
 )
+@app_commands.autocomplete(url=play_query_autocomplete)
 @client.tree.command()
 async def play(
     ctx,
@@ -8108,7 +9198,7 @@ async def play(
                     apply_channel_volume_default(ctx.user.voice.channel, "play join")
                     cancel_auto_leave_task("play joined voice")
                     cancel_alone_speed_reset_task("play joined voice")
-                    client.song_history = []  # reset history for new session
+                    client.song_history.clear()  # reset history for new session
                     await append_debug_playback_event(
                         debug_report,
                         f"joined voice channel {ctx.user.voice.channel.name}",
@@ -8185,8 +9275,9 @@ async def play(
             client.currently_playing = True
             client.last_track_info = client.current_track_info
             client.current_track_info = track
-            client.current_track_started_at = time.time()
+            start_playback_clock(track)
             sync_repeat_for_started_track(track)
+            journal_track_started(track)
             client.song_history.append(track)
             await publish_now_playing(
                 ctx.channel,
@@ -8264,6 +9355,7 @@ async def play(
             await ctx.followup.send(playback_error_message(e, ctx.user), ephemeral=True)
 
 @app_commands.describe(query="YouTube URL, YouTube playlist URL, or search term")
+@app_commands.autocomplete(query=track_query_autocomplete)
 @client.tree.command()
 async def playtop(ctx, *, query: str):
     """Adds a song to the top of the queue (plays next)."""
@@ -8285,7 +9377,7 @@ async def playtop(ctx, *, query: str):
                     apply_channel_volume_default(ctx.user.voice.channel, "playtop join")
                     cancel_auto_leave_task("playtop joined voice")
                     cancel_alone_speed_reset_task("playtop joined voice")
-                    client.song_history = []
+                    client.song_history.clear()
                     await ctx.followup.send(f"Joined voice channel {ctx.user.voice.channel.name}")
                 except Exception as e:
                     logger.error(f"Voice connection failed: {e}")
@@ -8316,8 +9408,9 @@ async def playtop(ctx, *, query: str):
             client.currently_playing = True
             client.last_track_info = client.current_track_info
             client.current_track_info = track
-            client.current_track_started_at = time.time()
+            start_playback_clock(track)
             sync_repeat_for_started_track(track)
+            journal_track_started(track)
             client.song_history.append(track)
             await publish_now_playing(
                 ctx.channel,
@@ -8383,12 +9476,14 @@ async def enqueue_track(ctx, query: str, command_name: str = "enqueue"):
         await ctx.followup.send(playback_error_message(e, ctx.user), ephemeral=True)
 
 @app_commands.describe(query="YouTube URL, YouTube playlist URL, search term, or playlist:name")
+@app_commands.autocomplete(query=play_query_autocomplete)
 @client.tree.command(name="enqueue")
 async def enqueue_cmd(ctx, *, query: str):
     """Enqueues a song to the queue (alias: /q)."""
     await enqueue_track(ctx, query, "enqueue")
 
 @app_commands.describe(query="YouTube URL, YouTube playlist URL, search term, or playlist:name")
+@app_commands.autocomplete(query=play_query_autocomplete)
 @client.tree.command(name="q")
 async def q_cmd(ctx, *, query: str):
     """Alias of /enqueue."""
@@ -8440,8 +9535,8 @@ async def queue_first(ctx, target: str, command_name: str):
         logger.info(f"/{command_name} requested position 1; queue already starts with {track.get('title', 'Unknown title')} ({track.get('id', '')}).")
         return
 
-    track = queue.pop(position - 1)
-    queue.insert(0, track)
+    track = queue[position - 1]
+    queue.move(position - 1, 0)
     record_suggestion(ctx, command_name, f"position {position}", track)
     title = discord.utils.escape_markdown(str(track.get('title') or 'Unknown title'))
     await ctx.response.send_message(f"Moved **{title}** to the front of the queue. It will play next.")
@@ -8464,6 +9559,7 @@ async def send_queue_list(ctx, *, links: bool = False):
         await ctx.response.send_message("Queue is empty.")
     else:
         lines = ["Upcoming songs:"]
+        length = len(lines[0])
         show_links = links and not client.queue_links_disabled
         for i, track in enumerate(queue, start=1):
             title, url = track_display_parts(track)
@@ -8475,11 +9571,12 @@ async def send_queue_list(ctx, *, links: bool = False):
                 entry.append(f"*{url}*")
             remaining = len(queue) - i
             footer = f"_and {remaining} more queued song(s) omitted._" if remaining else None
-            candidate_lines = lines + entry + ([footer] if footer else [])
-            if len("\n".join(candidate_lines)) > DISCORD_MESSAGE_SAFE_LIMIT:
+            entry_length = sum(len(line) + 1 for line in entry)
+            if length + entry_length + (len(footer) + 1 if footer else 0) > DISCORD_MESSAGE_SAFE_LIMIT:
                 lines.append(f"_and {len(queue) - i + 1} more queued song(s) omitted._")
                 break
             lines.extend(entry)
+            length += entry_length
         if links and client.queue_links_disabled:
             lines.append("_Links are disabled by an admin._")
         output = "\n".join(lines)
@@ -8732,16 +9829,19 @@ async def show_playlist_details(ctx, name: str, flags: Optional[str] = None, *,
     await send_paged_playlist_message(ctx, playlist_detail_pages(playlist))
 
 @app_commands.describe(name="Playlist name, id, or playlist:name", flags="Optional flag: -force")
+@app_commands.autocomplete(name=playlist_name_autocomplete)
 @playlist_group.command(name="edit", description="Show editable playlist details.")
 async def playlist_edit(ctx, name: str, flags: Optional[str] = None):
     await show_playlist_details(ctx, name, flags, require_edit=True)
 
 @app_commands.describe(playlist="Playlist name, id, or playlist:name")
+@app_commands.autocomplete(playlist=playlist_name_autocomplete)
 @playlist_group.command(name="show", description="Show playlist details.")
 async def playlist_show(ctx, playlist: str):
     await show_playlist_details(ctx, playlist)
 
 @app_commands.describe(playlist="Playlist name, id, or playlist:name")
+@app_commands.autocomplete(playlist=playlist_name_autocomplete)
 @playlist_group.command(name="play", description="Play or queue a saved playlist.")
 async def playlist_play(ctx, playlist: str):
     record_command(ctx)
@@ -8764,6 +9864,7 @@ async def playlist_play(ctx, playlist: str):
     app_commands.Choice(name="queue", value="queue"),
     app_commands.Choice(name="url", value="url"),
 ])
+@app_commands.autocomplete(playlist=playlist_name_autocomplete, url=track_query_autocomplete)
 @playlist_group.command(name="add", description="Add a song to a playlist. Defaults to currently playing.")
 async def playlist_add(ctx, playlist: str, source: Optional[str] = None, queue_position: Optional[int] = None, url: Optional[str] = None):
     record_command(ctx)
@@ -8844,6 +9945,7 @@ async def playlist_add(ctx, playlist: str, source: Optional[str] = None, queue_p
 @app_commands.choices(source=[
     app_commands.Choice(name="current", value="current"),
 ])
+@app_commands.autocomplete(playlist=playlist_name_autocomplete)
 @playlist_group.command(name="fill", description="Add queued songs missing from a playlist.")
 async def playlist_fill(ctx, source: str, playlist: str):
     record_command(ctx)
@@ -8895,6 +9997,7 @@ async def playlist_fill(ctx, source: str, playlist: str):
     )
 
 @app_commands.describe(playlist="Playlist name, id, or playlist:name", user="Discord user to add as manager")
+@app_commands.autocomplete(playlist=playlist_name_autocomplete)
 @playlist_group.command(name="addmod", description="Add a playlist manager.")
 async def playlist_addmod(ctx, playlist: str, user: discord.Member):
     record_command(ctx)
@@ -8967,11 +10070,13 @@ async def remove_playlist_command(ctx, playlist: str, flags: Optional[str] = Non
     logger.info(f"Playlist soft-deleted: {target.get('name')} ({target.get('id')})")
 
 @app_commands.describe(playlist="Playlist name, id, or playlist:name", flags="Optional flags: -now -force")
+@app_commands.autocomplete(playlist=playlist_name_autocomplete)
 @playlist_group.command(name="remove", description="Delete a playlist with a rescue window.")
 async def playlist_remove(ctx, playlist: str, flags: Optional[str] = None):
     await remove_playlist_command(ctx, playlist, flags)
 
 @app_commands.describe(playlist="Playlist name, id, or playlist:name", flags="Optional flags: -now -force")
+@app_commands.autocomplete(playlist=playlist_name_autocomplete)
 @playlist_group.command(name="delete", description="Alias for removing a playlist.")
 async def playlist_delete(ctx, playlist: str, flags: Optional[str] = None):
     await remove_playlist_command(ctx, playlist, flags)
@@ -9017,6 +10122,7 @@ async def playlist_rescue(ctx, playlist: Optional[str] = None):
     logger.info(f"Playlist rescued: {target.get('name')} ({target.get('id')})")
 
 @app_commands.describe(playlist="Playlist name, id, or playlist:name", position="1-based song position to remove")
+@app_commands.autocomplete(playlist=playlist_name_autocomplete)
 @playlist_group.command(name="removesong", description="Remove a song from a playlist.")
 async def playlist_removesong(ctx, playlist: str, position: int, flags: Optional[str] = None):
     record_command(ctx)
@@ -9043,6 +10149,7 @@ async def playlist_removesong(ctx, playlist: str, position: int, flags: Optional
     )
 
 @app_commands.describe(playlist="Playlist name, id, or playlist:name", from_position="Current position", to_position="New position", flags="Optional flag: -force")
+@app_commands.autocomplete(playlist=playlist_name_autocomplete)
 @playlist_group.command(name="move", description="Move a song inside a playlist.")
 async def playlist_move(ctx, playlist: str, from_position: int, to_position: int, flags: Optional[str] = None):
     record_command(ctx)
@@ -9067,6 +10174,7 @@ async def playlist_move(ctx, playlist: str, from_position: int, to_position: int
     await safe_interaction_send(ctx, f"Moved **{discord.utils.escape_markdown(str(track.get('title') or 'Unknown title'))}** to position {to_position}.")
 
 @app_commands.describe(playlist="Playlist name, id, or playlist:name", new_name="New playlist name", flags="Optional flag: -force")
+@app_commands.autocomplete(playlist=playlist_name_autocomplete)
 @playlist_group.command(name="rename", description="Rename a playlist.")
 async def playlist_rename(ctx, playlist: str, new_name: str, flags: Optional[str] = None):
     record_command(ctx)
@@ -9100,6 +10208,7 @@ async def playlist_rename(ctx, playlist: str, new_name: str, flags: Optional[str
     logger.info(f"Playlist renamed: {old_name} -> {target['name']} ({target.get('id')})")
 
 @app_commands.describe(playlist="Playlist name, id, or playlist:name", locked="Whether managers are blocked from editing")
+@app_commands.autocomplete(playlist=playlist_name_autocomplete)
 @playlist_group.command(name="lock", description="Lock or unlock a playlist.")
 async def playlist_lock(ctx, playlist: str, locked: bool):
     record_command(ctx)
@@ -9122,6 +10231,7 @@ async def playlist_lock(ctx, playlist: str, locked: bool):
     app_commands.Choice(name="bounded", value="bounded"),
     app_commands.Choice(name="keep_cached", value="keep_cached"),
 ])
+@app_commands.autocomplete(playlist=playlist_name_autocomplete)
 @playlist_group.command(name="cachemode", description="Set a playlist's cache behavior.")
 async def playlist_cachemode(ctx, playlist: str, mode: str):
     record_command(ctx)
@@ -9194,6 +10304,7 @@ async def playlist_cacheglobal(ctx, mode: str, force: Optional[bool] = None):
     )
 
 @app_commands.describe(playlist="Playlist name, id, or playlist:name")
+@app_commands.autocomplete(playlist=playlist_name_autocomplete)
 @playlist_group.command(name="predownload", description="Admin-only future permanent playlist download hook.")
 async def playlist_predownload(ctx, playlist: str):
     record_command(ctx)
@@ -9232,7 +10343,7 @@ async def cachequeue(ctx, include_current: Optional[bool] = True):
     if not targets:
         await ctx.followup.send("No current session tracks are available to cache.", ephemeral=True)
         return
-    append_queue_blackbox_event("cachequeue-started", tracks=[dict(track) for track in targets], actor=ctx.user, details={
+    append_queue_blackbox_event("cachequeue-started", tracks=targets, actor=ctx.user, details={
         "include_current": bool(include_current),
     })
     append_runtime_audit_event("cachequeue-started", actor=ctx.user, details={
@@ -9240,7 +10351,7 @@ async def cachequeue(ctx, include_current: Optional[bool] = True):
         "track_count": len(targets),
     })
     result = await cache_current_session_tracks(include_current=bool(include_current))
-    append_queue_blackbox_event("cachequeue-finished", tracks=[dict(track) for track in targets], actor=ctx.user, details=result)
+    append_queue_blackbox_event("cachequeue-finished", tracks=targets, actor=ctx.user, details=result)
     append_runtime_audit_event("cachequeue-finished", actor=ctx.user, details=result)
     await ctx.followup.send(
         "\n".join([
@@ -9270,6 +10381,7 @@ def purge_cache_files(*, keep_current: bool = True, actor=None) -> PurgeCacheRes
         f"Cache purge started by admin: dir={CACHE_DIR} keep_current={keep_current} "
         f"current_file={metadata_path_for_cache_file(current_file) if current_file else '-'}"
     )
+    remaining_paths = []
     for filename in os.listdir(CACHE_DIR):
         file_path = os.path.join(CACHE_DIR, filename)
         result.scanned += 1
@@ -9279,29 +10391,22 @@ def purge_cache_files(*, keep_current: bool = True, actor=None) -> PurgeCacheRes
             continue
         if current_file and os.path.realpath(file_path) == current_file:
             result.kept_current += 1
+            remaining_paths.append(metadata_path_for_cache_file(file_path))
             logger.info(f"Cache purge kept current playing file: {metadata_path_for_cache_file(file_path)}")
             continue
         size = cache_file_size(file_path)
         try:
             os.remove(file_path)
+            cache_index.discard(file_path)
             result.removed += 1
             result.removed_bytes += size
             logger.info(f"Cache purge removed file: {metadata_path_for_cache_file(file_path)} size={human_bytes(size)}")
         except OSError as exc:
             result.failed += 1
+            remaining_paths.append(metadata_path_for_cache_file(file_path))
             logger.warning(f"Failed to purge cache file {file_path}: {exc}")
-    for vid, info in list(downloaded.items()):
-        file_path = info.get("filepath")
-        if not file_path or not is_safe_cache_path(file_path):
-            downloaded.pop(vid, None)
-            result.metadata_removed += 1
-            logger.info(f"Cache purge removed stale metadata entry for {vid}: invalid path {file_path or '-'}")
-            continue
-        if not os.path.isfile(path_from_metadata(file_path)):
-            downloaded.pop(vid, None)
-            result.metadata_removed += 1
-            logger.info(f"Cache purge removed stale metadata entry for {vid}: missing file {file_path}")
-    save_downloads_metadata("cache purge")
+    # Every catalog row not pointing at a file that survived the purge is now stale.
+    result.metadata_removed = downloads_catalog.retain_paths(remaining_paths)
     logger.info(
         "Cache purge completed: "
         f"scanned={result.scanned} removed={result.removed} removed_bytes={human_bytes(result.removed_bytes)} "
@@ -9327,17 +10432,19 @@ async def cachestatus(ctx):
     if not is_user_admin(ctx.user):
         await ctx.response.send_message("You do not have permission to use this command.", ephemeral=True)
         return
-    cache_bytes = cache_total_bytes()
+    counters = cache_index.byte_counters()
+    cache_bytes = counters["total"]
     limit_bytes = CACHE_HARD_LIMIT_BYTES
-    files = 0
-    if os.path.isdir(CACHE_DIR):
-        files = sum(1 for name in os.listdir(CACHE_DIR) if is_safe_cache_path(os.path.join(CACHE_DIR, name)))
+    files = len(cache_index)
     await ctx.response.send_message(
         "\n".join([
             "**cache status**",
             f"- directory: `{metadata_path_for_cache_file(CACHE_DIR)}`",
             f"- files: `{files}`",
             f"- size: `{cache_bytes / (1024 * 1024):.1f} MB / {limit_bytes // (1024 * 1024)} MB`",
+            f"- playlist: `{human_bytes(counters['playlist'])}` (favorites `{human_bytes(counters['favorites'])}`)",
+            f"- shortterm: `{human_bytes(counters['shortterm'])}`",
+            f"- eviction: `{cache_evictor.policy.name}` ({cache_evictor.evicted_files} file(s), {human_bytes(cache_evictor.evicted_bytes)} since start)",
             f"- playlist default: `{client.playlist_cache_default_mode}`",
             f"- force global playlist cache: `{client.force_global_playlist_cache_mode}`",
         ]),
@@ -9375,19 +10482,19 @@ async def purgequeue(ctx):
         )
         return
     count = 0
-    current_id = client.current_track_id
-    for vid, info in list(downloaded.items()):
-        if vid == current_id:
-            continue  # skip current playing track's file
-        file_path = info.get('filepath')
-        if remove_download_file(file_path, video_id=vid, reason="purgequeue"):
+    playing_ids = playing_video_ids()
+    removed_ids = []
+    for record in downloads_catalog.records():
+        if record.video_id in playing_ids:
+            continue  # skip the files of tracks playing in any guild
+        if remove_download_file(path_from_metadata(record.path), video_id=record.video_id, reason="purgequeue"):
             count += 1
-        downloaded.pop(vid, None)
-    save_downloads_metadata("purgequeue")
+        removed_ids.append(record.video_id)
+    downloads_catalog.delete_many(removed_ids)
     await ctx.response.send_message(f"Purged {count} files from disk.")
     append_runtime_audit_event("purgequeue", actor=ctx.user, details={
         "deleted_files": count,
-        "kept_current": bool(current_id),
+        "kept_current": bool(playing_ids),
     })
 
 @app_commands.describe(seconds="Seconds to wait after playback before deleting downloaded song files")
@@ -9610,6 +10717,7 @@ async def pause(ctx):
         await ctx.response.send_message("Audio is already paused")
     else:
         voice.pause()
+        pause_playback_clock()
         logger.info("Audio paused via /pause command.")
         await ctx.response.send_message("Audio paused")
 
@@ -9627,6 +10735,7 @@ async def resume(ctx):
         await ctx.response.send_message("No audio is playing to resume")
     elif voice.is_paused():
         voice.resume()
+        resume_playback_clock()
         logger.info("Audio playback resumed via /resume command.")
         await ctx.response.send_message("Resuming audio")
     else:
@@ -9849,7 +10958,7 @@ async def getqueue(ctx):
             status = "(playing now)"
         elif vid in client.played_tracks:
             status = "(played)"
-        elif any(qt.get('id') == vid for qt in queue):
+        elif queue.has_video(vid):
             status = "(queued)"
         else:
             status = "(removed)"
@@ -9879,13 +10988,26 @@ async def reboot(ctx):
         await ctx.followup.send("Reboot cancelled (no response).")
         return
     if str(reaction.emoji) == "👍":
-        # Save queue and current track to backup file
-        backup_data = {"queue": queue, "current_track": client.current_track_info}
+        # Save queue and current track to backup file, for every guild with a session
+        backup_data = {
+            "queue": [track_record.to_dict(track) for track in queue],
+            "current_track": track_record.to_dict(client.current_track_info),
+            "guilds": {
+                str(player.guild_id): {
+                    "queue": [track_record.to_dict(track) for track in player.queue],
+                    "current_track": track_record.to_dict(player.current_track_info),
+                }
+                for player in guild_players.all()
+                if player.queue or player.current_track_info
+            },
+        }
         try:
             with open("queue_backup.json", "w") as f:
                 json.dump(backup_data, f, default=str)
         except Exception as e:
             logger.error(f"Failed to save queue backup: {e}")
+        # Stop journaling before the disconnect clears the current track.
+        close_session_journal()
         await ctx.followup.send("Rebooting now...")
         logger.info("Rebooting bot by admin request...")
         # Disconnect from voice and close the bot
@@ -9930,12 +11052,21 @@ async def restorequeue(ctx):
                 timestamp = os.path.getmtime("queue_backup.json")
                 with open("queue_backup.json", "r") as f:
                     backup_data = json.load(f)
+                other_guilds = {}
+                guild_backups = backup_data.get("guilds")
+                if isinstance(guild_backups, dict):
+                    other_guilds = dict(guild_backups)
+                    backup_data = other_guilds.pop(str(guild_players.current().guild_id), None)
+                    if not backup_data:
+                        await ctx.response.send_message("No queue backup available to restore.")
+                        return
                 if time.time() - timestamp <= 600:
                     if queue:
                         await ctx.response.send_message("Cannot restore: the queue is not empty.")
                         return
-                    saved_queue = backup_data.get("queue", [])
+                    saved_queue = [track_record.from_dict(track) for track in backup_data.get("queue", [])]
                     current_track = backup_data.get("current_track")
+                    current_track = track_record.from_dict(current_track) if current_track else None
                     for track in saved_queue:
                         queue.append(track)
                         if track not in client.song_history:
@@ -9948,8 +11079,14 @@ async def restorequeue(ctx):
                     logger.info("Queue restored by admin from file backup.")
                 else:
                     await ctx.response.send_message("Backup from reboot is older than 10 minutes and cannot be restored.")
-                # Remove the backup file after attempting restore (to avoid stale restores later)
-                os.remove("queue_backup.json")
+                # Remove the backup file after attempting restore (to avoid stale restores later);
+                # other guilds' entries stay restorable until the same deadline.
+                if other_guilds and time.time() - timestamp <= 600:
+                    with open("queue_backup.json", "w") as f:
+                        json.dump({"guilds": other_guilds}, f, default=str)
+                    os.utime("queue_backup.json", (timestamp, timestamp))
+                else:
+                    os.remove("queue_backup.json")
             except Exception as e:
                 logger.error(f"Failed to restore from backup file: {e}")
                 await ctx.response.send_message("Failed to restore backup due to an error.")
@@ -10306,3 +11443,8 @@ async def on_app_command_error(ctx, error):
 
 if __name__ == "__main__":
     client.run(BOT_TOKEN)
+    ytdl_pool.shutdown()
+    blackbox_sink.shutdown()
+    runtime_audit_log.close()
+    downloads_catalog.close()
+    search_queries.close()
@@ -0,0 +1,712 @@
+"""
+In-memory view of the media cache directory.
+
+The bot used to answer every cache lookup with os.listdir(CACHE_DIR) and a
+linear prefix scan. CacheIndex keeps the directory listing in memory instead:
+
+    stem  ->  {filename, ...}
+
+where stem is the filename without its extension — either a canonical cache
+key ("<key>" / "plst-<key>") or a legacy video id ("<id>" / "plst-<id>").
+Lookups are dict hits; the bot updates the index whenever it adds, moves or
+removes a media file, and reconcile() re-reads the directory in the background
+to pick up changes made outside the bot (manual copies, admin cleanups).
+
+Temp files from in-progress downloads (".download-*") are never indexed.
+
+The index also records each file's size and keeps running byte counters per
+cache class, so "how full is the cache" is a constant-time read:
+
+    total      every indexed media file
+    playlist   "plst-*" files (playlist and favorites caching)
+    shortterm  everything else (one-off downloads that expire after playback)
+    favorites  the subset of playlist files referenced by favorites playlists
+
+Favorites membership is not visible in the file name; the bot tells the
+index which stems became or stopped being favorites with
+update_favorite_stems() as favorites playlists change.
+
+Each file also carries a last-access time and hit count (seeded from the
+file's mtime on scan, bumped with touch() on playback) and its GDSF value,
+clock + hits / size_mib as of its last add or touch. CacheEvictor uses them
+to choose victims when a download needs room under the hard cap; the
+ranking comes from a pluggable EvictionPolicy (LRU, LFU or GDSF).
+
+ProgressiveDownload lets playback start on a cache miss before the download
+has finished: the download writes straight to its temp file, and a
+GrowingFileReader tails that file for ffmpeg, waiting for more bytes instead
+of treating the current end as EOF. fetch_to_file() is the plain HTTP
+download used to tee a direct stream URL into the cache the same way.
+"""
+import abc
+import io
+import logging
+import os
+import re
+import threading
+import time
+import urllib.request
+from dataclasses import dataclass
+from typing import Iterable, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+PLAYLIST_PREFIX = "plst-"
+TEMP_PREFIX = "."
+
+
+def split_media_filename(filename: str, safe_extensions: Iterable[str]) -> tuple:
+    """Return (stem, ext) for an indexable media file name, or (None, None)."""
+    if not filename or filename.startswith(TEMP_PREFIX):
+        return None, None
+    stem, ext = os.path.splitext(filename)
+    if not stem or ext.lower() not in safe_extensions:
+        return None, None
+    return stem, ext.lower()
+
+
+def is_playlist_stem(stem: str) -> bool:
+    return str(stem or "").startswith(PLAYLIST_PREFIX)
+
+
+@dataclass
+class CacheEntry:
+    stem: str
+    path: str
+    size: int
+    last_access: float
+    hits: int
+    gdsf_value: float = 0.0
+
+    @property
+    def is_playlist(self) -> bool:
+        return is_playlist_stem(self.stem)
+
+
+class CacheIndex:
+    """
+    Thread-safe stem -> filenames index for a single flat cache directory.
+
+    Mutations come from the event loop (downloads finishing, deletions) while
+    reconcile() usually runs in an executor thread, so all access goes through
+    a lock. Stems touched while a reconcile scan is running keep their live
+    state instead of being overwritten by the (older) scan result.
+    """
+
+    def __init__(self, cache_dir: str, safe_extensions: Iterable[str]):
+        self.cache_dir = cache_dir
+        self.safe_extensions = frozenset(ext.lower() for ext in safe_extensions)
+        self._entries: dict = {}
+        self._sizes: dict = {}
+        self._access: dict = {}
+        self._favorite_stems: set = set()
+        self.total_bytes = 0
+        self.playlist_bytes = 0
+        self.favorites_bytes = 0
+        # GDSF inflation clock; raised to the value of each file GDSF evicts.
+        self.clock = 0.0
+        self._lock = threading.Lock()
+        self._scan_touched: Optional[set] = None
+        self.built_at: float = 0.0
+        self.reconcile_count = 0
+        self.last_drift = 0
+
+    # ------------------------------------------------------------------
+    # Building / reconciling
+    # ------------------------------------------------------------------
+
+    def _scan(self) -> tuple:
+        entries = {}
+        sizes = {}
+        mtimes = {}
+        try:
+            scanner = os.scandir(self.cache_dir)
+        except FileNotFoundError:
+            return entries, sizes, mtimes
+        with scanner:
+            for entry in scanner:
+                stem, _ = split_media_filename(entry.name, self.safe_extensions)
+                if stem is None:
+                    continue
+                try:
+                    if not entry.is_file(follow_symlinks=False):
+                        continue
+                    stat = entry.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+                entries.setdefault(stem, set()).add(entry.name)
+                sizes[entry.name] = stat.st_size
+                mtimes[entry.name] = stat.st_mtime
+        return entries, sizes, mtimes
+
+    def _file_size(self, filename: str) -> int:
+        try:
+            return os.path.getsize(os.path.join(self.cache_dir, filename))
+        except OSError:
+            return 0
+
+    def _access_record(self, last_access: float, hits: int, size: int) -> list:
+        """[last_access, hits, gdsf_value] for a file. Caller holds the lock."""
+        size_mib = max(size, 1) / (1024 * 1024)
+        return [last_access, hits, self.clock + max(hits, 1) / size_mib]
+
+    def _account(self, stem: str, delta: int):
+        """Apply a byte delta for *stem* to the running counters. Caller holds the lock."""
+        self.total_bytes += delta
+        if is_playlist_stem(stem):
+            self.playlist_bytes += delta
+            if stem in self._favorite_stems:
+                self.favorites_bytes += delta
+
+    def _recount(self):
+        """Recompute every counter from the per-file sizes. Caller holds the lock."""
+        self.total_bytes = 0
+        self.playlist_bytes = 0
+        self.favorites_bytes = 0
+        for stem, names in self._entries.items():
+            self._account(stem, sum(self._sizes.get(name, 0) for name in names))
+
+    def rebuild(self) -> int:
+        """Replace the index with a fresh directory scan. Returns the file count."""
+        entries, sizes, mtimes = self._scan()
+        with self._lock:
+            self._entries = entries
+            self._sizes = sizes
+            self._access = {name: self._access_record(mtime, 0, sizes.get(name, 0)) for name, mtime in mtimes.items()}
+            self._recount()
+            self.built_at = time.time()
+        count = sum(len(names) for names in entries.values())
+        logger.info(f"Cache index built: {count} media file(s) in {self.cache_dir}")
+        return count
+
+    def reconcile(self) -> int:
+        """
+        Re-scan the directory and merge it into the live index.
+
+        Returns the number of stems whose entries or sizes differed from the
+        scan; the byte counters are recomputed either way. Safe to call from a
+        worker thread.
+        """
+        with self._lock:
+            self._scan_touched = set()
+        try:
+            scanned, scanned_sizes, scanned_mtimes = self._scan()
+        except OSError as exc:
+            with self._lock:
+                self._scan_touched = None
+            logger.warning(f"Cache index reconcile failed: {exc}")
+            return 0
+        with self._lock:
+            touched = self._scan_touched or set()
+            self._scan_touched = None
+            drift = 0
+            merged = {}
+            merged_sizes = {}
+            merged_access = {}
+            for stem in set(self._entries) | set(scanned):
+                if stem in touched:
+                    live = self._entries.get(stem)
+                    if live:
+                        merged[stem] = live
+                        for name in live:
+                            merged_sizes[name] = self._sizes.get(name, 0)
+                            merged_access[name] = self._access.get(name) or self._access_record(time.time(), 0, merged_sizes[name])
+                    continue
+                scanned_names = scanned.get(stem)
+                live_names = self._entries.get(stem)
+                if scanned_names != live_names or any(
+                    scanned_sizes.get(name) != self._sizes.get(name) for name in scanned_names or ()
+                ):
+                    drift += 1
+                if scanned_names:
+                    merged[stem] = scanned_names
+                    for name in scanned_names:
+                        merged_sizes[name] = scanned_sizes.get(name, 0)
+                        merged_access[name] = self._access.get(name) or self._access_record(
+                            scanned_mtimes.get(name, 0.0), 0, merged_sizes[name],
+                        )
+            self._entries = merged
+            self._sizes = merged_sizes
+            self._access = merged_access
+            self._recount()
+            self.built_at = time.time()
+            self.reconcile_count += 1
+            self.last_drift = drift
+        if drift:
+            logger.info(f"Cache index reconciled with disk: {drift} stem(s) changed outside the bot.")
+        return drift
+
+    # ------------------------------------------------------------------
+    # Mutations
+    # ------------------------------------------------------------------
+
+    def add(self, file_path: str, size: Optional[int] = None) -> bool:
+        """Index a media file; *size* defaults to a stat of the file."""
+        filename = os.path.basename(str(file_path or ""))
+        stem, _ = split_media_filename(filename, self.safe_extensions)
+        if stem is None:
+            return False
+        if size is None:
+            size = self._file_size(filename)
+        size = max(0, int(size))
+        with self._lock:
+            self._entries.setdefault(stem, set()).add(filename)
+            self._account(stem, size - self._sizes.get(filename, 0))
+            self._sizes[filename] = size
+            access = self._access.get(filename) or [0.0, 0, 0.0]
+            self._access[filename] = self._access_record(time.time(), access[1] + 1, size)
+            if self._scan_touched is not None:
+                self._scan_touched.add(stem)
+        return True
+
+    def discard(self, file_path: str) -> bool:
+        filename = os.path.basename(str(file_path or ""))
+        stem, _ = split_media_filename(filename, self.safe_extensions)
+        if stem is None:
+            return False
+        with self._lock:
+            names = self._entries.get(stem)
+            if not names or filename not in names:
+                return False
+            names.discard(filename)
+            self._account(stem, -self._sizes.pop(filename, 0))
+            self._access.pop(filename, None)
+            if not names:
+                self._entries.pop(stem, None)
+            if self._scan_touched is not None:
+                self._scan_touched.add(stem)
+        return True
+
+    def clear(self):
+        with self._lock:
+            self._entries = {}
+            self._sizes = {}
+            self._access = {}
+            self._recount()
+
+    def touch(self, file_path: str) -> bool:
+        """Record a cache hit (playback) for an indexed file."""
+        filename = os.path.basename(str(file_path or ""))
+        with self._lock:
+            access = self._access.get(filename)
+            if access is None:
+                return False
+            self._access[filename] = self._access_record(time.time(), access[1] + 1, self._sizes.get(filename, 0))
+        return True
+
+    def raise_clock(self, value: float):
+        """Advance the GDSF clock; files added or touched later rank above *value*."""
+        with self._lock:
+            self.clock = max(self.clock, value)
+
+    def update_favorite_stems(self, added: Iterable[str] = (), removed: Iterable[str] = ()):
+        """Start counting *added* playlist stems as favorites and stop counting *removed* ones."""
+        with self._lock:
+            for stem in removed:
+                if stem in self._favorite_stems:
+                    self._favorite_stems.discard(stem)
+                    self.favorites_bytes -= sum(self._sizes.get(name, 0) for name in self._entries.get(stem, ()))
+            for stem in added:
+                if is_playlist_stem(stem) and stem not in self._favorite_stems:
+                    self._favorite_stems.add(stem)
+                    self.favorites_bytes += sum(self._sizes.get(name, 0) for name in self._entries.get(stem, ()))
+
+    def set_favorite_stems(self, stems: Iterable[str]):
+        """Replace the set of playlist stems counted as favorites and recount."""
+        favorite_stems = {stem for stem in stems if is_playlist_stem(stem)}
+        with self._lock:
+            if favorite_stems == self._favorite_stems:
+                return
+            self._favorite_stems = favorite_stems
+            self.favorites_bytes = 0
+            for stem in favorite_stems:
+                self.favorites_bytes += sum(self._sizes.get(name, 0) for name in self._entries.get(stem, ()))
+
+    # ------------------------------------------------------------------
+    # Accounting
+    # ------------------------------------------------------------------
+
+    @property
+    def shortterm_bytes(self) -> int:
+        return self.total_bytes - self.playlist_bytes
+
+    def size_of(self, file_path: str) -> int:
+        with self._lock:
+            return self._sizes.get(os.path.basename(str(file_path or "")), 0)
+
+    def byte_counters(self) -> dict:
+        with self._lock:
+            return {
+                "total": self.total_bytes,
+                "playlist": self.playlist_bytes,
+                "shortterm": self.total_bytes - self.playlist_bytes,
+                "favorites": self.favorites_bytes,
+            }
+
+    # ------------------------------------------------------------------
+    # Lookups
+    # ------------------------------------------------------------------
+
+    def paths_for_stem(self, stem: str) -> list:
+        """Absolute paths indexed for *stem*, sorted for deterministic picks."""
+        with self._lock:
+            names = sorted(self._entries.get(str(stem or ""), ()))
+        return [os.path.join(self.cache_dir, name) for name in names]
+
+    def paths_for_key(self, key: str, *, prefer_playlist: bool = True) -> list:
+        """Candidate paths for a cache key or legacy video id, in preference order."""
+        if not key:
+            return []
+        stems = (
+            [f"{PLAYLIST_PREFIX}{key}", key]
+            if prefer_playlist
+            else [key, f"{PLAYLIST_PREFIX}{key}"]
+        )
+        paths = []
+        for stem in stems:
+            paths.extend(self.paths_for_stem(stem))
+        return paths
+
+    def entries(self) -> list:
+        """Snapshot of every indexed file with its size and access statistics."""
+        with self._lock:
+            snapshot = []
+            for stem, names in self._entries.items():
+                for name in names:
+                    last_access, hits, gdsf_value = self._access.get(name) or (0.0, 0, 0.0)
+                    snapshot.append(CacheEntry(
+                        stem=stem,
+                        path=os.path.join(self.cache_dir, name),
+                        size=self._sizes.get(name, 0),
+                        last_access=last_access,
+                        hits=hits,
+                        gdsf_value=gdsf_value,
+                    ))
+        return snapshot
+
+    def all_paths(self) -> list:
+        with self._lock:
+            names = [name for names in self._entries.values() for name in names]
+        return [os.path.join(self.cache_dir, name) for name in sorted(names)]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(len(names) for names in self._entries.values())
+
+    def __contains__(self, stem: str) -> bool:
+        with self._lock:
+            return bool(self._entries.get(stem))
+
+
+# ----------------------------------------------------------------------
+# Downloading
+# ----------------------------------------------------------------------
+
+def download_resolved(downloader, url: str, info: Optional[dict] = None) -> Optional[dict]:
+    """
+    Download *url* with a yt-dlp *downloader*, reusing an extracted *info* dict.
+
+    When the caller already ran extract_info(download=False) for its duration
+    and size checks, the chosen format and its signed URLs are in *info*;
+    feeding that back through process_ie_result() downloads it without a
+    second extraction (the same path as yt-dlp's --load-info-json). If the
+    reused info fails, e.g. because its URLs expired, fall back to a normal
+    extract_info(download=True). Blocking; run it in an executor.
+    """
+    if info is not None:
+        try:
+            return downloader.process_ie_result(downloader.sanitize_info(info, remove_private_keys=True), download=True)
+        except Exception as exc:
+            logger.warning(f"Downloading from extracted info failed ({exc}); extracting {url} again.")
+    return downloader.extract_info(url, download=True)
+
+
+class DownloadCancelled(Exception):
+    pass
+
+
+class DownloadTooLarge(Exception):
+    pass
+
+
+CONTENT_RANGE_TOTAL = re.compile(r"/(\d+)\s*$")
+
+
+def fetch_to_file(url: str, headers: dict, path: str, *, cancelled: Optional[threading.Event] = None,
+                  max_bytes: Optional[int] = None, chunk_size: int = 10 * 1024 * 1024, timeout: float = 30.0) -> int:
+    """
+    Download *url* into *path* with sequential Range requests of *chunk_size*
+    bytes (googlevideo throttles single full-length requests, which is also
+    why yt-dlp chunks them). Every block is flushed so a GrowingFileReader
+    sees it immediately. Returns the number of bytes written; raises
+    DownloadCancelled if *cancelled* is set and DownloadTooLarge once the
+    Content-Range total or the bytes written pass *max_bytes*. Blocking; run
+    it in an executor.
+    """
+    written = 0
+    total = None
+    with open(path, "wb") as out:
+        while total is None or written < total:
+            request = urllib.request.Request(url, headers={**(headers or {}), "Range": f"bytes={written}-{written + chunk_size - 1}"})
+            chunk_written = 0
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                if response.status == 206:
+                    match = CONTENT_RANGE_TOTAL.search(response.headers.get("Content-Range") or "")
+                    total = int(match.group(1)) if match else total
+                if max_bytes is not None and total is not None and total > max_bytes:
+                    raise DownloadTooLarge(f"{total} bytes is over the {max_bytes} byte limit")
+                while True:
+                    if cancelled is not None and cancelled.is_set():
+                        raise DownloadCancelled(f"cancelled after {written} bytes")
+                    block = response.read(64 * 1024)
+                    if not block:
+                        break
+                    out.write(block)
+                    out.flush()
+                    written += len(block)
+                    chunk_written += len(block)
+                    if max_bytes is not None and written > max_bytes:
+                        raise DownloadTooLarge(f"passed the {max_bytes} byte limit")
+                if response.status != 206:
+                    # The server ignored Range and sent the whole body.
+                    return written
+            if total is None and chunk_written < chunk_size:
+                return written
+            if chunk_written == 0:
+                raise OSError(f"empty range response at byte {written} of {total}")
+    return written
+
+
+class ProgressiveDownload:
+    """
+    Shared state of a cache download that can be read while it is written.
+
+    The downloader calls begin() once it knows where the temp file goes and
+    finish() when it is done (with the exception if it failed). The temp file
+    is renamed to final_path on success; readers that already opened it keep
+    reading the same file.
+    """
+
+    def __init__(self):
+        self.temp_path: Optional[str] = None
+        self.final_path: Optional[str] = None
+        self.error: Optional[BaseException] = None
+        self.started = threading.Event()
+        self.finished = threading.Event()
+        self.cancelled = threading.Event()
+
+    def begin(self, temp_path: str, final_path: str):
+        self.temp_path = temp_path
+        self.final_path = final_path
+        self.started.set()
+
+    def finish(self, error: Optional[BaseException] = None):
+        self.error = error
+        self.finished.set()
+
+    def cancel(self):
+        """Ask the writer to stop; readers end at whatever has been written."""
+        self.cancelled.set()
+
+    def bytes_written(self) -> int:
+        for path in (self.temp_path, self.final_path):
+            if path:
+                try:
+                    return os.path.getsize(path)
+                except OSError:
+                    continue
+        return 0
+
+    def open_reader(self, *, stall_timeout: float = 30.0) -> "GrowingFileReader":
+        return GrowingFileReader(self, stall_timeout=stall_timeout)
+
+
+class GrowingFileReader(io.RawIOBase):
+    """
+    Blocking file-like reader over a ProgressiveDownload.
+
+    read() returns data as soon as any is on disk, waits while the download
+    is still running, and returns b"" only once the download has finished and
+    everything written has been read, or when no new bytes arrive for
+    stall_timeout seconds.
+    """
+
+    POLL_INTERVAL = 0.05
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, download: ProgressiveDownload, *, stall_timeout: float = 30.0):
+        super().__init__()
+        self.download = download
+        self.stall_timeout = stall_timeout
+        self._file = None
+        self.bytes_read = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def _open(self, path: Optional[str]):
+        if self._file is None and path:
+            try:
+                self._file = open(path, "rb")
+            except OSError:
+                pass
+        return self._file
+
+    def read(self, size: int = -1) -> bytes:
+        size = size if size and size > 0 else self.CHUNK_SIZE
+        deadline = time.monotonic() + self.stall_timeout
+        while not self.closed:
+            finished = self.download.finished.is_set() or self.download.cancelled.is_set()
+            handle = self._open(self.download.temp_path) or (self._open(self.download.final_path) if finished else None)
+            data = handle.read(size) if handle else b""
+            if data:
+                self.bytes_read += len(data)
+                return data
+            if finished:
+                # Checked before the read above, so nothing written before finish() was missed.
+                return b""
+            if time.monotonic() >= deadline:
+                logger.warning(f"Progressive read stalled for {self.stall_timeout:.0f}s at {self.bytes_read} bytes; ending playback.")
+                return b""
+            self.download.finished.wait(self.POLL_INTERVAL)
+        return b""
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        super().close()
+
+
+# ----------------------------------------------------------------------
+# Eviction
+# ----------------------------------------------------------------------
+
+class EvictionPolicy(abc.ABC):
+    """Ranks cache entries for eviction; lower priority is evicted first."""
+
+    name = "base"
+
+    @abc.abstractmethod
+    def priority(self, entry: CacheEntry) -> Union[float, tuple]:
+        """Sort key of *entry*; entries with the lowest key are evicted first."""
+
+    def attach(self, index: CacheIndex):
+        """Called once with the index the policy ranks entries of."""
+
+    def evicted(self, entry: CacheEntry, priority):
+        """Called after *entry* has been removed from the cache."""
+
+
+class LRUPolicy(EvictionPolicy):
+    """Least recently used: oldest last access goes first."""
+
+    name = "lru"
+
+    def priority(self, entry: CacheEntry) -> float:
+        return entry.last_access
+
+
+class LFUPolicy(EvictionPolicy):
+    """Least frequently used, ties broken by recency."""
+
+    name = "lfu"
+
+    def priority(self, entry: CacheEntry) -> tuple:
+        return entry.hits, entry.last_access
+
+
+class GDSFPolicy(EvictionPolicy):
+    """
+    Greedy-Dual-Size-Frequency: priority = clock + hits / size_mib.
+
+    The value is fixed when a file is added or played (CacheIndex stores it),
+    so large, rarely played files go first. Each eviction raises the index's
+    clock to the evicted value, and files played after that are valued from
+    the higher clock; files that stop being played keep their old value and
+    age out even if they were popular once. Hits are only known since
+    startup (plus the first download), which is enough to separate one-off
+    requests from repeats.
+    """
+
+    name = "gdsf"
+
+    def __init__(self):
+        self.index: Optional[CacheIndex] = None
+
+    def attach(self, index: CacheIndex):
+        self.index = index
+
+    def priority(self, entry: CacheEntry) -> float:
+        return entry.gdsf_value
+
+    def evicted(self, entry: CacheEntry, priority: float):
+        if self.index is not None:
+            self.index.raise_clock(priority)
+
+
+EVICTION_POLICIES = {
+    policy.name: policy
+    for policy in (LRUPolicy, LFUPolicy, GDSFPolicy)
+}
+
+
+def make_eviction_policy(name: str) -> EvictionPolicy:
+    policy = EVICTION_POLICIES.get(str(name or "").strip().lower())
+    if policy is None:
+        raise ValueError(f"Unknown cache eviction policy {name!r}; expected one of {', '.join(sorted(EVICTION_POLICIES))}.")
+    return policy()
+
+
+class CacheEvictor:
+    """
+    Chooses which cached files to delete to make room for *bytes_needed*.
+
+    Shortterm files are always considered before playlist files, and playlist
+    files whose stem is pinned are never considered. Within each class the
+    policy decides the order. The evictor only plans; the caller deletes the
+    files (and reports each one back through evicted()). Callers hold lock
+    from plan() until the planned files are gone, so concurrent callers
+    neither pick the same victims nor both count the same free space.
+    """
+
+    def __init__(self, index: CacheIndex, policy: EvictionPolicy):
+        self.index = index
+        self.policy = policy
+        self.policy.attach(index)
+        self.lock = threading.Lock()
+        self.evicted_files = 0
+        self.evicted_bytes = 0
+
+    def plan(self, bytes_needed: int, *, pinned_stems: Iterable[str] = (), protected_paths: Iterable[str] = ()) -> list:
+        """Return (entry, priority) pairs to evict, in order, or [] if it cannot free enough."""
+        if bytes_needed <= 0:
+            return []
+        pinned = set(pinned_stems)
+        protected = {os.path.basename(str(path)) for path in protected_paths if path}
+        shortterm = []
+        playlist = []
+        for entry in self.index.entries():
+            if os.path.basename(entry.path) in protected:
+                continue
+            if entry.is_playlist:
+                if entry.stem in pinned:
+                    continue
+                playlist.append(entry)
+            else:
+                shortterm.append(entry)
+        chosen = []
+        freed = 0
+        for group in (shortterm, playlist):
+            ranked = sorted(((self.policy.priority(entry), entry) for entry in group), key=lambda item: item[0])
+            for priority, entry in ranked:
+                chosen.append((entry, priority))
+                freed += entry.size
+                if freed >= bytes_needed:
+                    return chosen
+        return []
+
+    def evicted(self, entry: CacheEntry, priority):
+        self.evicted_files += 1
+        self.evicted_bytes += entry.size
+        self.policy.evicted(entry, priority)
@@ -76,12 +76,14 @@ def detect_stream_type(url: str) -> str:
     return "http"
 
 
-async def resolve_stream_url(url: str) -> str:
+async def resolve_stream_url(url: str, executor=None) -> str:
     """
     Return the playable URL for a given input.
 
     Non-YouTube URLs are returned as-is.
     YouTube URLs are resolved via yt-dlp (run in a thread to avoid blocking the event loop).
+    Pass an executor to run the extraction in the caller's yt-dlp pool instead of
+    the default one.
 
     Raises RuntimeError if yt-dlp extraction fails, so the caller can surface the error
     to the Discord channel.
@@ -106,7 +108,7 @@ async def resolve_stream_url(url: str) -> str:
 
     try:
         loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(None, _extract)
+        return await loop.run_in_executor(executor, _extract)
     except RuntimeError:
         raise
     except Exception as exc:
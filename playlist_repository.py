@@ -0,0 +1,335 @@
+"""
+In-memory playlist repository shared by the bot and the web UI.
+
+Playlists live on disk as playlists/<folder>/metadata.json. Every lookup used
+to walk that tree and parse every file, from the bot (resolving a name,
+finding a user's favorites, cache accounting) and from the web UI (on every
+HTTP request). PlaylistRepository parses each file once and keeps it in
+memory:
+
+    by id            playlist id (lowercase) -> paths
+    by name          playlist name (lowercase) -> paths
+    by owner         owner user id -> paths
+    by manager       manager user id -> paths
+    favorites        favorites owner user id -> path
+
+Changes made outside the repository (hand edits, restored backups, another
+process) are picked up by re-stat'ing the metadata files at most every
+check_interval seconds and re-parsing only files whose mtime or size changed.
+Writes go through save(), which writes the file atomically and updates the
+in-memory copy straight away.
+
+Readers get copies of the stored playlists (plain dicts and lists, copied
+without deepcopy's overhead), so a caller mutating what it got back cannot
+change what other callers see until it saves. Pass copy=False for read-only
+scans.
+
+Both the bot and the web UI use repository_for(), which returns one shared
+instance per playlists directory. Derived indexes (such as search) register
+with add_listener() and are told about every playlist that is loaded,
+changed or removed, whichever side made the change.
+"""
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+METADATA_FILENAME = "metadata.json"
+
+
+def _clone(value):
+    """Copy JSON-shaped data (dicts, lists, scalars)."""
+    if isinstance(value, dict):
+        return {key: _clone(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_clone(item) for item in value]
+    return value
+
+
+def _user_id(value) -> int:
+    try:
+        return int(value or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def is_favorites(playlist: dict) -> bool:
+    return playlist.get("type") == "favorites" or str(playlist.get("id", "")).startswith("fav-")
+
+
+def apply_defaults(playlist: dict, folder: str) -> dict:
+    playlist.setdefault("tracks", [])
+    playlist.setdefault("manager_user_ids", [])
+    playlist.setdefault("visibility", "private")
+    playlist.setdefault("locked", False)
+    playlist.setdefault("type", "playlist")
+    playlist.setdefault("folder", folder)
+    playlist.setdefault("cache_mode", "follow_global")
+    return playlist
+
+
+@dataclass
+class _Entry:
+    path: str
+    mtime_ns: int
+    size: int
+    playlist: Optional[dict]
+
+
+class PlaylistRepository:
+    """Parsed playlists for one playlists directory, with lookup indexes. Thread-safe."""
+
+    def __init__(self, root: str, *, check_interval: float = 1.0):
+        self.root = root
+        self.check_interval = check_interval
+        self._lock = threading.RLock()
+        self._entries: dict = {}
+        self._by_id: dict = {}
+        self._by_name: dict = {}
+        self._by_owner: dict = {}
+        self._by_manager: dict = {}
+        self._favorites: dict = {}
+        self._checked_at: Optional[float] = None
+        self._listeners: list = []
+        self.scans = 0
+        self.parses = 0
+        self.writes = 0
+
+    # ------------------------------------------------------------------
+    # Change detection
+    # ------------------------------------------------------------------
+
+    def refresh(self, *, force: bool = False):
+        """Re-stat metadata files and re-parse the ones that changed on disk."""
+        now = time.monotonic()
+        with self._lock:
+            if not force and self._checked_at is not None and now - self._checked_at < self.check_interval:
+                return
+            self._checked_at = now
+            self.scans += 1
+            seen = {}
+            if os.path.isdir(self.root):
+                for folder, _, files in os.walk(self.root):
+                    if METADATA_FILENAME not in files:
+                        continue
+                    path = os.path.join(folder, METADATA_FILENAME)
+                    try:
+                        seen[path] = os.stat(path)
+                    except OSError:
+                        continue
+            for path in [path for path in self._entries if path not in seen]:
+                self._drop(path)
+            for path, stat in seen.items():
+                entry = self._entries.get(path)
+                if entry is not None and entry.mtime_ns == stat.st_mtime_ns and entry.size == stat.st_size:
+                    continue
+                self._load(path, stat)
+
+    def _load(self, path: str, stat: os.stat_result):
+        self.parses += 1
+        try:
+            with open(path, "r") as f:
+                playlist = json.load(f)
+            if not isinstance(playlist, dict):
+                raise ValueError("metadata is not a JSON object")
+            apply_defaults(playlist, os.path.basename(os.path.dirname(path)))
+        except Exception as exc:
+            logger.error(f"Failed to load playlist metadata {path}: {exc}")
+            playlist = None
+        self._store(path, playlist, stat)
+
+    # ------------------------------------------------------------------
+    # Indexes
+    # ------------------------------------------------------------------
+
+    def _keys(self, playlist: dict) -> list:
+        keys = [
+            (self._by_id, str(playlist.get("id", "")).lower()),
+            (self._by_name, str(playlist.get("name", "")).lower()),
+            (self._by_owner, _user_id(playlist.get("owner_user_id"))),
+        ]
+        for manager_id in playlist.get("manager_user_ids", []):
+            if str(manager_id).isdigit():
+                keys.append((self._by_manager, int(manager_id)))
+        return keys
+
+    def _store(self, path: str, playlist: Optional[dict], stat: Optional[os.stat_result]):
+        previous = self._drop(path, notify=False)
+        self._entries[path] = _Entry(
+            path=path,
+            mtime_ns=stat.st_mtime_ns if stat else 0,
+            size=stat.st_size if stat else 0,
+            playlist=playlist,
+        )
+        if playlist is None:
+            self._notify(path, previous, None)
+            return
+        for index, key in self._keys(playlist):
+            index.setdefault(key, set()).add(path)
+        if is_favorites(playlist) and not playlist.get("deleted"):
+            self._favorites[_user_id(playlist.get("owner_user_id"))] = path
+        self._notify(path, previous, playlist)
+
+    def _drop(self, path: str, *, notify: bool = True) -> Optional[dict]:
+        entry = self._entries.pop(path, None)
+        if entry is None or entry.playlist is None:
+            return None
+        for index, key in self._keys(entry.playlist):
+            paths = index.get(key)
+            if paths is not None:
+                paths.discard(path)
+                if not paths:
+                    del index[key]
+        owner = _user_id(entry.playlist.get("owner_user_id"))
+        if self._favorites.get(owner) == path:
+            del self._favorites[owner]
+        if notify:
+            self._notify(path, entry.playlist, None)
+        return entry.playlist
+
+    def _notify(self, path: str, previous: Optional[dict], current: Optional[dict]):
+        if previous is None and current is None:
+            return
+        for listener in self._listeners:
+            try:
+                listener(path, previous, current)
+            except Exception as exc:
+                logger.error(f"Playlist repository listener failed for {path}: {exc}")
+
+    def add_listener(self, listener: Callable[[str, Optional[dict], Optional[dict]], None]):
+        """
+        Call listener(path, previous, current) whenever a playlist is loaded,
+        replaced or removed; current is None on removal. The playlists are the
+        stored objects and must not be modified. Already-loaded playlists are
+        replayed to the new listener straight away.
+        """
+        with self._lock:
+            self._listeners.append(listener)
+            for path, entry in self._entries.items():
+                if entry.playlist is not None:
+                    listener(path, None, entry.playlist)
+
+    def _select(self, paths, *, include_deleted: bool, copy: bool) -> list:
+        result = []
+        for path in sorted(paths):
+            entry = self._entries.get(path)
+            if entry is None or entry.playlist is None:
+                continue
+            if entry.playlist.get("deleted") and not include_deleted:
+                continue
+            result.append(_clone(entry.playlist) if copy else entry.playlist)
+        return result
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    def playlists(self, *, include_deleted: bool = False, copy: bool = True) -> list:
+        with self._lock:
+            self.refresh()
+            return self._select(self._entries, include_deleted=include_deleted, copy=copy)
+
+    def get(self, playlist_id: str, *, include_deleted: bool = False, copy: bool = True) -> Optional[dict]:
+        found = self.get_with_path(playlist_id, include_deleted=include_deleted, copy=copy)
+        return found[1] if found else None
+
+    def get_with_path(self, playlist_id: str, *, include_deleted: bool = False, copy: bool = True) -> Optional[tuple]:
+        """(path, playlist) for an exact (case-sensitive) id, or None."""
+        with self._lock:
+            self.refresh()
+            for path in sorted(self._by_id.get(str(playlist_id or "").lower(), ())):
+                playlist = self._entries[path].playlist
+                if playlist.get("id") != playlist_id:
+                    continue
+                if playlist.get("deleted") and not include_deleted:
+                    continue
+                return path, (_clone(playlist) if copy else playlist)
+            return None
+
+    def find(self, key: str, *, include_deleted: bool = False, copy: bool = True) -> list:
+        """Playlists whose lowercase id or lowercase name equals *key*."""
+        key = str(key or "").lower()
+        with self._lock:
+            self.refresh()
+            paths = self._by_id.get(key, set()) | self._by_name.get(key, set())
+            return self._select(paths, include_deleted=include_deleted, copy=copy)
+
+    def owned_by(self, user_id: int, *, include_deleted: bool = False, copy: bool = True) -> list:
+        with self._lock:
+            self.refresh()
+            return self._select(self._by_owner.get(_user_id(user_id), ()), include_deleted=include_deleted, copy=copy)
+
+    def managed_by(self, user_id: int, *, include_deleted: bool = False, copy: bool = True) -> list:
+        with self._lock:
+            self.refresh()
+            return self._select(self._by_manager.get(_user_id(user_id), ()), include_deleted=include_deleted, copy=copy)
+
+    def favorites_for(self, user_id: int, *, copy: bool = True) -> Optional[tuple]:
+        """(path, playlist) for a user's favorites playlist, or None."""
+        with self._lock:
+            self.refresh()
+            path = self._favorites.get(_user_id(user_id))
+            if path is None:
+                return None
+            playlist = self._entries[path].playlist
+            return path, (_clone(playlist) if copy else playlist)
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+
+    def save(self, playlist: dict, path: str):
+        """Atomically write *playlist* to *path* and update the in-memory copy."""
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", suffix=".json", dir=directory)
+            try:
+                with os.fdopen(fd, "w") as f:
+                    json.dump(playlist, f, indent=2)
+                    f.write("\n")
+                os.replace(tmp_path, path)
+            except Exception:
+                try:
+                    os.unlink(tmp_path)
+                except OSError:
+                    pass
+                raise
+            self.writes += 1
+            stored = apply_defaults(_clone(playlist), os.path.basename(directory))
+            self._store(path, stored, os.stat(path))
+
+    def discard(self, path: str):
+        """Forget a metadata file that was removed from disk."""
+        with self._lock:
+            self._drop(path)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {
+                "playlists": sum(1 for entry in self._entries.values() if entry.playlist is not None),
+                "unreadable": sum(1 for entry in self._entries.values() if entry.playlist is None),
+                "scans": self.scans,
+                "parses": self.parses,
+                "writes": self.writes,
+            }
+
+
+_repositories: dict = {}
+_repositories_lock = threading.Lock()
+
+
+def repository_for(root: str) -> PlaylistRepository:
+    """The shared repository for the playlists directory *root*."""
+    key = os.path.realpath(root)
+    with _repositories_lock:
+        repository = _repositories.get(key)
+        if repository is None:
+            repository = _repositories[key] = PlaylistRepository(root)
+        return repository
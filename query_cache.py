@@ -0,0 +1,222 @@
+"""
+Persistent cache of plain-text search queries resolved by yt-dlp.
+
+A /play with search text goes through yt-dlp's ytsearch1, which costs a
+search page fetch before the video itself is even looked at, and a failed
+first result costs a ytsearch5 and more on top. Users repeat the same
+searches constantly, so SearchQueryCache remembers which video a query
+resolved to:
+
+    query        normalized query text (primary key)
+    video_id     the video the search resolved to, or NULL for a miss
+    title        title of that video, for logs and /status
+    resolved_at  unix time of the search
+    expires_at   unix time after which the entry is ignored
+    hits         how many lookups the entry has answered
+
+Queries are normalized before lookup (Unicode-normalized, casefolded,
+punctuation turned into spaces and whitespace collapsed), so "Daft Punk -
+Around the World" and "daft punk around the world" share an entry.
+
+Searches that found nothing playable are cached too, for a much shorter
+negative_ttl, so a bad query repeated in a burst fails fast instead of
+re-running the search each time. Entries past their expiry are deleted in
+batches, and the table is trimmed to max_entries (oldest first).
+
+The database runs in WAL mode and every change is a single-row
+transaction, like the downloads catalog.
+"""
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+SCHEMA_VERSION = 1
+COLUMNS = ("query", "video_id", "title", "resolved_at", "expires_at", "hits")
+NON_WORD_RE = re.compile(r"[\W_]+")
+PRUNE_EVERY_WRITES = 200
+
+
+def normalize_query(text) -> str:
+    """Fold case, punctuation and whitespace so equivalent searches share a key."""
+    folded = unicodedata.normalize("NFKC", str(text or "")).casefold()
+    return NON_WORD_RE.sub(" ", folded).strip()
+
+
+@dataclass
+class QueryResult:
+    query: str
+    video_id: Optional[str]
+    title: str
+    resolved_at: float
+    expires_at: float
+    hits: int = 0
+
+    @property
+    def failed(self) -> bool:
+        """True for a cached miss: the search found nothing playable."""
+        return not self.video_id
+
+
+class SearchQueryCache:
+    """Normalized query -> video id store with TTLs and negative entries. Thread-safe."""
+
+    def __init__(self, path: str, *, ttl: float = 7 * 24 * 60 * 60, negative_ttl: float = 10 * 60,
+                 max_entries: int = 20000):
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._migrate_schema()
+        self._writes = 0
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.stored = 0
+        self.failures_stored = 0
+        self.invalidated = 0
+        self.prune()
+
+    def _migrate_schema(self):
+        version = self._db.execute("PRAGMA user_version").fetchone()[0]
+        if version < 1:
+            with self._db:
+                self._db.execute("""
+                    CREATE TABLE IF NOT EXISTS queries (
+                        query TEXT PRIMARY KEY,
+                        video_id TEXT,
+                        title TEXT NOT NULL DEFAULT '',
+                        resolved_at REAL NOT NULL,
+                        expires_at REAL NOT NULL,
+                        hits INTEGER NOT NULL DEFAULT 0
+                    )
+                """)
+                self._db.execute("CREATE INDEX IF NOT EXISTS queries_expires_at ON queries(expires_at)")
+                self._db.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+
+    def _write(self, sql: str, params: Iterable = ()) -> int:
+        with self._lock, self._db:
+            return self._db.execute(sql, tuple(params)).rowcount
+
+    # ------------------------------------------------------------------
+    # Lookups
+    # ------------------------------------------------------------------
+
+    def get(self, query: str) -> Optional[QueryResult]:
+        """The live entry for *query* (positive or negative), or None. Counts the lookup."""
+        key = normalize_query(query)
+        if not key:
+            return None
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM queries WHERE query = ? AND expires_at > ?",
+                (key, now),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            with self._db:
+                self._db.execute("UPDATE queries SET hits = hits + 1 WHERE query = ?", (key,))
+            result = QueryResult(*row)
+            result.hits += 1
+            if result.failed:
+                self.negative_hits += 1
+            else:
+                self.hits += 1
+            return result
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+
+    def _store(self, key: str, video_id: Optional[str], title: str, ttl: float):
+        now = time.time()
+        self._write(
+            """
+            INSERT INTO queries (query, video_id, title, resolved_at, expires_at, hits)
+            VALUES (?, ?, ?, ?, ?, 0)
+            ON CONFLICT(query) DO UPDATE SET
+                video_id = excluded.video_id, title = excluded.title,
+                resolved_at = excluded.resolved_at, expires_at = excluded.expires_at
+            """,
+            (key, video_id, title or "", now, now + ttl),
+        )
+        self._writes += 1
+        if self._writes % PRUNE_EVERY_WRITES == 0:
+            self.prune()
+
+    def put(self, query: str, video_id: str, *, title: str = "") -> bool:
+        """Remember that *query* resolved to *video_id*."""
+        key = normalize_query(query)
+        if not key or not video_id:
+            return False
+        self._store(key, str(video_id), title, self.ttl)
+        self.stored += 1
+        return True
+
+    def put_failure(self, query: str) -> bool:
+        """Remember that *query* found nothing playable, for negative_ttl seconds."""
+        key = normalize_query(query)
+        if not key or self.negative_ttl <= 0:
+            return False
+        self._store(key, None, "", self.negative_ttl)
+        self.failures_stored += 1
+        return True
+
+    def invalidate(self, query: str) -> bool:
+        key = normalize_query(query)
+        if not key:
+            return False
+        removed = self._write("DELETE FROM queries WHERE query = ?", (key,)) > 0
+        if removed:
+            self.invalidated += 1
+        return removed
+
+    def invalidate_video(self, video_id: str) -> int:
+        """Forget every query that resolved to *video_id*, e.g. after it became unavailable."""
+        if not video_id:
+            return 0
+        removed = self._write("DELETE FROM queries WHERE video_id = ?", (str(video_id),))
+        self.invalidated += removed
+        return removed
+
+    def prune(self) -> int:
+        """Delete expired entries and trim the table to max_entries. Returns rows deleted."""
+        with self._lock, self._db:
+            removed = self._db.execute("DELETE FROM queries WHERE expires_at <= ?", (time.time(),)).rowcount
+            if self.max_entries:
+                removed += self._db.execute(
+                    "DELETE FROM queries WHERE query IN ("
+                    "SELECT query FROM queries ORDER BY resolved_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                ).rowcount
+            return removed
+
+    def __len__(self) -> int:
+        with self._lock:
+            return int(self._db.execute("SELECT COUNT(*) FROM queries").fetchone()[0])
+
+    def metrics(self) -> dict:
+        lookups = self.hits + self.negative_hits + self.misses
+        return {
+            "entries": len(self),
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.negative_hits) / lookups if lookups else 0.0,
+            "stored": self.stored,
+            "failures_stored": self.failures_stored,
+            "invalidated": self.invalidated,
+        }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
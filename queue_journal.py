@@ -0,0 +1,372 @@
+"""
+Crash-safe journal of every guild's queue and current track.
+
+The only queue that survived a restart was the one auto-leave saved to
+last_session_queue.tmp.json; a crash, an OOM kill or /reboot lost it.
+QueueJournal records each change as it happens instead, one JSON object per
+line:
+
+    enqueue       position, tracks       tracks inserted at a position
+    dequeue       position               one track removed
+    move          from, to               a track moved inside the queue
+    set           position, track        a queued track replaced
+    remove_where  field, value           every track whose field matches removed
+    replace       tracks                 the whole queue rewritten (sort, slices)
+    clear                                the queue emptied
+    started       track, started_at,     a track started playing, offset
+                  offset                 seconds into it (non-zero for a resume)
+    stopped                              playback ended, nothing current
+    position      seconds                playback position of the current track,
+                                         written every few seconds and on pause
+
+append() only numbers the entry and puts it in an in-memory backlog; like
+event_log.EventSink, one background task serializes and writes whatever has
+built up, so a queue change never waits on disk. Before start() and after
+close() entries are written inline. Written entries are flushed to the OS
+and fsync'd at most every fsync_interval seconds, so a killed process loses
+only the backlog it had not written yet (milliseconds) and a power cut at
+most that window more.
+
+The writer also applies every entry it writes to its own copy of each
+guild's state. Every snapshot_every entries that copy goes into
+queue-journal.snapshot.json (written to a temporary file and renamed over
+the old one) and the journal file is truncated, so a snapshot always holds
+exactly the entries up to the sequence number it records. A crash between
+the rename and the truncate replays nothing twice. Rebuilding state on boot
+is one snapshot read plus the journal tail, at most snapshot_every entries;
+a torn last line from a crash mid-write is ignored.
+"""
+import asyncio
+import collections
+import copy
+import json
+import logging
+import os
+import threading
+import time
+from collections.abc import Mapping
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 1
+
+
+def _json_default(value):
+    if isinstance(value, Mapping):
+        return dict(value)
+    return str(value)
+
+
+def empty_state() -> dict:
+    return {"queue": [], "current": None, "started_at": None, "position": None, "position_at": None, "updated_at": None}
+
+
+def apply_entry(state: dict, entry: dict):
+    """Apply one journal entry to a guild state dict (see empty_state)."""
+    op = entry.get("op")
+    tracks = state["queue"]
+    position = entry.get("position")
+    if op == "enqueue":
+        position = min(max(int(position or 0), 0), len(tracks))
+        tracks[position:position] = list(entry.get("tracks") or [])
+    elif op == "dequeue":
+        if isinstance(position, int) and 0 <= position < len(tracks):
+            del tracks[position]
+    elif op == "move":
+        source, target = entry.get("from"), entry.get("to")
+        if isinstance(source, int) and 0 <= source < len(tracks) and isinstance(target, int):
+            track = tracks.pop(source)
+            tracks.insert(min(max(target, 0), len(tracks)), track)
+    elif op == "set":
+        if isinstance(position, int) and 0 <= position < len(tracks):
+            tracks[position] = entry.get("track")
+    elif op == "remove_where":
+        field, value = entry.get("field"), str(entry.get("value") or "")
+        state["queue"] = [track for track in tracks if str((track or {}).get(field) or "") != value]
+    elif op == "replace":
+        state["queue"] = list(entry.get("tracks") or [])
+    elif op == "clear":
+        state["queue"] = []
+    elif op == "started":
+        state["current"] = entry.get("track")
+        state["started_at"] = entry.get("started_at")
+        state["position"] = entry.get("offset")
+        state["position_at"] = entry.get("started_at")
+    elif op == "stopped":
+        state["current"] = None
+        state["started_at"] = None
+        state["position"] = None
+        state["position_at"] = None
+    elif op == "position":
+        state["position"] = entry.get("seconds")
+        state["position_at"] = entry.get("timestamp")
+    state["updated_at"] = entry.get("timestamp", state["updated_at"])
+
+
+def _detach_track(track):
+    return dict(track) if isinstance(track, Mapping) else track
+
+
+class QueueJournal:
+    """Append-only queue journal with a background writer and snapshot compaction."""
+
+    def __init__(self, path: str, snapshot_path: Optional[str] = None, *, snapshot_every: int = 500,
+                 fsync_interval: float = 1.0, max_batch: int = 500):
+        self.path = path
+        self.snapshot_path = snapshot_path or f"{os.path.splitext(path)[0]}.snapshot.json"
+        self.snapshot_every = snapshot_every
+        self.fsync_interval = fsync_interval
+        self.max_batch = max_batch
+        # _lock numbers and queues entries; _write_lock covers the files and the written state.
+        self._lock = threading.Lock()
+        self._write_lock = threading.RLock()
+        self._backlog: collections.deque = collections.deque()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._file = None
+        self._seq = 0
+        self._written_seq = 0
+        self._states: dict = {}
+        self._since_snapshot = 0
+        self._last_fsync = 0.0
+        self._dirty = False
+        self.closed = False
+        self.appended = 0
+        self.written = 0
+        self.snapshots = 0
+        self.replayed = 0
+        self.replay_seconds = 0.0
+
+    # ------------------------------------------------------------------
+    # Files
+    # ------------------------------------------------------------------
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._last_fsync = time.monotonic()
+
+    def _close_file(self):
+        if self._file is None:
+            return
+        try:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        finally:
+            self._file.close()
+            self._file = None
+            self._dirty = False
+
+    def _read_snapshot(self) -> tuple:
+        try:
+            with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                snapshot = json.load(f)
+        except FileNotFoundError:
+            return 0, {}
+        except (OSError, ValueError) as exc:
+            logger.error(f"Ignoring unreadable queue journal snapshot {self.snapshot_path}: {exc}")
+            return 0, {}
+        guilds = snapshot.get("guilds") if isinstance(snapshot, dict) else None
+        if not isinstance(guilds, dict):
+            return 0, {}
+        states = {}
+        for guild_id, saved in guilds.items():
+            state = empty_state()
+            if isinstance(saved, dict):
+                state.update({key: saved.get(key) for key in state})
+                state["queue"] = list(saved.get("queue") or [])
+            states[int(guild_id)] = state
+        return int(snapshot.get("seq") or 0), states
+
+    def _write_snapshot(self, states: dict):
+        payload = {
+            "version": SNAPSHOT_VERSION,
+            "seq": self._written_seq,
+            "timestamp": time.time(),
+            "guilds": {str(guild_id): state for guild_id, state in states.items()},
+        }
+        tmp_path = f"{self.snapshot_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False, default=_json_default)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+        # Everything up to self._written_seq is in the snapshot now.
+        self._close_file()
+        with open(self.path, "w", encoding="utf-8"):
+            pass
+        self._since_snapshot = 0
+        self.snapshots += 1
+
+    # ------------------------------------------------------------------
+    # Recovery
+    # ------------------------------------------------------------------
+
+    def load(self) -> dict:
+        """
+        Rebuild {guild_id: state} from the snapshot and the journal tail.
+        Also positions the sequence counter after the newest entry.
+        """
+        started = time.perf_counter()
+        with self._lock, self._write_lock:
+            snapshot_seq, states = self._read_snapshot()
+            self._seq = snapshot_seq
+            replayed = 0
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        try:
+                            entry = json.loads(line)
+                        except ValueError:
+                            logger.warning(f"Queue journal {self.path} ends with a torn entry; ignoring it.")
+                            break
+                        seq = int(entry.get("seq") or 0)
+                        if seq <= snapshot_seq:
+                            continue
+                        guild_id = int(entry.get("guild_id") or 0)
+                        apply_entry(states.setdefault(guild_id, empty_state()), entry)
+                        self._seq = max(self._seq, seq)
+                        replayed += 1
+            except FileNotFoundError:
+                pass
+            self._written_seq = self._seq
+            self._states = copy.deepcopy(states)
+            self._since_snapshot = replayed
+        self.replayed = replayed
+        self.replay_seconds = time.perf_counter() - started
+        return states
+
+    def reset(self, states: Optional[dict] = None):
+        """Start over from *states* (nothing by default): one snapshot, empty journal."""
+        with self._lock, self._write_lock:
+            self._backlog.clear()
+            self._written_seq = self._seq
+            self._states = copy.deepcopy(states or {})
+            self._write_snapshot(self._states)
+            self.closed = False
+
+    # ------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """Start the writer task on the running event loop."""
+        if self.running:
+            return
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        if self._backlog:
+            self._wakeup.set()
+
+    def append(self, guild_id: int, op: str, **fields):
+        """Number and queue one entry. *fields* must not be changed afterwards."""
+        with self._lock:
+            if self.closed:
+                return
+            self._seq += 1
+            self._backlog.append({"seq": self._seq, "timestamp": time.time(), "guild_id": int(guild_id), "op": op, **fields})
+            self.appended += 1
+        if self.running:
+            self._wakeup.set()
+        else:
+            self.drain_sync()
+
+    def queue_changed(self, guild_id: int, op: str, *args):
+        """TrackQueue listener: map a queue change onto a journal entry."""
+        # Shallow copies only; serializing happens on the writer.
+        if op in ("enqueue", "dequeue", "set"):
+            position, *rest = args
+            fields = {"position": position}
+            if op == "enqueue":
+                fields["tracks"] = [_detach_track(track) for track in rest[0]]
+            elif op == "set":
+                fields["track"] = _detach_track(rest[0])
+            self.append(guild_id, op, **fields)
+        elif op == "move":
+            self.append(guild_id, op, **{"from": args[0], "to": args[1]})
+        elif op == "remove_where":
+            self.append(guild_id, op, field=args[0], value=args[1])
+        elif op == "replace":
+            self.append(guild_id, op, tracks=[_detach_track(track) for track in args[0]])
+        else:
+            self.append(guild_id, op)
+
+    def _write_next(self, limit: Optional[int]):
+        """Take up to *limit* backlog entries and write them, in order."""
+        with self._write_lock:
+            batch = []
+            while self._backlog and (limit is None or len(batch) < limit):
+                batch.append(self._backlog.popleft())
+            if not batch:
+                return
+            try:
+                payload = "".join(json.dumps(entry, ensure_ascii=False, default=_json_default) + "\n" for entry in batch)
+                if self._file is None:
+                    self._open()
+                self._file.write(payload)
+                self._file.flush()
+            except Exception as exc:
+                logger.error(f"Failed to write {len(batch)} queue journal entr(ies): {exc}")
+                return
+            for entry in batch:
+                apply_entry(self._states.setdefault(entry["guild_id"], empty_state()), entry)
+            self._written_seq = batch[-1]["seq"]
+            self._dirty = True
+            self.written += len(batch)
+            self._since_snapshot += len(batch)
+            if time.monotonic() - self._last_fsync >= self.fsync_interval:
+                os.fsync(self._file.fileno())
+                self._last_fsync = time.monotonic()
+                self._dirty = False
+            if self.snapshot_every and self._since_snapshot >= self.snapshot_every:
+                self.compact()
+
+    def drain_sync(self):
+        """Write the whole backlog from the calling thread."""
+        self._write_next(None)
+
+    async def _run(self):
+        while not self.closed:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            while self._backlog:
+                await asyncio.to_thread(self._write_next, self.max_batch)
+
+    def compact(self) -> bool:
+        """Snapshot every written entry and truncate the journal."""
+        with self._write_lock:
+            try:
+                self._write_snapshot(self._states)
+            except Exception as exc:
+                logger.error(f"Queue journal compaction failed: {exc}")
+                return False
+        return True
+
+    def close(self, *, snapshot: bool = True):
+        """Write the backlog, compact (optionally) and stop recording; later changes are not journaled."""
+        with self._lock:
+            if self.closed:
+                return
+            self.closed = True
+        if self.running:
+            self._wakeup.set()
+        with self._write_lock:
+            self.drain_sync()
+            if snapshot:
+                self.compact()
+            self._close_file()
+
+    def metrics(self) -> dict:
+        return {
+            "appended": self.appended,
+            "backlog": len(self._backlog),
+            "since_snapshot": self._since_snapshot,
+            "snapshots": self.snapshots,
+            "replayed": self.replayed,
+            "replay_seconds": self.replay_seconds,
+        }
@@ -0,0 +1,437 @@
+"""
+Token index for finding songs across playlists, favorites and downloads.
+
+SearchIndex is an inverted index: every title, uploader and playlist name is
+split into lowercase, accent-folded word tokens, and each token maps to the
+documents containing it. There are two kinds of document:
+
+    track      one per video id, wherever it appears: any playlist or
+               favorites list, and the downloads catalog
+    playlist   one per playlist or favorites list, by name
+
+A query's tokens must all match (the last one as a prefix, so results keep
+up while the user is still typing). Matches score by field (title above
+uploader above the name of a playlist the track is in), and tracks that are
+already cached get a bonus because they start playing instantly.
+
+The index follows a PlaylistRepository through its listener hook, so it stays
+current whether a playlist was saved by the bot, by the web UI or by hand.
+Catalog titles are added by the bot as tracks are downloaded, and recently
+played tracks through note_recent(). Visibility is the caller's job:
+search() takes a can_view(playlist) predicate and only reports playlists,
+and tracks reachable through playlists, that pass it.
+
+Recently played tracks are kept per scope (the bot uses the guild id) and
+only count for queries that pass the same recent_scope, so one guild's play
+history never shows up in another guild's results.
+
+suggest() serves slash-command autocomplete, which runs on every keystroke.
+It caps how many documents a short prefix may expand to (a one-letter
+prefix can match most of the index) and, for an empty query, returns the
+scope's most recently played tracks.
+"""
+import bisect
+import collections
+import heapq
+import operator
+import re
+import threading
+import unicodedata
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, Optional
+
+WORD_RE = re.compile(r"\w+")
+FIELD_WEIGHTS = {"title": 3.0, "uploader": 2.0, "playlist": 1.0}
+CACHED_BONUS = 2.0
+RECENT_BONUS = 0.5
+SUGGEST_CANDIDATES = 1000
+TRACK = "track"
+PLAYLIST = "playlist"
+
+
+def tokenize(text) -> list:
+    folded = unicodedata.normalize("NFKD", str(text or ""))
+    folded = "".join(char for char in folded if not unicodedata.combining(char))
+    return WORD_RE.findall(folded.casefold())
+
+
+@dataclass
+class SearchHit:
+    kind: str
+    key: str
+    title: str
+    score: float
+    uploader: str = ""
+    webpage_url: str = ""
+    cached: bool = False
+    playlists: list = field(default_factory=list)
+
+    def as_dict(self) -> dict:
+        return {
+            "kind": self.kind,
+            "id": self.key,
+            "title": self.title,
+            "uploader": self.uploader,
+            "webpage_url": self.webpage_url,
+            "cached": self.cached,
+            "score": round(self.score, 3),
+            "playlists": list(self.playlists),
+        }
+
+
+def _playlist_ref(playlist: dict) -> dict:
+    return {"id": playlist.get("id"), "name": playlist.get("name"), "type": playlist.get("type")}
+
+
+def _memoized(can_view: Optional[Callable[[dict], bool]]) -> Optional[Callable[[dict], bool]]:
+    """Cache a can_view predicate per playlist object for the length of one query."""
+    if can_view is None:
+        return None
+    seen: dict = {}
+
+    def check(playlist: dict) -> bool:
+        key = id(playlist)
+        if key not in seen:
+            seen[key] = bool(can_view(playlist))
+        return seen[key]
+
+    return check
+
+
+@dataclass
+class _TrackDoc:
+    video_id: str
+    title: str = ""
+    uploader: str = ""
+    webpage_url: str = ""
+    in_catalog: bool = False
+    recent_in: set = field(default_factory=set)
+    playlists: dict = field(default_factory=dict)
+
+
+class SearchIndex:
+    """Inverted index over tracks and playlists. Thread-safe."""
+
+    def __init__(self, *, cache_probe: Optional[Callable[[str], bool]] = None, max_recent: int = 200):
+        self.cache_probe = cache_probe
+        self.max_recent = max_recent
+        self._lock = threading.Lock()
+        self._tracks: dict = {}
+        self._playlists: dict = {}
+        self._playlist_tracks: dict = {}
+        self._postings: dict = {}
+        self._doc_tokens: dict = {}
+        self._vocabulary: Optional[list] = None
+        # scope -> OrderedDict of recently played video ids, oldest first.
+        self._recent: dict = {}
+        self.queries = 0
+
+    # ------------------------------------------------------------------
+    # Indexing
+    # ------------------------------------------------------------------
+
+    def _reindex(self, doc_key: tuple, weights: dict):
+        old = self._doc_tokens.pop(doc_key, {})
+        for token in old:
+            postings = self._postings.get(token)
+            if postings is None:
+                continue
+            postings.pop(doc_key, None)
+            if not postings:
+                del self._postings[token]
+                self._vocabulary = None
+        for token, weight in weights.items():
+            if token not in self._postings:
+                self._postings[token] = {}
+                self._vocabulary = None
+            self._postings[token][doc_key] = weight
+        if weights:
+            self._doc_tokens[doc_key] = weights
+
+    def _track_weights(self, doc: _TrackDoc) -> dict:
+        weights: dict = {}
+        fields = [("title", doc.title), ("uploader", doc.uploader)]
+        fields.extend(("playlist", playlist.get("name")) for playlist in doc.playlists.values())
+        for name, text in fields:
+            for token in tokenize(text):
+                weights[token] = max(weights.get(token, 0.0), FIELD_WEIGHTS[name])
+        return weights
+
+    def _refresh_track(self, video_id: str):
+        doc = self._tracks.get(video_id)
+        if doc is None:
+            return
+        if not doc.playlists and not doc.in_catalog and not doc.recent_in:
+            del self._tracks[video_id]
+            self._reindex((TRACK, video_id), {})
+            return
+        self._reindex((TRACK, video_id), self._track_weights(doc))
+
+    def _track_doc(self, video_id: str, track: dict) -> _TrackDoc:
+        doc = self._tracks.get(video_id)
+        if doc is None:
+            doc = self._tracks[video_id] = _TrackDoc(video_id=video_id)
+        doc.title = doc.title or str(track.get("title") or "")
+        doc.uploader = doc.uploader or str(track.get("uploader") or track.get("channel") or "")
+        doc.webpage_url = doc.webpage_url or str(track.get("webpage_url") or "")
+        return doc
+
+    def update_playlist(self, path: str, previous: Optional[dict], current: Optional[dict]):
+        """PlaylistRepository listener: replace *path*'s contribution to the index."""
+        if current is not None and current.get("deleted"):
+            current = None
+        with self._lock:
+            self._playlists.pop(path, None)
+            touched = self._playlist_tracks.pop(path, set())
+            for video_id in touched:
+                doc = self._tracks.get(video_id)
+                if doc is not None:
+                    doc.playlists.pop(path, None)
+            if current is None:
+                self._reindex((PLAYLIST, path), {})
+            else:
+                self._playlists[path] = current
+                members = self._playlist_tracks[path] = set()
+                self._reindex((PLAYLIST, path), {
+                    token: FIELD_WEIGHTS["title"] for token in tokenize(current.get("name"))
+                })
+                for track in current.get("tracks", []):
+                    video_id = str(track.get("id") or "").strip()
+                    if not video_id:
+                        continue
+                    self._track_doc(video_id, track).playlists[path] = current
+                    members.add(video_id)
+            touched = touched | self._playlist_tracks.get(path, set())
+            for video_id in touched:
+                self._refresh_track(video_id)
+
+    def add_catalog_track(self, video_id: str, title: str):
+        """Make a downloaded track searchable. It stays searchable after its file expires."""
+        video_id = str(video_id or "").strip()
+        if not video_id:
+            return
+        with self._lock:
+            doc = self._track_doc(video_id, {"title": title})
+            doc.in_catalog = True
+            self._refresh_track(video_id)
+
+    def note_recent(self, tracks: Iterable[dict], *, scope):
+        """
+        Mark tracks as recently played in *scope*, oldest first. Only the
+        newest max_recent stay marked; re-noting a track moves it to the front.
+        """
+        with self._lock:
+            recent = self._recent.setdefault(scope, collections.OrderedDict())
+            for track in tracks:
+                video_id = str(track.get("id") or "").strip()
+                if not video_id:
+                    continue
+                if video_id in recent:
+                    recent.move_to_end(video_id)
+                    continue
+                recent[video_id] = None
+                doc = self._track_doc(video_id, track)
+                doc.recent_in.add(scope)
+                self._refresh_track(video_id)
+            while len(recent) > self.max_recent:
+                video_id, _ = recent.popitem(last=False)
+                doc = self._tracks.get(video_id)
+                if doc is not None:
+                    doc.recent_in.discard(scope)
+                    self._refresh_track(video_id)
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def _prefix_tokens(self, prefix: str) -> list:
+        if self._vocabulary is None:
+            self._vocabulary = sorted(self._postings)
+        start = bisect.bisect_left(self._vocabulary, prefix)
+        end = bisect.bisect_left(self._vocabulary, prefix + "\U0010ffff")
+        return self._vocabulary[start:end]
+
+    def _matches(self, tokens: list, *, budget: Optional[int] = None) -> dict:
+        """
+        doc_key -> score for documents matching every token. With a budget,
+        the last token's prefix stops expanding once that many documents
+        match it (exact matches are always expanded first).
+        """
+        per_token = []
+        for position, token in enumerate(tokens):
+            if position < len(tokens) - 1:
+                per_token.append(self._postings.get(token, {}))
+                continue
+            expansions = self._prefix_tokens(token)
+            if token in self._postings:
+                expansions.remove(token)
+                expansions.insert(0, token)
+            candidates: dict = {}
+            for expanded in expansions:
+                # An exact token match outranks a longer word it prefixes.
+                factor = 1.0 if expanded == token else 0.8
+                postings = self._postings[expanded]
+                if not candidates:
+                    candidates = {doc_key: weight * factor for doc_key, weight in postings.items()}
+                else:
+                    for doc_key, weight in postings.items():
+                        weight *= factor
+                        if candidates.get(doc_key, 0.0) < weight:
+                            candidates[doc_key] = weight
+                if budget is not None and len(candidates) >= budget:
+                    break
+            per_token.append(candidates)
+        per_token.sort(key=len)
+        scores = per_token[0]
+        for candidates in per_token[1:]:
+            scores = {doc_key: score + candidates[doc_key] for doc_key, score in scores.items() if doc_key in candidates}
+            if not scores:
+                break
+        return scores
+
+    def _final_score(self, kind: str, key: str, score: float, can_view, recent_scope=None) -> Optional[float]:
+        """*score* with the cache bonus applied, or None if the caller may not see the document."""
+        if kind == PLAYLIST:
+            playlist = self._playlists.get(key)
+            if playlist is None or (can_view is not None and not can_view(playlist)):
+                return None
+            return score
+        doc = self._tracks.get(key)
+        if doc is None:
+            return None
+        recent = recent_scope is not None and recent_scope in doc.recent_in
+        if (
+            not doc.in_catalog
+            and not recent
+            and can_view is not None
+            and not any(can_view(playlist) for playlist in doc.playlists.values())
+        ):
+            return None
+        if not doc.in_catalog and not doc.playlists and not recent:
+            # Only recent in another scope.
+            return None
+        if recent:
+            score += RECENT_BONUS
+        if self.cache_probe is not None and self.cache_probe(doc.video_id):
+            score += CACHED_BONUS
+        return score
+
+    def _hit(self, kind: str, key: str, score: float, can_view) -> SearchHit:
+        if kind == PLAYLIST:
+            playlist = self._playlists[key]
+            return SearchHit(
+                kind=PLAYLIST,
+                key=str(playlist.get("id") or ""),
+                title=str(playlist.get("name") or ""),
+                score=score,
+                playlists=[_playlist_ref(playlist)],
+            )
+        doc = self._tracks[key]
+        return SearchHit(
+            kind=TRACK,
+            key=doc.video_id,
+            title=doc.title or doc.video_id,
+            uploader=doc.uploader,
+            webpage_url=doc.webpage_url,
+            score=score,
+            cached=self.cache_probe is not None and self.cache_probe(doc.video_id),
+            playlists=[
+                _playlist_ref(playlist) for playlist in doc.playlists.values()
+                if can_view is None or can_view(playlist)
+            ],
+        )
+
+    def search(
+        self,
+        query: str,
+        *,
+        limit: int = 20,
+        can_view: Optional[Callable[[dict], bool]] = None,
+        kind: Optional[str] = None,
+        budget: Optional[int] = None,
+        recent_scope=None,
+    ) -> list:
+        """
+        Ranked hits for *query*; can_view(playlist) filters what the caller
+        may see, *kind* (TRACK or PLAYLIST) restricts the document type and
+        recent_scope picks whose recently played tracks count.
+        """
+        tokens = tokenize(query)
+        if not tokens or limit <= 0:
+            return []
+        can_view = _memoized(can_view)
+        with self._lock:
+            self.queries += 1
+            scores = self._matches(tokens, budget=budget)
+            ranked = sorted(scores.items(), key=operator.itemgetter(1), reverse=True)
+            if budget is not None:
+                del ranked[budget:]
+            best: list = []
+            for order, ((doc_kind, key), score) in enumerate(ranked):
+                # Candidates come best-first; once even the bonuses could not
+                # lift the next one into the top *limit*, the rest cannot either.
+                if len(best) >= limit and score + CACHED_BONUS + RECENT_BONUS < best[0][0]:
+                    break
+                if kind is not None and doc_kind != kind:
+                    continue
+                final = self._final_score(doc_kind, key, score, can_view, recent_scope)
+                if final is None:
+                    continue
+                entry = (final, -order, doc_kind, key)
+                if len(best) < limit:
+                    heapq.heappush(best, entry)
+                elif entry > best[0]:
+                    heapq.heapreplace(best, entry)
+            hits = [self._hit(kind, key, final, can_view) for final, _, kind, key in best]
+        hits.sort(key=lambda hit: (-hit.score, hit.kind != TRACK, hit.title.casefold()))
+        return hits
+
+    def suggest(
+        self,
+        query: str,
+        *,
+        limit: int = 25,
+        can_view: Optional[Callable[[dict], bool]] = None,
+        kind: Optional[str] = None,
+        recent_scope=None,
+    ) -> list:
+        """Autocomplete hits: a bounded search(), or the scope's newest recent tracks for an empty query."""
+        if tokenize(query):
+            return self.search(
+                query, limit=limit, can_view=can_view, kind=kind, budget=SUGGEST_CANDIDATES, recent_scope=recent_scope,
+            )
+        can_view = _memoized(can_view)
+        if kind == PLAYLIST or limit <= 0:
+            return []
+        with self._lock:
+            self.queries += 1
+            hits = []
+            for video_id in reversed(self._recent.get(recent_scope) or {}):
+                hits.append(self._hit(TRACK, video_id, 0.0, can_view))
+                if len(hits) >= limit:
+                    break
+            return hits
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {
+                "tracks": len(self._tracks),
+                "playlists": len(self._playlists),
+                "tokens": len(self._postings),
+                "recent": sum(len(recent) for recent in self._recent.values()),
+                "queries": self.queries,
+            }
+
+
+_indexes: dict = {}
+_indexes_lock = threading.Lock()
+
+
+def index_for(repository) -> SearchIndex:
+    """The shared SearchIndex that follows *repository*."""
+    with _indexes_lock:
+        index = _indexes.get(id(repository))
+        if index is None:
+            index = _indexes[id(repository)] = SearchIndex()
+            repository.add_listener(index.update_playlist)
+        return index
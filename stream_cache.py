@@ -0,0 +1,158 @@
+"""
+Cache of resolved direct media URLs for stream-mode playback.
+
+Streaming a track means asking yt-dlp for the direct googlevideo URL, which
+costs a full extraction (page fetch, player JS, signature challenges). The
+same video is often streamed again within minutes: repeat copies, repeat-one,
+"previous track" votes, the same song queued twice. StreamUrlCache keeps the
+resolved URL per video id together with the request headers and format yt-dlp
+chose, so a repeat play can hand ffmpeg the URL directly.
+
+googlevideo URLs are signed and carry their own expiry, either as an
+``expire=<unix time>`` query parameter or an ``/expire/<unix time>/`` path
+segment. Entries are served only while they have more than refresh_margin
+seconds left; the bot re-resolves entries it still needs (current track and
+queue) before they reach that point. URLs without a recognizable expiry get
+default_ttl seconds.
+"""
+import collections
+import threading
+import time
+import urllib.parse
+from dataclasses import dataclass, field
+from typing import Iterable, Optional
+
+GOOGLEVIDEO_SUFFIX = ".googlevideo.com"
+STREAM_DATA_KEYS = (
+    "id", "title", "webpage_url", "duration", "format_id", "format", "format_note",
+    "acodec", "abr", "asr", "tbr", "audio_channels", "ext", "uploader", "channel",
+    "is_live",
+)
+
+
+def parse_expiry(url: str) -> Optional[float]:
+    """Return the unix expiry of a signed googlevideo URL, or None if it has none."""
+    try:
+        parsed = urllib.parse.urlsplit(str(url or ""))
+    except ValueError:
+        return None
+    host = (parsed.hostname or "").lower()
+    if not (host == GOOGLEVIDEO_SUFFIX[1:] or host.endswith(GOOGLEVIDEO_SUFFIX)):
+        return None
+    values = urllib.parse.parse_qs(parsed.query).get("expire")
+    if not values:
+        parts = parsed.path.split("/")
+        if "expire" in parts:
+            index = parts.index("expire")
+            values = parts[index + 1:index + 2]
+    try:
+        return float(values[0]) if values else None
+    except ValueError:
+        return None
+
+
+@dataclass
+class StreamEntry:
+    video_id: str
+    url: str
+    headers: dict
+    format_id: str
+    data: dict
+    expires_at: float
+    resolved_at: float = field(default_factory=time.time)
+    hits: int = 0
+
+
+class StreamUrlCache:
+    """Thread-safe, size-bounded video id -> StreamEntry map with expiry."""
+
+    def __init__(self, *, refresh_margin: float = 300.0, default_ttl: float = 1800.0, max_entries: int = 512):
+        self.refresh_margin = refresh_margin
+        self.default_ttl = default_ttl
+        self.max_entries = max_entries
+        self._entries: "collections.OrderedDict[str, StreamEntry]" = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.refreshed = 0
+
+    def put(self, video_id: str, data: dict, *, refreshed: bool = False) -> Optional[StreamEntry]:
+        """Store a yt-dlp info dict's direct URL. Returns the entry, or None if unusable."""
+        url = (data or {}).get("url")
+        if not video_id or not url or data.get("is_live"):
+            return None
+        now = time.time()
+        expires_at = parse_expiry(url) or now + self.default_ttl
+        if expires_at - now <= self.refresh_margin:
+            return None
+        entry = StreamEntry(
+            video_id=str(video_id),
+            url=url,
+            headers=dict(data.get("http_headers") or {}),
+            format_id=str(data.get("format_id") or ""),
+            data={key: data[key] for key in STREAM_DATA_KEYS if data.get(key) is not None},
+            expires_at=expires_at,
+            resolved_at=now,
+        )
+        entry.data["url"] = url
+        with self._lock:
+            self._entries[entry.video_id] = entry
+            self._entries.move_to_end(entry.video_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            if refreshed:
+                self.refreshed += 1
+        return entry
+
+    def get(self, video_id: Optional[str]) -> Optional[StreamEntry]:
+        """Return a fresh entry for *video_id*, or None (and count a miss)."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(str(video_id or ""))
+            if entry is not None and entry.expires_at - now <= self.refresh_margin:
+                del self._entries[entry.video_id]
+                self.expired += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(entry.video_id)
+            entry.hits += 1
+            self.hits += 1
+            return entry
+
+    def is_fresh(self, video_id: Optional[str]) -> bool:
+        """True if get() would return an entry, without counting a lookup."""
+        with self._lock:
+            entry = self._entries.get(str(video_id or ""))
+            return entry is not None and entry.expires_at - time.time() > self.refresh_margin
+
+    def invalidate(self, video_id: Optional[str]) -> bool:
+        with self._lock:
+            return self._entries.pop(str(video_id or ""), None) is not None
+
+    def due_for_refresh(self, wanted_ids: Iterable[str], *, lead_time: float) -> list:
+        """Video ids in *wanted_ids* whose entry leaves the fresh window within *lead_time* seconds."""
+        deadline = time.time() + self.refresh_margin + lead_time
+        with self._lock:
+            return [
+                video_id for video_id in dict.fromkeys(str(value) for value in wanted_ids if value)
+                if video_id in self._entries and self._entries[video_id].expires_at <= deadline
+            ]
+
+    def metrics(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "expired": self.expired,
+                "refreshed": self.refreshed,
+            }
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
@@ -0,0 +1,354 @@
+"""
+SQLite catalog of short-term downloaded tracks.
+
+The bot used to keep this metadata in a module-level dict that was dumped in
+full to downloads.json (non-atomically) on every cache reuse, download,
+cleanup and purge, while delayed playback cleanups mutated the same dict from
+other tasks. TrackCatalog stores one row per video id instead:
+
+    video_id     primary key
+    cache_key    canonical cache key the file is named after
+    path         cache file path as stored in metadata ("cache/<key>.<ext>")
+    size         file size in bytes when it was recorded
+    ext          file extension without the dot
+    title        track title
+    last_played  unix time the track was last downloaded, reused or played
+    play_count   how many times playback of the cached file finished
+    expires_at   unix time the file should be deleted, or NULL while unplayed
+
+The database runs in WAL mode, so readers never block the writer. The
+connection is in autocommit mode: single statements commit on their own and
+multi-statement changes (schema migrations, batch updates and deletes) run
+inside an explicit BEGIN/COMMIT. Lookups by video id, path, last_played
+and expires_at are indexed.
+
+The connection is shared between the event loop and the audio callback
+thread and is guarded by a lock.
+
+ExpiryScheduler deletes files when their expires_at passes. The indexed
+expires_at column is the timer queue: one task sleeps until the earliest
+deadline, hands every due row to the bot in a batch and goes back to sleep.
+Rescheduling is a row update, and because the deadlines live in the
+database they survive restarts.
+"""
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_VERSION = 2
+COLUMNS = ("video_id", "cache_key", "path", "size", "ext", "title", "last_played", "play_count", "expires_at")
+# The old fixed startup expiry, an hour after last use: rows from before expiry scheduling
+# get it, and so do never-played rows at each startup (see TrackCatalog.schedule_idle).
+LEGACY_EXPIRY_SECONDS = 3600
+
+
+@dataclass
+class CatalogEntry:
+    video_id: str
+    cache_key: Optional[str]
+    path: str
+    size: int
+    ext: str
+    title: str
+    last_played: float
+    play_count: int
+    expires_at: Optional[float] = None
+
+
+class TrackCatalog:
+    """Row-level store of downloaded track metadata. Thread-safe."""
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._migrate_schema()
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        """BEGIN/COMMIT around a block; `with self._db` does nothing in autocommit mode."""
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+        self._db.execute("COMMIT")
+
+    def _migrate_schema(self):
+        version = self._db.execute("PRAGMA user_version").fetchone()[0]
+        if version < 1:
+            with self._transaction():
+                self._db.execute("""
+                    CREATE TABLE IF NOT EXISTS tracks (
+                        video_id TEXT PRIMARY KEY,
+                        cache_key TEXT,
+                        path TEXT NOT NULL,
+                        size INTEGER NOT NULL DEFAULT 0,
+                        ext TEXT NOT NULL DEFAULT '',
+                        title TEXT NOT NULL DEFAULT '',
+                        last_played REAL NOT NULL DEFAULT 0,
+                        play_count INTEGER NOT NULL DEFAULT 0
+                    )
+                """)
+                self._db.execute("CREATE INDEX IF NOT EXISTS tracks_path ON tracks(path)")
+                self._db.execute("CREATE INDEX IF NOT EXISTS tracks_last_played ON tracks(last_played)")
+                self._db.execute("PRAGMA user_version=1")
+        if version < 2:
+            with self._transaction():
+                self._db.execute("ALTER TABLE tracks ADD COLUMN expires_at REAL")
+                self._db.execute("UPDATE tracks SET expires_at = last_played + ?", (LEGACY_EXPIRY_SECONDS,))
+                self._db.execute("CREATE INDEX IF NOT EXISTS tracks_expires_at ON tracks(expires_at)")
+                self._db.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+
+    def _query(self, sql: str, params: Iterable = ()) -> list:
+        with self._lock:
+            return self._db.execute(sql, tuple(params)).fetchall()
+
+    def _write(self, sql: str, params: Iterable = ()) -> int:
+        with self._lock:
+            return self._db.execute(sql, tuple(params)).rowcount
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    def get(self, video_id: Optional[str]) -> Optional[CatalogEntry]:
+        if not video_id:
+            return None
+        rows = self._query(f"SELECT {', '.join(COLUMNS)} FROM tracks WHERE video_id = ?", (str(video_id),))
+        return CatalogEntry(*rows[0]) if rows else None
+
+    def __contains__(self, video_id) -> bool:
+        return bool(video_id) and bool(self._query("SELECT 1 FROM tracks WHERE video_id = ?", (str(video_id),)))
+
+    def records(self) -> list:
+        return [CatalogEntry(*row) for row in self._query(f"SELECT {', '.join(COLUMNS)} FROM tracks ORDER BY last_played")]
+
+    def due(self, now: float, limit: int) -> list:
+        """Up to *limit* rows whose expires_at is at or before *now*, earliest first."""
+        rows = self._query(
+            f"SELECT {', '.join(COLUMNS)} FROM tracks WHERE expires_at <= ? ORDER BY expires_at LIMIT ?",
+            (now, limit),
+        )
+        return [CatalogEntry(*row) for row in rows]
+
+    def next_expiry(self) -> Optional[float]:
+        return self._query("SELECT MIN(expires_at) FROM tracks")[0][0]
+
+    def scheduled_count(self) -> int:
+        return int(self._query("SELECT COUNT(*) FROM tracks WHERE expires_at IS NOT NULL")[0][0])
+
+    def total_size(self) -> int:
+        return int(self._query("SELECT COALESCE(SUM(size), 0) FROM tracks")[0][0])
+
+    def __len__(self) -> int:
+        return int(self._query("SELECT COUNT(*) FROM tracks")[0][0])
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+
+    def upsert(self, video_id: str, *, path: str, cache_key: Optional[str] = None, size: int = 0,
+               ext: str = "", title: str = "", last_played: Optional[float] = None,
+               expires_at: Optional[float] = None):
+        """
+        Record a cached file for *video_id*, keeping its play count. An
+        expires_at of None keeps any pending expiry.
+        """
+        self._write(
+            """
+            INSERT INTO tracks (video_id, cache_key, path, size, ext, title, last_played, expires_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(video_id) DO UPDATE SET
+                cache_key = excluded.cache_key, path = excluded.path, size = excluded.size,
+                ext = excluded.ext, title = excluded.title, last_played = excluded.last_played,
+                expires_at = COALESCE(excluded.expires_at, tracks.expires_at)
+            """,
+            (str(video_id), cache_key, path, int(size or 0), ext or "", title or "",
+             time.time() if last_played is None else last_played, expires_at),
+        )
+
+    def record_play(self, video_id: Optional[str], *, expires_at: Optional[float] = None) -> bool:
+        """
+        Bump play_count and last_played and set the file's expiry. Returns
+        False if the track is not cataloged.
+        """
+        if not video_id:
+            return False
+        return self._write(
+            "UPDATE tracks SET play_count = play_count + 1, last_played = ?, expires_at = ? WHERE video_id = ?",
+            (time.time(), expires_at, str(video_id)),
+        ) > 0
+
+    def set_expiry(self, video_ids: Iterable[str], expires_at: Optional[float]) -> int:
+        ids = [(expires_at, str(video_id)) for video_id in video_ids if video_id]
+        if not ids:
+            return 0
+        with self._lock, self._transaction():
+            return self._db.executemany("UPDATE tracks SET expires_at = ? WHERE video_id = ?", ids).rowcount
+
+    def schedule_idle(self, last_used_before: float, expires_at: float) -> int:
+        """Give every row with no expiry that was last used before *last_used_before* the expiry *expires_at*."""
+        return self._write(
+            "UPDATE tracks SET expires_at = ? WHERE expires_at IS NULL AND last_played < ?",
+            (expires_at, last_used_before),
+        )
+
+    def delete(self, video_id: Optional[str]) -> bool:
+        if not video_id:
+            return False
+        return self._write("DELETE FROM tracks WHERE video_id = ?", (str(video_id),)) > 0
+
+    def delete_many(self, video_ids: Iterable[str]) -> int:
+        ids = [(str(video_id),) for video_id in video_ids if video_id]
+        if not ids:
+            return 0
+        with self._lock, self._transaction():
+            return self._db.executemany("DELETE FROM tracks WHERE video_id = ?", ids).rowcount
+
+    def delete_by_path(self, path: str) -> int:
+        return self._write("DELETE FROM tracks WHERE path = ?", (path,))
+
+    def retain_paths(self, paths: Iterable[str]) -> int:
+        """Delete every row whose path is not in *paths*. Returns the number deleted."""
+        keep = list(dict.fromkeys(paths))
+        if not keep:
+            return self._write("DELETE FROM tracks")
+        placeholders = ", ".join("?" for _ in keep)
+        return self._write(f"DELETE FROM tracks WHERE path NOT IN ({placeholders})", keep)
+
+    # ------------------------------------------------------------------
+    # Migration
+    # ------------------------------------------------------------------
+
+    def migrate_json(self, legacy_path: str, *, normalize_path: Callable[[str], Optional[str]],
+                     size_of: Callable[[str], int]) -> int:
+        """
+        One-time import of downloads.json ({video_id: {title, filepath, timestamp,
+        cache_key, ext, ...}}). Renames the file to <legacy_path>.migrated.
+        """
+        if not os.path.isfile(legacy_path):
+            return 0
+        try:
+            with open(legacy_path, "r") as f:
+                legacy = json.load(f)
+        except ValueError as exc:
+            logger.error(f"{legacy_path} is not valid JSON; importing nothing from it: {exc}")
+            legacy = {}
+        rows = []
+        for video_id, info in (legacy.items() if isinstance(legacy, dict) else ()):
+            if not isinstance(info, dict):
+                continue
+            path = normalize_path(info.get("cache_path") or info.get("filepath"))
+            if not path:
+                continue
+            timestamp = float(info.get("timestamp") or 0)
+            rows.append((
+                str(video_id), info.get("cache_key"), path, size_of(path),
+                str(info.get("ext") or os.path.splitext(path)[1].lstrip(".")).lower(),
+                str(info.get("title") or ""), timestamp, timestamp + LEGACY_EXPIRY_SECONDS,
+            ))
+        with self._lock, self._transaction():
+            self._db.executemany(
+                "INSERT OR IGNORE INTO tracks (video_id, cache_key, path, size, ext, title, last_played, expires_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+        os.replace(legacy_path, f"{legacy_path}.migrated")
+        logger.info(f"Migrated {len(rows)} track(s) from {legacy_path} to {self.path}")
+        return len(rows)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class ExpiryScheduler:
+    """
+    Runs *expire* on batches of catalog rows whose expires_at has passed.
+
+    expire() runs on the event loop. It must delete each row it is given or
+    move its expires_at at least retry_delay seconds into the future, and it
+    returns how many rows it deleted. Rows it leaves due are retried after
+    retry_delay seconds.
+    schedule() and wake() may be called from any thread.
+    """
+
+    def __init__(self, catalog: TrackCatalog, expire: Callable[[list], int], *,
+                 batch_size: int = 100, max_sleep: float = 300.0, retry_delay: float = 30.0):
+        self.catalog = catalog
+        self.expire = expire
+        self.batch_size = batch_size
+        self.max_sleep = max_sleep
+        self.retry_delay = retry_delay
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self.expired = 0
+        self.batches = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._task = self._loop.create_task(self._run())
+
+    def schedule(self, video_id: str, delay: float) -> bool:
+        """(Re)schedule *video_id* to expire *delay* seconds from now."""
+        changed = self.catalog.set_expiry([video_id], time.time() + delay) > 0
+        if changed:
+            self.wake()
+        return changed
+
+    def wake(self):
+        if self._loop is not None and self._wakeup is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            now = time.time()
+            due = self.catalog.due(now, self.batch_size)
+            if due:
+                try:
+                    self.expired += int(self.expire(due) or 0)
+                except Exception as exc:
+                    logger.error(f"Expiry batch of {len(due)} track(s) failed: {exc}")
+                self.batches += 1
+                still_due = {entry.video_id for entry in self.catalog.due(time.time(), self.batch_size)}
+                # Yield between batches even when the next one is ready; back off if this one made no progress.
+                await asyncio.sleep(self.retry_delay if still_due & {entry.video_id for entry in due} else 0)
+                continue
+            next_at = self.catalog.next_expiry()
+            timeout = self.max_sleep if next_at is None else min(self.max_sleep, max(0.0, next_at - now))
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def metrics(self) -> dict:
+        next_at = self.catalog.next_expiry()
+        return {
+            "scheduled": self.catalog.scheduled_count(),
+            "next_in": None if next_at is None else max(0.0, next_at - time.time()),
+            "expired": self.expired,
+            "batches": self.batches,
+        }
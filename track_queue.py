@@ -0,0 +1,460 @@
+"""
+Indexed queue of upcoming track dictionaries.
+
+The queue used to be a plain list: every track change popped its head
+(O(n)), and finding a playlist block's end, a video's queue positions or
+whether a given track was still queued meant scanning the whole list.
+TrackQueue keeps the list interface the bot, the web UI (BotState.queue)
+and JSON dumps rely on, and adds:
+
+    O(1) head          popleft()/pop(0) and appendleft()/insert(0, ...)
+                       move a head offset instead of shifting the list
+    position index     track object -> queue positions
+    video index        video id -> queue positions
+    block index        playlist block id / playlist id -> (first, last)
+
+Slots are numbered from a base that survives head pops, appends and front
+inserts, so those keep the indexes current in O(log k). Anything that
+shifts the middle of the list (insert/remove in the middle, slice
+assignment, sort) marks the indexes stale and they are rebuilt on the next
+lookup, once, in O(n).
+
+Every change is reported to an optional listener as (op, *args), e.g.
+("enqueue", position, tracks) or ("dequeue", position), with positions as
+they were when the change happened; queue_journal replays these after a
+restart. Changes that rewrite the order wholesale (sort, reverse, slice
+assignment) report ("replace", tracks).
+
+Tracks are dicts or track_record.TrackRecord mappings. The indexes are
+keyed on their "id", "playlist_block_id" and "playlist_id" fields. A
+lookup re-checks those fields and rebuilds if a queued track was changed
+in place; call invalidate() after changing them to make sure a track that
+gained a field is found too.
+"""
+import bisect
+import contextlib
+from collections.abc import Mapping, MutableSequence
+from typing import Callable, Iterable, Optional
+
+INDEXED_FIELDS = ("id", "playlist_block_id", "playlist_id")
+# Room reserved in front of the head when a prepend finds none, so repeated
+# front inserts stay amortized O(1).
+MIN_FRONT_GAP = 16
+
+
+class TrackQueue(MutableSequence):
+    """A list of track dicts with O(1) head operations and lookup indexes."""
+
+    def __init__(self, tracks: Iterable = (), *, listener: Optional[Callable] = None):
+        self.listener = None
+        self._items: list = []
+        self._head = 0
+        self._base = 0
+        self._stale = False
+        self._by_identity: dict = {}
+        self._by_field: dict = {name: {} for name in INDEXED_FIELDS}
+        self.rebuilds = 0
+        self.extend(tracks)
+        self.listener = listener
+
+    # ------------------------------------------------------------------
+    # Change notifications
+    # ------------------------------------------------------------------
+
+    def _notify(self, op: str, *args):
+        if self.listener is not None:
+            self.listener(op, *args)
+
+    @contextlib.contextmanager
+    def _quiet(self):
+        # For compound changes that report themselves as one operation.
+        listener, self.listener = self.listener, None
+        try:
+            yield
+        finally:
+            self.listener = listener
+
+    # ------------------------------------------------------------------
+    # Index maintenance
+    # ------------------------------------------------------------------
+
+    def _keys(self, track) -> list:
+        keys = [(self._by_identity, id(track))]
+        if isinstance(track, Mapping):
+            for name in INDEXED_FIELDS:
+                value = track.get(name)
+                if value:
+                    keys.append((self._by_field[name], str(value)))
+        return keys
+
+    def _index_add(self, track, slot: int):
+        for index, key in self._keys(track):
+            slots = index.get(key)
+            if slots is None:
+                index[key] = [slot]
+            elif slot > slots[-1]:
+                slots.append(slot)
+            else:
+                at = bisect.bisect_left(slots, slot)
+                if at == len(slots) or slots[at] != slot:
+                    slots.insert(at, slot)
+
+    def _index_remove(self, track, slot: int):
+        for index, key in self._keys(track):
+            slots = index.get(key)
+            if not slots:
+                continue
+            at = bisect.bisect_left(slots, slot)
+            if at < len(slots) and slots[at] == slot:
+                del slots[at]
+            if not slots:
+                del index[key]
+
+    def _rebuild(self):
+        if self._head:
+            del self._items[:self._head]
+            self._head = 0
+        self._base = 0
+        self._by_identity = {}
+        self._by_field = {name: {} for name in INDEXED_FIELDS}
+        for slot, track in enumerate(self._items):
+            self._index_add(track, slot)
+        self._stale = False
+        self.rebuilds += 1
+
+    def _fresh(self):
+        if self._stale:
+            self._rebuild()
+
+    def invalidate(self):
+        """Rebuild the indexes on the next lookup (after editing indexed fields of queued tracks)."""
+        self._stale = True
+
+    def _position(self, slot: int) -> int:
+        return slot - self._base - self._head
+
+    def _slot(self, position: int) -> int:
+        return position + self._base + self._head
+
+    def _matches(self, position: int, key, field: Optional[str]) -> bool:
+        if not 0 <= position < len(self):
+            return False
+        track = self._items[self._head + position]
+        if field is None:
+            return id(track) == key
+        return str((track or {}).get(field) or "") == key
+
+    def _positions(self, key, field: Optional[str] = None, *, ends_only: bool = False) -> list:
+        """
+        Positions for *key* in the identity index (field None) or a field
+        index; with ends_only, just the first and last.
+        """
+        self._fresh()
+        slots = (self._by_identity if field is None else self._by_field[field]).get(key)
+        if not slots:
+            return []
+        chosen = (slots[0], slots[-1]) if ends_only else slots
+        positions = [self._position(slot) for slot in chosen]
+        if not all(self._matches(position, key, field) for position in positions):
+            # A queued track's indexed field was edited in place.
+            self._rebuild()
+            return self._positions(key, field, ends_only=ends_only)
+        return positions
+
+    def _compact(self):
+        # Drop the popped prefix once it outweighs the live items; slots stay valid.
+        if self._head > MIN_FRONT_GAP and self._head * 2 > len(self._items):
+            del self._items[:self._head]
+            self._base += self._head
+            self._head = 0
+
+    # ------------------------------------------------------------------
+    # Sequence protocol
+    # ------------------------------------------------------------------
+
+    def __len__(self) -> int:
+        return len(self._items) - self._head
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            start, stop, step = position.indices(len(self))
+            if step == 1:
+                return self._items[self._head + start:self._head + max(start, stop)]
+            return self._items[self._head:][position]
+        return self._items[self._head + self._normalize(position)]
+
+    def _normalize(self, position: int) -> int:
+        length = len(self)
+        if position < 0:
+            position += length
+        if not 0 <= position < length:
+            raise IndexError("queue index out of range")
+        return position
+
+    def __setitem__(self, position, value):
+        if isinstance(position, slice):
+            start, stop, step = position.indices(len(self))
+            value = list(value)
+            if step == 1 and start == stop == 0:
+                self.extendleft(value)
+                return
+            if step == 1 and start == 0 and stop == len(self):
+                self.clear()
+                self.extend(value)
+                return
+            live = self._items[self._head:]
+            live[position] = value
+            self._items = live
+            self._head = 0
+            self._stale = True
+            self._notify("replace", live)
+            return
+        position = self._normalize(position)
+        slot = self._slot(position)
+        if not self._stale:
+            self._index_remove(self._items[self._head + position], slot)
+            self._index_add(value, slot)
+        self._items[self._head + position] = value
+        self._notify("set", position, value)
+
+    def __delitem__(self, position):
+        if isinstance(position, slice):
+            live = self._items[self._head:]
+            del live[position]
+            self._items = live
+            self._head = 0
+            self._stale = True
+            self._notify("replace", live)
+            return
+        self.pop(position)
+
+    def __iter__(self):
+        # A snapshot, so the queue can be changed while a caller iterates it.
+        return iter(self._items[self._head:])
+
+    def __reversed__(self):
+        return reversed(self._items[self._head:])
+
+    def __contains__(self, track) -> bool:
+        if self.contains_track(track):
+            return True
+        return any(item == track for item in self)
+
+    def __bool__(self) -> bool:
+        return len(self) > 0
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, TrackQueue):
+            other = list(other)
+        return isinstance(other, list) and list(self) == other
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"TrackQueue({list(self)!r})"
+
+    def __add__(self, other) -> list:
+        return list(self) + list(other)
+
+    def __iadd__(self, other):
+        self.extend(other)
+        return self
+
+    def __copy__(self):
+        return TrackQueue(self)
+
+    def copy(self) -> "TrackQueue":
+        return TrackQueue(self)
+
+    # ------------------------------------------------------------------
+    # Mutation
+    # ------------------------------------------------------------------
+
+    def append(self, track):
+        self._items.append(track)
+        if not self._stale:
+            self._index_add(track, self._base + len(self._items) - 1)
+        self._notify("enqueue", len(self) - 1, [track])
+
+    def extend(self, tracks: Iterable):
+        tracks = list(tracks)
+        if not tracks:
+            return
+        position = len(self)
+        with self._quiet():
+            for track in tracks:
+                self.append(track)
+        self._notify("enqueue", position, tracks)
+
+    def appendleft(self, track):
+        if self._head == 0:
+            gap = max(MIN_FRONT_GAP, len(self._items))
+            self._items[0:0] = [None] * gap
+            self._head = gap
+            self._base -= gap
+        self._head -= 1
+        self._items[self._head] = track
+        if not self._stale:
+            self._index_add(track, self._base + self._head)
+        self._notify("enqueue", 0, [track])
+
+    def extendleft(self, tracks: Iterable):
+        """Insert *tracks* at the front, keeping their order."""
+        tracks = list(tracks)
+        if not tracks:
+            return
+        with self._quiet():
+            for track in reversed(tracks):
+                self.appendleft(track)
+        self._notify("enqueue", 0, tracks)
+
+    def insert(self, position: int, track):
+        length = len(self)
+        if position < 0:
+            position = max(0, position + length)
+        if position == 0:
+            self.appendleft(track)
+        elif position >= length:
+            self.append(track)
+        else:
+            self._items.insert(self._head + position, track)
+            self._stale = True
+            self._notify("enqueue", position, [track])
+
+    def popleft(self):
+        if not len(self):
+            raise IndexError("pop from empty queue")
+        track = self._items[self._head]
+        if not self._stale:
+            self._index_remove(track, self._base + self._head)
+        self._items[self._head] = None
+        self._head += 1
+        if not len(self):
+            self._items.clear()
+            self._head = 0
+        else:
+            self._compact()
+        self._notify("dequeue", 0)
+        return track
+
+    def pop(self, position: int = -1):
+        position = self._normalize(position)
+        if position == 0:
+            return self.popleft()
+        if position == len(self) - 1:
+            track = self._items.pop()
+            if not self._stale:
+                self._index_remove(track, self._base + len(self._items))
+            self._notify("dequeue", position)
+            return track
+        track = self._items.pop(self._head + position)
+        self._stale = True
+        self._notify("dequeue", position)
+        return track
+
+    def remove(self, track):
+        """Remove the first occurrence of *track*, the object itself if it is queued."""
+        positions = self.positions_of_track(track)
+        if positions:
+            self.pop(positions[0])
+            return
+        for position, item in enumerate(self):
+            if item == track:
+                self.pop(position)
+                return
+        raise ValueError("track not in queue")
+
+    def clear(self):
+        self._items = []
+        self._head = 0
+        self._base = 0
+        self._stale = False
+        self._by_identity = {}
+        self._by_field = {name: {} for name in INDEXED_FIELDS}
+        self._notify("clear")
+
+    def move(self, from_position: int, to_position: int):
+        """Move the track at *from_position* so it ends up at *to_position*."""
+        from_position = self._normalize(from_position)
+        with self._quiet():
+            track = self.pop(from_position)
+            if to_position < 0:
+                to_position = max(0, to_position + len(self))
+            to_position = min(to_position, len(self))
+            self.insert(to_position, track)
+        self._notify("move", from_position, to_position)
+
+    def remove_where(self, field: str, value) -> list:
+        """Remove and return, in queue order, every track whose *field* equals *value*."""
+        positions = self.positions_where(field, value)
+        if not positions:
+            return []
+        keep = set(positions)
+        live = self._items[self._head:]
+        taken = [live[position] for position in positions]
+        self._items = [track for position, track in enumerate(live) if position not in keep]
+        self._head = 0
+        self._stale = True
+        self._notify("remove_where", field, value)
+        return taken
+
+    def sort(self, *args, **kwargs):
+        live = self._items[self._head:]
+        live.sort(*args, **kwargs)
+        self._items = live
+        self._head = 0
+        self._stale = True
+        self._notify("replace", live)
+
+    def reverse(self):
+        live = self._items[self._head:]
+        live.reverse()
+        self._items = live
+        self._head = 0
+        self._stale = True
+        self._notify("replace", live)
+
+    # ------------------------------------------------------------------
+    # Lookups
+    # ------------------------------------------------------------------
+
+    def positions_of_track(self, track) -> list:
+        """Positions where this exact track object is queued."""
+        return self._positions(id(track))
+
+    def contains_track(self, track) -> bool:
+        return bool(self.positions_of_track(track))
+
+    def positions_where(self, field: str, value) -> list:
+        """Positions of tracks whose indexed *field* ("id", "playlist_block_id", "playlist_id") equals *value*."""
+        if not value:
+            return []
+        return self._positions(str(value), field)
+
+    def positions_of_video(self, video_id: Optional[str]) -> list:
+        return self.positions_where("id", video_id)
+
+    def has_video(self, video_id: Optional[str]) -> bool:
+        return bool(self.positions_of_video(video_id))
+
+    def video_ids(self) -> set:
+        self._fresh()
+        return set(self._by_field["id"])
+
+    def span(self, field: str, value) -> Optional[tuple]:
+        """(first, last) positions of the tracks whose *field* equals *value*, or None."""
+        if not value:
+            return None
+        positions = self._positions(str(value), field, ends_only=True)
+        return (positions[0], positions[-1]) if positions else None
+
+    def block_span(self, block_id: Optional[str]) -> Optional[tuple]:
+        return self.span("playlist_block_id", block_id)
+
+    def metrics(self) -> dict:
+        return {
+            "length": len(self),
+            "head_gap": self._head,
+            "stale": self._stale,
+            "rebuilds": self.rebuilds,
+        }
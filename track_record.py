@@ -0,0 +1,234 @@
+"""
+Compact records for tracks held in memory during a session.
+
+Every track used to be a free-form dict: fetch_track copies around twenty
+yt-dlp fields into it, playlist and queue code add their context on top,
+and the same dict shape sits in the queue, the current and last track,
+session history and queue backups. A small dict of that size costs well
+over a kilobyte before its values are counted, and the strings repeated
+across tracks (uploader, channel, playlist name and id, cache mode, codec)
+are separate copies per track.
+
+TrackRecord keeps the fields nearly every track has in __slots__, interns
+the strings that repeat across tracks, and puts anything else in a small
+overflow dict. It is a MutableMapping, so existing code keeps reading and
+writing tracks the way it did (track.get("id"), track["file"] = ...,
+"cache_path" in track, dict(track), {**track}): a field that was never set
+behaves like an absent dict key.
+
+Records are a memory format only. Anything written to JSON or handed to the
+web UI goes through to_dict() (or dict(track)) first; from_dict() turns a
+parsed track dict back into a record. Playlist metadata stays plain dicts,
+since it is a JSON document on disk.
+"""
+import sys
+from collections.abc import Mapping, MutableMapping
+from dataclasses import dataclass, fields
+from typing import Any, Optional
+
+
+class _Missing:
+    __slots__ = ()
+
+    def __repr__(self) -> str:
+        return "<missing>"
+
+    def __bool__(self) -> bool:
+        return False
+
+    def __reduce__(self):
+        return "MISSING"
+
+
+MISSING: Any = _Missing()
+
+# Values shared by many tracks, stored once per process.
+INTERNED_FIELDS = frozenset({
+    "uploader", "channel", "artist", "creator", "cache_mode", "ext",
+    "playlist_id", "playlist_name", "playlist_block_id", "youtube_playlist_id",
+    "requested_by_discord_name", "added_via", "format_id", "format", "format_note",
+    "acodec", "dynamic_range",
+})
+
+
+def _interned(key: str, value):
+    if key in INTERNED_FIELDS and type(value) is str:
+        return sys.intern(value)
+    return value
+
+
+@dataclass(slots=True, eq=False, repr=False)
+class TrackRecord(MutableMapping):
+    id: Any = MISSING
+    title: Any = MISSING
+    webpage_url: Any = MISSING
+    duration: Any = MISSING
+    uploader: Any = MISSING
+    channel: Any = MISSING
+    cache_key: Any = MISSING
+    cache_mode: Any = MISSING
+    cache_path: Any = MISSING
+    ext: Any = MISSING
+    file: Any = MISSING
+    filesize: Any = MISSING
+    format_id: Any = MISSING
+    format: Any = MISSING
+    format_note: Any = MISSING
+    acodec: Any = MISSING
+    abr: Any = MISSING
+    tbr: Any = MISSING
+    asr: Any = MISSING
+    audio_channels: Any = MISSING
+    fulltitle: Any = MISSING
+    is_live: Any = MISSING
+    age_limit: Any = MISSING
+    needs_refresh: Any = MISSING
+    playback_speed: Any = MISSING
+    playlist_id: Any = MISSING
+    playlist_name: Any = MISSING
+    playlist_block_id: Any = MISSING
+    playlist_index: Any = MISSING
+    playlist_total: Any = MISSING
+    youtube_playlist_id: Any = MISSING
+    youtube_playlist_url: Any = MISSING
+    requested_by_user_id: Any = MISSING
+    requested_by_discord_name: Any = MISSING
+    extra: Optional[dict] = None    # every other key (rarer yt-dlp fields, repeat flags, ...)
+
+    def __post_init__(self):
+        for key in INTERNED_SLOTS:
+            value = getattr(self, key)
+            if type(value) is str:
+                setattr(self, key, sys.intern(value))
+        if self.extra:
+            self.extra = {key: _interned(key, value) for key, value in self.extra.items()}
+
+    # ------------------------------------------------------------------
+    # Mapping protocol
+    # ------------------------------------------------------------------
+
+    def __getitem__(self, key):
+        if key in FIELD_NAMES:
+            value = getattr(self, key)
+            if value is MISSING:
+                raise KeyError(key)
+            return value
+        if self.extra is None:
+            raise KeyError(key)
+        return self.extra[key]
+
+    def get(self, key, default=None):
+        if key in FIELD_NAMES:
+            value = getattr(self, key)
+            return default if value is MISSING else value
+        if self.extra is None:
+            return default
+        return self.extra.get(key, default)
+
+    def __setitem__(self, key, value):
+        value = _interned(key, value)
+        if key in FIELD_NAMES:
+            setattr(self, key, value)
+        elif self.extra is None:
+            self.extra = {key: value}
+        else:
+            self.extra[key] = value
+
+    def __delitem__(self, key):
+        if key in FIELD_NAMES:
+            if getattr(self, key) is MISSING:
+                raise KeyError(key)
+            setattr(self, key, MISSING)
+            return
+        if self.extra is None:
+            raise KeyError(key)
+        del self.extra[key]
+        if not self.extra:
+            self.extra = None
+
+    def __contains__(self, key) -> bool:
+        if key in FIELD_NAMES:
+            return getattr(self, key) is not MISSING
+        return self.extra is not None and key in self.extra
+
+    def __iter__(self):
+        for key in FIELD_ORDER:
+            if getattr(self, key) is not MISSING:
+                yield key
+        if self.extra:
+            yield from list(self.extra)
+
+    def __len__(self) -> int:
+        count = sum(1 for key in FIELD_ORDER if getattr(self, key) is not MISSING)
+        return count + (len(self.extra) if self.extra else 0)
+
+    def clear(self):
+        for key in FIELD_ORDER:
+            setattr(self, key, MISSING)
+        self.extra = None
+
+    def __eq__(self, other) -> bool:
+        if other is self:
+            return True
+        if isinstance(other, TrackRecord):
+            # Cheap reject first: history membership checks compare many records.
+            if self.id != other.id:
+                return False
+            return self.to_dict() == other.to_dict()
+        if isinstance(other, Mapping):
+            return self.to_dict() == dict(other)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"TrackRecord({self.to_dict()!r})"
+
+    # ------------------------------------------------------------------
+    # Conversion
+    # ------------------------------------------------------------------
+
+    def to_dict(self) -> dict:
+        """A plain dict with the same keys and values, for JSON and the web UI."""
+        result = {key: getattr(self, key) for key in FIELD_ORDER if getattr(self, key) is not MISSING}
+        if self.extra:
+            result.update(self.extra)
+        return result
+
+    def copy(self) -> "TrackRecord":
+        return from_dict(self)
+
+
+FIELD_ORDER = tuple(item.name for item in fields(TrackRecord) if item.name != "extra")
+FIELD_NAMES = frozenset(FIELD_ORDER)
+INTERNED_SLOTS = tuple(key for key in FIELD_ORDER if key in INTERNED_FIELDS)
+
+
+def from_dict(data: Mapping) -> TrackRecord:
+    """A new record holding the keys and values of *data* (a dict or another record)."""
+    if isinstance(data, TrackRecord):
+        record = TrackRecord(**{key: getattr(data, key) for key in FIELD_ORDER})
+        record.extra = dict(data.extra) if data.extra else None
+        return record
+    known = {}
+    extra = {}
+    for key, value in data.items():
+        if key in FIELD_NAMES:
+            known[key] = value
+        else:
+            extra[key] = value
+    return TrackRecord(**known, extra=extra or None)
+
+
+def to_dict(track: Optional[Mapping]) -> Optional[dict]:
+    """A plain-dict copy of a record or dict track; None stays None."""
+    if track is None:
+        return None
+    if isinstance(track, TrackRecord):
+        return track.to_dict()
+    return dict(track)
+
+
+def is_track(value) -> bool:
+    """True for a track dict or record."""
+    return isinstance(value, (dict, TrackRecord))
@@ -39,6 +39,8 @@ import subprocess
 import sys
 import time
 
+import track_record
+
 logger = logging.getLogger(__name__)
 
 # ---------------------------------------------------------------------------
@@ -329,24 +331,50 @@ class BotState:
     """
     Live view of bot state exposed to the web server.
     Holds references (not snapshots) so values are always current.
+
+    Playback state is per guild (guild_player.GuildPlayer). A BotState
+    reads the default guild's player; for_guild() gives a view of another
+    guild's player, which is how web UI sessions are routed.
     """
-    def __init__(self, client_ref, queue_ref):
+    def __init__(self, client_ref, players_ref, guild_id: int = 0, audit_log=None,
+                 pause_clock=None, resume_clock=None):
         self._client     = client_ref
-        self._queue      = queue_ref
+        self._players    = players_ref
+        self._guild_id   = guild_id or None
+        self._audit_log  = audit_log
+        # The bot's own pause/resume clock helpers (they journal the position), called with the player.
+        self._pause_clock  = pause_clock or (lambda player: player.pause_clock())
+        self._resume_clock = resume_clock or (lambda player: player.resume_clock())
         self._start_time = time.time()
 
+    def for_guild(self, guild_id: int) -> "BotState":
+        """The same bot, seen through *guild_id*'s player (0 = default guild)."""
+        view = BotState(
+            self._client, self._players, guild_id, self._audit_log,
+            self._pause_clock, self._resume_clock,
+        )
+        view._start_time = self._start_time
+        return view
+
+    @property
+    def _player(self):
+        return self._players.get(self._guild_id)
+
     @property
     def queue(self) -> list:
-        return self._queue
+        return self._player.queue
 
     @property
-    def current_track_info(self):
-        return getattr(self._client, "current_track_info", None)
+    def current_track_info(self) -> dict | None:
+        # A plain copy: the web server never holds the live track record.
+        return track_record.to_dict(self._player.current_track_info)
 
     @property
     def _voice_client(self):
-        vcs = getattr(self._client, "voice_clients", [])
-        return vcs[0] if vcs else None
+        player = self._player
+        guild = self._client.get_guild(player.guild_id)
+        vc = getattr(guild, "voice_client", None) or player.current_voice_channel
+        return vc if vc is not None and vc.is_connected() else None
 
     @property
     def is_playing(self) -> bool:
@@ -376,17 +404,17 @@ class BotState:
     @property
     def volume_percent(self) -> int:
         try:
-            return int(round(float(getattr(self._client, "volume", 0.5)) * 100))
+            return int(round(float(self._player.volume) * 100))
         except Exception:
             return 0
 
     @property
     def is_repeat(self) -> bool:
-        return bool(getattr(self._client, "repeat", False))
+        return bool(self._player.repeat_current_track)
 
     @property
     def queue_length(self) -> int:
-        return len(self._queue)
+        return len(self._player.queue)
 
     @property
     def session_count(self) -> int:
@@ -409,6 +437,12 @@ class BotState:
             "session_count":   self.session_count,
         }
 
+    def audit_event_count(self) -> int | None:
+        """Events in every kept runtime audit segment (may read the files once)."""
+        if self._audit_log is None:
+            return None
+        return self._audit_log.total_event_count()
+
     def disk_usage(self, base_dir: str) -> dict:
         result = {}
         for name in ("cache", "playlists"):
@@ -436,6 +470,7 @@ class BotState:
         vc = self._voice_client
         if vc and vc.is_playing():
             vc.pause()
+            self._pause_clock(self._player)
             return True
         return False
 
@@ -443,11 +478,12 @@ class BotState:
         vc = self._voice_client
         if vc and vc.is_paused():
             vc.resume()
+            self._resume_clock(self._player)
             return True
         return False
 
     def add_to_queue(self, track: dict):
-        self._queue.append(track)
+        self._player.queue.append(track_record.from_dict(track))
 
 # ---------------------------------------------------------------------------
 # cloudflared management
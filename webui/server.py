@@ -15,12 +15,15 @@ import logging
 import os
 import re
 import secrets
-import tempfile
 import time
 from collections import deque
 from typing import Optional
 from urllib.parse import urlparse
 
+import event_log
+import playlist_repository
+import search_index
+
 logger = logging.getLogger(__name__)
 
 # ---------------------------------------------------------------------------
@@ -61,6 +64,8 @@ _log_handler = _MemLogHandler()
 # ---------------------------------------------------------------------------
 
 _playlists_dir: str = ""
+_playlist_repo = None    # playlist_repository.PlaylistRepository
+_search = None           # search_index.SearchIndex
 _bot_state = None        # webui.BotState
 _secret_key: str = ""
 _sessions = None         # webui.sessions.SessionStore
@@ -92,14 +97,15 @@ try:
     # -----------------------------------------------------------------------
 
     class _SessionContext:
-        __slots__ = ("discord_user_id", "discord_username", "is_admin", "token")
+        __slots__ = ("discord_user_id", "discord_username", "is_admin", "token", "guild_id")
 
         def __init__(self, discord_user_id: int, is_admin: bool,
-                     token: str = "", discord_username: str = ""):
+                     token: str = "", discord_username: str = "", guild_id: int = 0):
             self.discord_user_id = discord_user_id
             self.discord_username = discord_username
             self.is_admin = is_admin
             self.token = token
+            self.guild_id = guild_id
 
     # -----------------------------------------------------------------------
     # Auth
@@ -135,6 +141,7 @@ try:
                     discord_username=getattr(session, "discord_username", ""),
                     is_admin=session.is_admin,
                     token=token,
+                    guild_id=getattr(session, "guild_id", 0),
                 )
             if token in _sessions._sessions:
                 raise HTTPException(status_code=401, detail="inactive")
@@ -154,6 +161,10 @@ try:
 
     _admin_auth = Depends(_require_admin)
 
+    def _bot_for(ctx: _SessionContext):
+        """The bot state for the guild the session was opened from (secret-key sessions: default guild)."""
+        return _bot_state.for_guild(ctx.guild_id) if _bot_state is not None else None
+
     # -----------------------------------------------------------------------
     # YouTube URL helpers
     # -----------------------------------------------------------------------
@@ -184,50 +195,13 @@ try:
     # Playlist file helpers
     # -----------------------------------------------------------------------
 
-    def _playlist_metadata_files():
-        if not os.path.isdir(_playlists_dir):
-            return
-        for root, _, files in os.walk(_playlists_dir):
-            if "metadata.json" in files:
-                yield os.path.join(root, "metadata.json")
-
-    def _load_playlist(path: str) -> dict:
-        with open(path, "r") as f:
-            data = json.load(f)
-        data.setdefault("tracks", [])
-        data.setdefault("visibility", "private")
-        data.setdefault("locked", False)
-        data.setdefault("type", "playlist")
-        data.setdefault("manager_user_ids", [])
-        return data
-
     def _save_playlist_atomic(path: str, data: dict):
-        dir_ = os.path.dirname(path)
-        os.makedirs(dir_, exist_ok=True)
-        fd, tmp = tempfile.mkstemp(prefix=".tmp-", suffix=".json", dir=dir_)
-        try:
-            with os.fdopen(fd, "w") as f:
-                json.dump(data, f, indent=2)
-                f.write("\n")
-            os.replace(tmp, path)
-        except Exception:
-            try:
-                os.unlink(tmp)
-            except OSError:
-                pass
-            raise
+        _playlist_repo.save(data, path)
 
     def _find_playlist_by_id(playlist_id: str):
         if not re.match(r"^[A-Za-z0-9_=-]{4,32}$", str(playlist_id or "")):
             return None, None
-        for path in _playlist_metadata_files():
-            try:
-                pl = _load_playlist(path)
-                if pl.get("id") == playlist_id and not pl.get("deleted"):
-                    return path, pl
-            except Exception:
-                continue
-        return None, None
+        return _playlist_repo.get_with_path(playlist_id) or (None, None)
 
     def _playlist_summary(pl: dict, *, ctx: "_SessionContext | None" = None) -> dict:
         s = {
@@ -298,14 +272,10 @@ try:
 
     def _find_favorites_path(user_id: int) -> tuple[str, dict | None]:
         """Return (path, playlist) for the user's favorites, or (path, None) if not found."""
-        folder = f"favorites-{user_id}"
-        path = os.path.join(_playlists_dir, folder, "metadata.json")
-        if os.path.isfile(path):
-            try:
-                return path, _load_playlist(path)
-            except Exception:
-                pass
-        return path, None
+        found = _playlist_repo.favorites_for(user_id)
+        if found:
+            return found
+        return os.path.join(_playlists_dir, f"favorites-{user_id}", "metadata.json"), None
 
     def _create_favorites(user_id: int, username: str) -> tuple[str, dict]:
         folder = f"favorites-{user_id}"
@@ -369,22 +339,23 @@ try:
 
     @app.get("/api/now-playing")
     async def get_now_playing(ctx: _SessionContext = _auth):
-        if _bot_state is None:
+        bot_state = _bot_for(ctx)
+        if bot_state is None:
             logger.debug("[now-playing] bot_state is None")
             return None
-        track = _bot_state.current_track_info
+        track = bot_state.current_track_info
         if not track:
-            logger.debug(f"[now-playing] user={ctx.discord_user_id} idle paused={_bot_state.is_paused}")
-            return {"playing": False, "paused": _bot_state.is_paused}
+            logger.debug(f"[now-playing] user={ctx.discord_user_id} idle paused={bot_state.is_paused}")
+            return {"playing": False, "paused": bot_state.is_paused}
         vid = str(track.get("id") or "")
         logger.debug(
             f"[now-playing] user={ctx.discord_user_id} "
             f"vid={vid} title='{track.get('title', '')[:60]}' "
-            f"paused={_bot_state.is_paused}"
+            f"paused={bot_state.is_paused}"
         )
         return {
             "playing":   True,
-            "paused":    _bot_state.is_paused,
+            "paused":    bot_state.is_paused,
             "id":        vid,
             "title":     str(track.get("title") or "Unknown"),
             "url":       str(track.get("webpage_url") or (_canonical_youtube_url(vid) if vid else "")),
@@ -393,30 +364,33 @@ try:
 
     @app.post("/api/player/skip")
     async def player_skip(ctx: _SessionContext = _auth):
-        if _bot_state is None:
+        bot_state = _bot_for(ctx)
+        if bot_state is None:
             raise HTTPException(status_code=503, detail="Bot state unavailable")
-        ok = _bot_state.skip()
+        ok = bot_state.skip()
         logger.info(f"[player/skip] user={ctx.discord_user_id} ({ctx.discord_username}) result={ok}")
         return {"ok": ok, "msg": "Skipped" if ok else "Nothing to skip"}
 
     @app.post("/api/player/pause")
     async def player_pause(ctx: _SessionContext = _auth):
-        if _bot_state is None:
+        bot_state = _bot_for(ctx)
+        if bot_state is None:
             raise HTTPException(status_code=503, detail="Bot state unavailable")
-        if _bot_state.is_paused:
-            ok = _bot_state.resume()
+        if bot_state.is_paused:
+            ok = bot_state.resume()
             logger.info(f"[player/pause] user={ctx.discord_user_id} action=resume result={ok}")
             return {"ok": ok, "paused": False}
-        ok = _bot_state.pause()
+        ok = bot_state.pause()
         logger.info(f"[player/pause] user={ctx.discord_user_id} action=pause result={ok}")
         return {"ok": ok, "paused": True}
 
     @app.post("/api/player/star")
     async def player_star(ctx: _SessionContext = _auth):
+        bot_state = _bot_for(ctx)
         logger.debug(f"[player/star] user={ctx.discord_user_id} ({ctx.discord_username})")
-        if _bot_state is None:
+        if bot_state is None:
             raise HTTPException(status_code=503, detail="Bot state unavailable")
-        track = _bot_state.current_track_info
+        track = bot_state.current_track_info
         if not track:
             raise HTTPException(status_code=404, detail="Nothing is playing")
         if not ctx.discord_user_id:
@@ -457,10 +431,11 @@ try:
 
     @app.get("/api/queue")
     async def get_queue(ctx: _SessionContext = _auth):
-        if _bot_state is None:
+        bot_state = _bot_for(ctx)
+        if bot_state is None:
             logger.debug("[queue] bot_state is None")
             return []
-        q = _bot_state.queue or []
+        q = bot_state.queue or []
         logger.debug(f"[queue] user={ctx.discord_user_id} queue_len={len(q)}")
         return [
             {
@@ -473,6 +448,7 @@ try:
 
     @app.post("/api/queue/add")
     async def queue_add(request: Request, ctx: _SessionContext = _auth):
+        bot_state = _bot_for(ctx)
         body = await request.json()
         url = str(body.get("url") or "").strip()
         logger.debug(f"[queue/add] user={ctx.discord_user_id} url='{url[:80]}'")
@@ -485,9 +461,9 @@ try:
             raise HTTPException(status_code=422, detail="Could not extract a YouTube video ID")
         canonical = _canonical_youtube_url(video_id)
         title = await _fetch_youtube_title(canonical) or f"youtu.be/{video_id}"
-        if _bot_state is None:
+        if bot_state is None:
             raise HTTPException(status_code=503, detail="Bot state unavailable")
-        _bot_state.add_to_queue({
+        bot_state.add_to_queue({
             "id":            video_id,
             "title":         title,
             "webpage_url":   canonical,
@@ -506,23 +482,22 @@ try:
 
     @app.get("/api/playlists")
     async def list_playlists(ctx: _SessionContext = _auth):
-        result = []
-        for path in _playlist_metadata_files():
-            try:
-                pl = _load_playlist(path)
-                if pl.get("deleted"):
-                    continue
-                if pl.get("type") == "favorites":
-                    continue
-                if not _can_view(pl, ctx):
-                    continue
-                result.append(_playlist_summary(pl, ctx=ctx))
-            except Exception:
-                continue
+        result = [
+            _playlist_summary(pl, ctx=ctx)
+            for pl in _playlist_repo.playlists(copy=False)
+            if pl.get("type") != "favorites" and _can_view(pl, ctx)
+        ]
         result.sort(key=lambda p: str(p.get("name") or "").lower())
         logger.debug(f"[playlists] user={ctx.discord_user_id} visible={len(result)}")
         return result
 
+    @app.get("/api/search")
+    async def search_library(q: str = "", limit: int = 25, ctx: _SessionContext = _auth):
+        _playlist_repo.refresh()
+        hits = _search.search(q, limit=max(1, min(limit, 100)), can_view=lambda pl: _can_view(pl, ctx))
+        logger.debug(f"[search] user={ctx.discord_user_id} query={q[:80]!r} hits={len(hits)}")
+        return {"query": q, "results": [hit.as_dict() for hit in hits]}
+
     @app.get("/api/playlists/{playlist_id}")
     async def get_playlist(playlist_id: str, ctx: _SessionContext = _auth):
         path, pl = _find_playlist_by_id(playlist_id)
@@ -743,15 +718,7 @@ try:
     @app.get("/api/admin/playlists")
     async def admin_list_playlists(ctx: _SessionContext = _admin_auth):
         """Admin view of all playlists including disabled ones."""
-        result = []
-        for path in _playlist_metadata_files():
-            try:
-                pl = _load_playlist(path)
-                if pl.get("deleted"):
-                    continue
-                result.append(_playlist_summary(pl, ctx=ctx))
-            except Exception:
-                continue
+        result = [_playlist_summary(pl, ctx=ctx) for pl in _playlist_repo.playlists(copy=False)]
         result.sort(key=lambda p: str(p.get("name") or "").lower())
         logger.debug(f"[admin/playlists] admin={ctx.discord_user_id} total={len(result)}")
         return result
@@ -958,20 +925,16 @@ try:
 
     @app.get("/api/status")
     async def get_status(ctx: _SessionContext = _admin_auth):
-        bs = _bot_state
+        bs = _bot_for(ctx)
         queue_len = len(bs.queue) if bs else 0
         track = bs.current_track_info if bs else None
 
         # Count playlists / tracks
         pl_count, tr_count = 0, 0
-        for path in _playlist_metadata_files():
-            try:
-                pl = _load_playlist(path)
-                if not pl.get("deleted") and pl.get("type") != "favorites":
-                    pl_count += 1
-                    tr_count += len(pl.get("tracks", []))
-            except Exception:
-                pass
+        for pl in _playlist_repo.playlists(copy=False):
+            if pl.get("type") != "favorites":
+                pl_count += 1
+                tr_count += len(pl.get("tracks", []))
 
         disk = bs.disk_usage(_base_dir) if bs else {}
 
@@ -1007,7 +970,7 @@ try:
     @app.get("/api/admin/config")
     async def admin_config(ctx: _SessionContext = _admin_auth):
         """Read-only snapshot of key runtime settings."""
-        bs = _bot_state
+        bs = _bot_for(ctx)
         logger.debug(f"[admin/config] admin={ctx.discord_user_id}")
         if bs is None:
             return {}
@@ -1018,18 +981,15 @@ try:
 
     @app.get("/api/admin/audit")
     async def admin_audit(limit: int = 100, ctx: _SessionContext = _admin_auth):
-        """Return the last *limit* entries from runtime-audit.json."""
+        """Return the last *limit* entries from runtime-audit.jsonl and its rotated segments."""
         logger.debug(f"[admin/audit] admin={ctx.discord_user_id} limit={limit}")
-        audit_path = os.path.join(_base_dir, "runtime-audit.json")
-        if not os.path.isfile(audit_path):
-            return {"events": [], "total": 0}
+        audit_path = os.path.join(_base_dir, "runtime-audit.jsonl")
+        bs = _bot_for(ctx)
         try:
-            with open(audit_path) as f:
-                events = json.load(f)
-            if not isinstance(events, list):
-                return {"events": [], "total": 0}
             limit = max(1, min(500, limit))
-            return {"events": events[-limit:], "total": len(events)}
+            events = await asyncio.to_thread(event_log.read_tail_segments, audit_path, limit)
+            total = await asyncio.to_thread(bs.audit_event_count) if bs is not None else None
+            return {"events": events, "total": total}
         except Exception as exc:
             logger.error(f"[admin/audit] failed to read audit log: {exc}")
             raise HTTPException(status_code=500, detail="Failed to read audit log")
@@ -1200,8 +1160,10 @@ except ImportError:
 
 def configure(*, playlists_dir: str, bot_state, secret_key: str, sessions,
               guesser=None):
-    global _playlists_dir, _bot_state, _secret_key, _sessions, _base_dir, _guesser
+    global _playlists_dir, _playlist_repo, _search, _bot_state, _secret_key, _sessions, _base_dir, _guesser
     _playlists_dir = playlists_dir
+    _playlist_repo = playlist_repository.repository_for(playlists_dir)
+    _search        = search_index.index_for(_playlist_repo)
     _bot_state     = bot_state
     _secret_key    = secret_key
     _sessions      = sessions
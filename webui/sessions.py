@@ -40,6 +40,7 @@ class WebUISession:
     last_active: float
     bound_ip: Optional[str] = None  # None until the first HTTP request arrives
     alive: bool = True
+    guild_id: int = 0          # guild whose player the session controls; 0 = the default guild
 
 
 class SessionStore:
@@ -56,6 +57,7 @@ class SessionStore:
         discord_user_id: int,
         discord_username: str,
         is_admin: bool,
+        guild_id: int = 0,
     ) -> WebUISession:
         """Mint a new session and return it. Token is cryptographically random."""
         token = secrets.token_urlsafe(_TOKEN_BYTES)
@@ -67,6 +69,7 @@ class SessionStore:
             is_admin=is_admin,
             created_at=now,
             last_active=now,
+            guild_id=guild_id,
         )
         self._sessions[token] = session
         return session
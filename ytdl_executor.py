@@ -0,0 +1,330 @@
+"""
+Dedicated thread pools for yt-dlp extraction and downloads.
+
+Every yt-dlp call blocks, so the bot runs them in threads. They used to share
+asyncio's default executor, which let a playlist warmup occupy every worker
+while an interactive /play waited behind it. YtdlExecutor gives each kind of
+work its own lane with its own worker threads:
+
+    interactive  user-facing playback: /play, stream resolution, TV links
+    prefetch     getting the next queued tracks ready before they are needed
+    warmup       background playlist / favorites / session cache fills
+
+A busy lane never takes workers from another, so warmup can only ever delay
+other warmup work. Each lane is a concurrent.futures.Executor and can be
+passed straight to loop.run_in_executor(); cancelling the awaiting task
+cancels the job if it has not started yet, and cancel_pending() drops a
+lane's whole backlog. metrics() reports queue depth, running jobs and wait
+time (submit -> start) per lane.
+
+SingleFlight sits in front of the lanes: concurrent requests for the same
+video (two /play calls, a prefetch racing playback, two warmups sharing a
+track) join one in-flight extraction or download instead of each starting
+their own.
+
+Bulk cache fills (playlist, favorites and session warmups) go through
+run_bounded(), which keeps a fixed number of jobs in flight and starts them
+strictly in the order given, so the caller decides priority (the bot orders
+by queue position). ByteBudget is the byte allowance those parallel jobs
+share: each download reserves its expected size before fetching and settles
+with the real size afterwards, so concurrent workers cannot jointly overshoot
+a bounded playlist or favorites budget.
+"""
+import asyncio
+import collections
+import concurrent.futures
+import copy
+import logging
+import statistics
+import threading
+import time
+from typing import Callable, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = "interactive"
+PREFETCH = "prefetch"
+WARMUP = "warmup"
+LANES = (INTERACTIVE, PREFETCH, WARMUP)
+WAIT_SAMPLE_SIZE = 200
+
+
+class Lane(concurrent.futures.Executor):
+    """A named worker pool that records queueing metrics for its jobs."""
+
+    def __init__(self, name: str, max_workers: int):
+        self.name = name
+        self.max_workers = max_workers
+        self._pool = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"ytdl-{name}")
+        self._lock = threading.Lock()
+        self._pending: set = set()
+        self._waits = collections.deque(maxlen=WAIT_SAMPLE_SIZE)
+        self.queued = 0
+        self.running = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.max_wait = 0.0
+
+    def submit(self, fn: Callable, /, *args, **kwargs) -> concurrent.futures.Future:
+        submitted_at = time.monotonic()
+
+        def job():
+            waited = time.monotonic() - submitted_at
+            with self._lock:
+                self.queued -= 1
+                self.running += 1
+                self._waits.append(waited)
+                self.max_wait = max(self.max_wait, waited)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self.running -= 1
+
+        with self._lock:
+            future = self._pool.submit(job)
+            self.queued += 1
+            self.submitted += 1
+            self._pending.add(future)
+        future.add_done_callback(self._finished)
+        return future
+
+    def _finished(self, future: concurrent.futures.Future):
+        with self._lock:
+            self._pending.discard(future)
+            if future.cancelled():
+                self.queued -= 1
+                self.cancelled += 1
+            elif future.exception() is not None:
+                self.failed += 1
+            else:
+                self.completed += 1
+
+    def cancel_pending(self) -> int:
+        """Cancel every job in this lane that has not started. Returns the count."""
+        with self._lock:
+            pending = list(self._pending)
+        return sum(1 for future in pending if future.cancel())
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False):
+        self._pool.shutdown(wait=wait, cancel_futures=cancel_futures)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            waits = list(self._waits)
+            return {
+                "workers": self.max_workers,
+                "queued": self.queued,
+                "running": self.running,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "cancelled": self.cancelled,
+                "wait_avg": statistics.mean(waits) if waits else 0.0,
+                "wait_p95": statistics.quantiles(waits, n=20)[-1] if len(waits) >= 2 else max(waits, default=0.0),
+                "wait_max": self.max_wait,
+            }
+
+
+class YtdlExecutor:
+    """The set of lanes yt-dlp work is routed through."""
+
+    def __init__(self, workers: dict):
+        self.lanes = {
+            name: Lane(name, max(1, int(workers.get(name, 1))))
+            for name in LANES
+        }
+
+    def lane(self, name: Optional[str]) -> Lane:
+        lane = self.lanes.get(name or INTERACTIVE)
+        if lane is None:
+            raise ValueError(f"Unknown yt-dlp executor lane {name!r}; expected one of {', '.join(LANES)}.")
+        return lane
+
+    async def run(self, lane: Optional[str], fn: Callable, *args):
+        """Run blocking *fn* in *lane* and await its result."""
+        return await asyncio.get_running_loop().run_in_executor(self.lane(lane), fn, *args)
+
+    def cancel_pending(self, lane: str) -> int:
+        cancelled = self.lane(lane).cancel_pending()
+        if cancelled:
+            logger.info(f"Cancelled {cancelled} queued yt-dlp job(s) in the {lane} lane.")
+        return cancelled
+
+    def metrics(self) -> dict:
+        return {name: lane.metrics() for name, lane in self.lanes.items()}
+
+    def shutdown(self, wait: bool = False):
+        for lane in self.lanes.values():
+            lane.shutdown(wait=wait, cancel_futures=True)
+
+
+class _Flight:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Future):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent async calls that share a key.
+
+    The first caller for a key starts the work; callers arriving while it is
+    in flight await the same task. Each caller gets its own shallow copy of a
+    dict result, so callers can annotate what they get back. The shared task
+    is only cancelled when every caller waiting on it has been cancelled.
+    Keys are tuples whose first item names the kind of work, which is what
+    metrics() groups by.
+    """
+
+    def __init__(self):
+        self._flights: dict = {}
+        self._stats: dict = {}
+
+    async def run(self, key, factory: Callable) -> tuple:
+        """Await factory() for *key*, joining an in-flight call. Returns (result, joined)."""
+        kind = key[0] if isinstance(key, tuple) and key else str(key)
+        stats = self._stats.setdefault(kind, {"calls": 0, "joins": 0})
+        stats["calls"] += 1
+        flight = self._flights.get(key)
+        joined = flight is not None
+        if joined:
+            stats["joins"] += 1
+        else:
+            flight = _Flight(asyncio.ensure_future(factory()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _task, key=key, flight=flight: self._done(key, flight))
+        flight.waiters += 1
+        try:
+            result = await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if flight.waiters == 1 and not flight.task.done():
+                flight.task.cancel()
+            raise
+        finally:
+            flight.waiters -= 1
+        return (copy.copy(result) if isinstance(result, dict) else result), joined
+
+    def _done(self, key, flight: _Flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def in_flight(self) -> int:
+        return len(self._flights)
+
+    def metrics(self) -> dict:
+        return {kind: dict(stats) for kind, stats in self._stats.items()}
+
+
+# ----------------------------------------------------------------------
+# Bounded-parallel warmups
+# ----------------------------------------------------------------------
+
+class ByteBudget:
+    """
+    A byte allowance shared by parallel downloads. Thread-safe.
+
+    reserve() claims a download's expected size (0 when unknown) and is
+    refused once nothing is left or the size does not fit; settle() swaps the
+    reservation for the real size and refuses it if that no longer fits, in
+    which case the caller discards the file. capped records whether anything
+    was refused.
+    """
+
+    def __init__(self, max_bytes: int, *, used: int = 0):
+        self.max_bytes = max(0, int(max_bytes))
+        self.used = max(0, int(used))
+        self.reserved = 0
+        self.capped = False
+        self._lock = threading.Lock()
+
+    @property
+    def remaining(self) -> int:
+        with self._lock:
+            return max(0, self.max_bytes - self.used - self.reserved)
+
+    def reserve(self, size: int) -> bool:
+        size = max(0, int(size or 0))
+        with self._lock:
+            remaining = self.max_bytes - self.used - self.reserved
+            if remaining <= 0 or size > remaining:
+                self.capped = True
+                return False
+            self.reserved += size
+            return True
+
+    def release(self, size: int):
+        with self._lock:
+            self.reserved = max(0, self.reserved - max(0, int(size or 0)))
+
+    def settle(self, reserved: int, actual: int) -> bool:
+        actual = max(0, int(actual or 0))
+        with self._lock:
+            self.reserved = max(0, self.reserved - max(0, int(reserved or 0)))
+            if self.used + self.reserved + actual > self.max_bytes:
+                self.capped = True
+                return False
+            self.used += actual
+            return True
+
+
+async def run_bounded(
+    jobs: Iterable[Callable],
+    *,
+    concurrency: int,
+    active: Optional[Callable[[], bool]] = None,
+    poll_interval: float = 1.0,
+) -> dict:
+    """
+    Await each job factory in *jobs* with at most *concurrency* in flight.
+
+    Jobs start in the order given. *active* is checked before every job
+    starts and every *poll_interval* seconds while jobs run; once it returns
+    False no further jobs start and the running ones are cancelled. The first
+    exception a job raises cancels the rest and is re-raised, so jobs that
+    should not stop their siblings handle their own errors. Returns counts of
+    started and never-started jobs and whether the run was cancelled.
+    """
+    pending = collections.deque(jobs)
+    stats = {"started": 0, "not_started": 0, "cancelled": False}
+
+    def still_active() -> bool:
+        return active is None or bool(active())
+
+    async def worker():
+        while pending:
+            if not still_active():
+                stats["cancelled"] = True
+                return
+            job = pending.popleft()
+            stats["started"] += 1
+            await job()
+
+    if not pending:
+        return stats
+    workers = [asyncio.ensure_future(worker()) for _ in range(max(1, min(int(concurrency), len(pending))))]
+    try:
+        while True:
+            done, running = await asyncio.wait(
+                workers,
+                timeout=poll_interval if active is not None else None,
+                return_when=asyncio.FIRST_EXCEPTION,
+            )
+            for task in done:
+                if not task.cancelled() and task.exception() is not None:
+                    task.result()
+            if not running:
+                break
+            if not still_active():
+                stats["cancelled"] = True
+                break
+    finally:
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+    stats["not_started"] = len(pending)
+    return stats